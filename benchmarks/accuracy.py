@@ -0,0 +1,188 @@
+import sys
+import json
+import time
+import argparse
+import platform
+import numpy as np
+
+from pathlib import Path
+from datetime import datetime
+
+from benchmarks.suite import RECTANGLE_FILE, BENCHMARK_SEED, rectangle_elements, git_revision
+from simulators.monte_carlo import monte_carlo, rectangle_drude_current
+from utils.probabilistic_operations import seed_generators, spawn_seeds
+
+
+DEFAULT_ENGINES = ['particle', 'ensemble', 'event']
+DEFAULT_MAX_COLL = [1e3, 3e3, 1e4, 3e4, 1e5]
+DEFAULT_SEEDS = 5
+TARGET_ERRORS = [1e-2, 1e-3]
+
+
+def settings_list(engines: list, geometries: list, particles: list) -> list:
+    """
+    Build simulated settings: particle engine runs once per geometry backend, ensemble engines once per number of
+    macro-particles
+
+    :param engines: simulation engines
+    :param geometries: geometry backends of the particle engine
+    :param particles: numbers of macro-particles of ensemble engines (example value if empty)
+    :return: list of settings (engine, geometry, n_particles)
+    """
+    settings = list()
+    for engine in engines:
+        if engine == 'particle':
+            settings.extend((engine, geometry, None) for geometry in geometries)
+        else:
+            settings.extend((engine, 'float', n_particles) for n_particles in (particles or [None]))
+    return settings
+
+
+def run_point(volt: float, engine: str, geometry: str, n_particles, max_coll: float, seed, elements: tuple) -> dict:
+    """
+    Run one rectangle simulation and measure wall time and error against the analytical Drude current
+
+    :param volt: applied voltage
+    :param engine: simulation engine
+    :param geometry: geometry backend
+    :param n_particles: number of macro-particles (example value if None)
+    :param max_coll: maximum collisions (stop criterion)
+    :param seed: simulation seed
+    :param elements: material, particle model, convergence and topology of the example
+    :return: run record
+    """
+    material, particle_model, convergence, topology = elements
+    kwargs = {key: value for key, value in convergence.items() if key not in ('geo', 'workers', 'seed')}
+    kwargs.update(max_coll=max_coll, engine=engine, geometry=geometry, plot_current=False)
+    if n_particles is not None:
+        kwargs['n_particles'] = n_particles
+    seed_generators(seed)
+    start = time.perf_counter()
+    e_field, current, current_error, time_steps, collisions = monte_carlo(
+        volt, topology, material, particle_model, **kwargs
+    )
+    wall_time = time.perf_counter() - start
+    reference = rectangle_drude_current(e_field, topology, material)
+    if current * reference < 0:
+        raise Exception(f'Simulated ({current} A) and analytical ({reference} A) currents have opposite signs '
+                        '(check anode and cathode order of the current segments)')
+    return {
+        'engine': engine, 'geometry': geometry, 'n_particles': kwargs.get('n_particles'), 'max_coll': max_coll,
+        'wall_time': wall_time, 'current': current, 'reference': reference,
+        'rel_error': abs(current - reference) / abs(reference), 'reported_error': current_error / abs(reference),
+        'time_steps': time_steps, 'collisions': collisions
+    }
+
+
+def summarize(records: list) -> list:
+    """
+    Build accuracy vs cost curve of each setting (mean wall time and RMS relative error of each max_coll) and fit
+    error = a * time ** slope on the log-log curve
+
+    :param records: run records
+    :return: summary of each setting: curve, slope, time per digit (cost factor of a 10 times smaller error),
+    efficiency (error ** 2 * time, constant for 1 / sqrt(time) convergence) and estimated time to reach TARGET_ERRORS
+    """
+    summaries = list()
+    keys = sorted({(r['engine'], r['geometry'], r['n_particles'] or 0) for r in records})
+    for engine, geometry, n_particles in keys:
+        setting = [
+            r for r in records
+            if (r['engine'], r['geometry'], r['n_particles'] or 0) == (engine, geometry, n_particles)
+        ]
+        curve = list()
+        for max_coll in sorted({r['max_coll'] for r in setting}):
+            runs = [r for r in setting if r['max_coll'] == max_coll]
+            curve.append({
+                'max_coll': max_coll,
+                'wall_time': float(np.mean([r['wall_time'] for r in runs])),
+                'rms_rel_error': float(np.sqrt(np.mean([r['rel_error'] ** 2 for r in runs]))),
+                'runs': len(runs)
+            })
+        times = np.array([point['wall_time'] for point in curve])
+        errors = np.array([point['rms_rel_error'] for point in curve])
+        summary = {'engine': engine, 'geometry': geometry, 'n_particles': n_particles or None, 'curve': curve}
+        if len(curve) > 1 and (errors > 0).all():
+            slope, intercept = np.polyfit(np.log(times), np.log(errors), 1)
+            summary['slope'] = float(slope)
+            summary['efficiency'] = float(np.median(errors ** 2 * times))
+            if slope < 0:
+                summary['time_per_digit'] = float(10 ** (-1 / slope))
+                summary['time_to_error'] = {
+                    str(target): float(np.exp((np.log(target) - intercept) / slope)) for target in TARGET_ERRORS
+                }
+        summaries.append(summary)
+    return summaries
+
+
+def plot_curves(summaries: list, file: str):
+    """
+    Plot accuracy vs cost curves (log-log) of all settings
+
+    :param summaries: settings summaries
+    :param file: figure file
+    :return: None
+    """
+    import matplotlib.pyplot as plt
+
+    plt.switch_backend('Agg')
+    fig, ax = plt.subplots(figsize=(12, 6))
+    for summary in summaries:
+        label = summary['engine'] if summary['engine'] != 'particle' else f"particle ({summary['geometry']})"
+        if summary['n_particles']:
+            label += f" n={summary['n_particles']}"
+        ax.loglog([p['wall_time'] for p in summary['curve']], [p['rms_rel_error'] for p in summary['curve']],
+                  marker='o', label=label)
+    ax.set_xlabel('Wall time [s]')
+    ax.set_ylabel('RMS relative error')
+    ax.grid(True, which='both')
+    ax.legend()
+    fig.savefig(file, dpi=fig.dpi)
+    plt.close(fig)
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='Time-to-accuracy benchmark (rectangle vs analytical Drude current)')
+    parser.add_argument('--output', default='outputs/accuracy.json', type=str, help='Results file (JSON)')
+    parser.add_argument('--plot', type=str, help='Accuracy vs cost figure file (not plotted if not defined)')
+    parser.add_argument('--engines', nargs='*', default=DEFAULT_ENGINES, help='Simulation engines')
+    parser.add_argument('--geometries', nargs='*', default=['exact', 'float'], help='Particle engine backends')
+    parser.add_argument('--particles', nargs='*', type=int, default=[], help='Macro-particles of ensemble engines')
+    parser.add_argument('--max-coll', nargs='*', type=float, default=DEFAULT_MAX_COLL, help='Collisions ladder')
+    parser.add_argument('--seeds', default=DEFAULT_SEEDS, type=int, help='Independent runs of each point')
+    parser.add_argument('--voltage', type=float, help='Applied voltage (example v_max if not defined)')
+    args = parser.parse_args()
+
+    rectangle = rectangle_elements()
+    with open(RECTANGLE_FILE) as f:
+        voltage = args.voltage if args.voltage is not None else json.load(f)['voltage']['v_max']
+    seeds = spawn_seeds(BENCHMARK_SEED, args.seeds)
+
+    run_records = list()
+    for engine_name, backend, particles_number in settings_list(args.engines, args.geometries, args.particles):
+        for collisions_limit in args.max_coll:
+            for run_seed in seeds:
+                record = run_point(
+                    voltage, engine_name, backend, particles_number, collisions_limit, run_seed, rectangle
+                )
+                run_records.append(record)
+                print(f"{engine_name} ({backend}, n={record['n_particles']}) max_coll={collisions_limit:g}: "
+                      f"{record['wall_time']:.3g} s, relative error {record['rel_error']:.3g}")
+
+    settings_summaries = summarize(run_records)
+    output = Path(args.output)
+    output.parent.mkdir(parents=True, exist_ok=True)
+    with open(output, 'w') as f:
+        json.dump({
+            'revision': git_revision(),
+            'date': datetime.now().isoformat(timespec='seconds'),
+            'python': sys.version.split()[0],
+            'platform': platform.platform(),
+            'voltage': voltage,
+            'settings': vars(args),
+            'summary': settings_summaries,
+            'records': run_records
+        }, f, indent=2, default=float)
+    print(f'Results: {output}')
+    if args.plot:
+        plot_curves(settings_summaries, args.plot)
@@ -0,0 +1,430 @@
+import os
+import sys
+import json
+import time
+import argparse
+import platform
+import subprocess
+import numpy as np
+
+from pathlib import Path
+from datetime import datetime
+from skgeom import Point2, Segment2, Vector2
+
+from main import create_basic_elements, chose_topology
+from model.system import System
+from model.topology import Topology
+from simulators.monte_carlo import monte_carlo
+from utils.post_processing import PLOT_MODE_VARIABLE
+from utils.probabilistic_operations import seed_generators
+from utils.spatial_index import SegmentGrid
+from utils.vectorized_operations import (
+    outward_normals, first_intersections, first_parabolic_crossings, point_segment_distances, crossing_test,
+    supporting_lines
+)
+
+
+ROOT = Path(__file__).resolve().parent.parent
+SVG_GEOMETRIES = sorted((ROOT / 'tests').glob('diode*.svg'))
+SVG_SCALE = 1e-9
+# Current segments are anode (direct) first, then cathode (reverse), as in the README. SVG contacts are the rightmost
+# (anode) and leftmost (cathode) vertical edges; the placeholder only loads the geometry to find them
+SVG_PLACEHOLDER_SEGMENTS = ((0,), (1,))
+RECTANGLE_FILE = ROOT / 'input_examples' / 'rectangle.json'
+RECTANGLE_CUR_SEGMENTS = [[1], [3]]
+OPTIMIZER_FILE = ROOT / 'input_examples' / 'opt_multi.json'
+BENCHMARK_SEED = 13548
+DEFAULT_QUERIES = 2000
+DEFAULT_EVENTS = 2000
+DEFAULT_MAX_COLL = 1e4
+DEFAULT_REPEATS = 3
+DEFAULT_TOLERANCE = 0.1
+INDEX_OUTLINE_SEGMENTS = [16, 64, 256, 1024, 4096]
+INDEX_BATCH = 100
+# Ray length over the bounding box diagonal (about the mean free path of the rectangle example over its diagonal)
+INDEX_RAY_FRACTION = 0.02
+INDEX_DISTANCE_FRACTION = 0.005
+INDEX_KINDS = ('ray', 'ray_batch', 'parabola_batch', 'nearest', 'distance')
+STARTUP_MODULES = {
+    'cli': 'main',
+    'sweep_worker': 'simulators.monte_carlo',
+    'optimizer_worker': 'model.multi_obj_opt'
+}
+
+
+def timed(func, repeats: int, number: int = 1) -> dict:
+    """
+    Time a function (best of repeats, as timeit)
+
+    :param func: function without arguments
+    :param repeats: number of timed repetitions
+    :param number: number of calls (operations) of each repetition
+    :return: time per operation statistics [s]
+    """
+    times = list()
+    for _ in range(repeats):
+        start = time.perf_counter()
+        func()
+        times.append((time.perf_counter() - start) / number)
+    return {'best': min(times), 'mean': float(np.mean(times)), 'std': float(np.std(times)), 'repeats': repeats,
+            'operations': number}
+
+
+def query_inputs(topology: Topology, number: int) -> tuple[list, list, np.ndarray]:
+    """
+    Build deterministic query inputs inside topology: points and paths of random directions (30% of the bounding box
+    diagonal)
+
+    :param topology: queried topology
+    :param number: number of queries
+    :return: query points (Point2)
+    :return: query paths (Segment2)
+    :return: query points array (number, 2)
+    """
+    seed_generators(BENCHMARK_SEED)
+    points = topology.sample_positions(number)
+    diagonal = np.hypot(float(topology.bbox.xmax() - topology.bbox.xmin()),
+                        float(topology.bbox.ymax() - topology.bbox.ymin()))
+    angles = np.random.default_rng(BENCHMARK_SEED).uniform(0, 2 * np.pi, number)
+    ends = points + 0.3 * diagonal * np.column_stack((np.cos(angles), np.sin(angles)))
+    point_objects = [Point2(*point) for point in points]
+    paths = [Segment2(Point2(*start), Point2(*end)) for start, end in zip(points, ends)]
+    return point_objects, paths, points
+
+
+def svg_topology(file: Path) -> Topology:
+    """
+    Load SVG geometry with its contacts as current segments (rightmost vertical edges are the anode and leftmost
+    vertical edges the cathode)
+
+    :param file: SVG file
+    :return: topology
+    """
+    topology = Topology.from_file(str(file), SVG_SCALE, SVG_PLACEHOLDER_SEGMENTS)
+    tolerance = 1e-6 * topology.scale
+    vertical = np.flatnonzero(np.abs(topology.seg_starts[:, 0] - topology.seg_ends[:, 0]) <= tolerance)
+    x = topology.seg_starts[vertical, 0]
+    anode = tuple(int(seg_id) for seg_id in vertical[x >= x.max() - tolerance])
+    cathode = tuple(int(seg_id) for seg_id in vertical[x <= x.min() + tolerance])
+    return Topology.from_file(str(file), SVG_SCALE, (anode, cathode))
+
+
+def bench_topology_queries(queries: int, repeats: int) -> dict:
+    """
+    Time topology queries (intersection_points, get_closer_segment, contains) on tests/diode*.svg geometries
+
+    :param queries: number of queries of each repetition
+    :param repeats: number of repetitions
+    :return: results by benchmark name
+    """
+    results = dict()
+    for file in SVG_GEOMETRIES:
+        topology = svg_topology(file)
+        points, paths, points_array = query_inputs(topology, queries)
+        name = f'topology.{file.stem}'
+        results[f'{name}.intersection_points'] = timed(
+            lambda: [topology.intersection_points(path) for path in paths], repeats, queries
+        )
+        results[f'{name}.get_closer_segment'] = timed(
+            lambda: [topology.get_closer_segment(point) for point in points], repeats, queries
+        )
+        results[f'{name}.contains'] = timed(lambda: [topology.contains(point) for point in points], repeats, queries)
+        results[f'{name}.contains_batch'] = timed(lambda: topology.contains(points_array), repeats, queries)
+    return results
+
+
+def wavy_outline(n_segments: int) -> tuple[np.ndarray, np.ndarray]:
+    """
+    Build a closed counterclockwise outline of n_segments segments (vertices on a circle of alternating radius), used
+    as a detailed geometry of controlled size
+
+    :param n_segments: number of segments
+    :return: segments source points (n, 2)
+    :return: segments target points (n, 2)
+    """
+    angles = np.linspace(0, 2 * np.pi, n_segments, endpoint=False)
+    radius = np.where(np.arange(n_segments) % 2, 1.15, 0.85)
+    starts = np.column_stack((radius * np.cos(angles), radius * np.sin(angles)))
+    return starts, np.roll(starts, -1, axis=0)
+
+
+def bench_index_crossover(queries: int, repeats: int) -> dict:
+    """
+    Time spatial index (SegmentGrid) queries against the brute force vectorized passes on outlines of growing size
+    and on tests/diode*.svg geometries: single rays, batches of INDEX_BATCH rays and parabolas (flight length paths,
+    see INDEX_RAY_FRACTION), single nearest segment and single clipped boundary distance queries. The crossovers set
+    the Topology.use_index thresholds
+
+    :param queries: number of queries of each repetition
+    :param repeats: number of repetitions
+    :return: results by benchmark name (with the number of segments of each geometry)
+    """
+    outlines = {f'outline{n}': wavy_outline(n) for n in INDEX_OUTLINE_SEGMENTS}
+    for file in SVG_GEOMETRIES:
+        topology = svg_topology(file)
+        outlines[file.stem] = (topology.seg_starts, topology.seg_ends)
+    rng = np.random.default_rng(BENCHMARK_SEED)
+    results = dict()
+    for name, (seg_starts, seg_ends) in outlines.items():
+        seg_normals = outward_normals(seg_ends - seg_starts)
+        seg_directions = seg_ends - seg_starts
+        grid = SegmentGrid(seg_starts, seg_ends, seg_normals)
+        low = np.minimum(seg_starts, seg_ends).min(axis=0)
+        high = np.maximum(seg_starts, seg_ends).max(axis=0)
+        diagonal = float(np.hypot(*(high - low)))
+        points = rng.uniform(low, high, (20 * queries, 2))
+        points = points[crossing_test(points, seg_starts, seg_ends)][:queries]
+        angles = rng.uniform(0, 2 * np.pi, len(points))
+        displacements = INDEX_RAY_FRACTION * diagonal * np.column_stack((np.cos(angles), np.sin(angles)))
+        radius = INDEX_DISTANCE_FRACTION * diagonal
+        acceleration = np.array([INDEX_RAY_FRACTION * diagonal, 0])
+        horizons = np.ones(len(points))
+        seg_lines = supporting_lines(seg_starts, seg_normals)
+        batches = range(0, len(points), INDEX_BATCH)
+        runs = {
+            'ray': (
+                lambda: [grid.first_hits(p, d) for p, d in zip(points, displacements)],
+                lambda: [first_intersections(p, d, seg_starts, seg_directions, seg_normals)
+                         for p, d in zip(points, displacements)]
+            ),
+            'ray_batch': (
+                lambda: [grid.first_hits(points[i:i + INDEX_BATCH], displacements[i:i + INDEX_BATCH]) for i in batches],
+                lambda: [first_intersections(points[i:i + INDEX_BATCH], displacements[i:i + INDEX_BATCH], seg_starts,
+                                             seg_directions, seg_normals) for i in batches]
+            ),
+            'parabola_batch': (
+                lambda: [grid.first_parabolic_hits(points[i:i + INDEX_BATCH], displacements[i:i + INDEX_BATCH],
+                                                   acceleration, horizons[i:i + INDEX_BATCH]) for i in batches],
+                lambda: [first_parabolic_crossings(points[i:i + INDEX_BATCH], displacements[i:i + INDEX_BATCH],
+                                                   acceleration, horizons[i:i + INDEX_BATCH], seg_starts,
+                                                   seg_directions, seg_lines) for i in batches]
+            ),
+            'nearest': (
+                lambda: [grid.nearest_segment(p) for p in points],
+                lambda: [np.argmin(point_segment_distances(p, seg_starts, seg_ends)) for p in points]
+            ),
+            'distance': (
+                lambda: [grid.min_distances(p, radius) for p in points],
+                lambda: [min(point_segment_distances(p, seg_starts, seg_ends).min(), radius) for p in points]
+            )
+        }
+        for kind, (grid_run, brute_run) in runs.items():
+            for method, run in (('grid', grid_run), ('brute', brute_run)):
+                result = timed(run, repeats, len(points))
+                result['segments'] = len(seg_starts)
+                results[f'index.{name}.{kind}.{method}'] = result
+    return results
+
+
+def index_crossovers(results: dict) -> dict:
+    """
+    Find, for each query kind, the smallest outline where the spatial index is faster than the brute force pass
+
+    :param results: results of bench_index_crossover
+    :return: number of segments of the crossover by query kind (None if the index is never faster)
+    """
+    crossovers = dict()
+    for kind in INDEX_KINDS:
+        faster = [
+            results[f'index.outline{n}.{kind}.grid']['best'] < results[f'index.outline{n}.{kind}.brute']['best']
+            for n in INDEX_OUTLINE_SEGMENTS
+        ]
+        crossovers[kind] = next(
+            (n for pos, n in enumerate(INDEX_OUTLINE_SEGMENTS) if all(faster[pos:])), None
+        )
+    return crossovers
+
+
+def rectangle_elements() -> tuple:
+    """
+    Load rectangle example elements (left and right edges are the current segments if the example does not define
+    them, so no interactive window is opened)
+
+    :return: material, particle model, convergence and topology
+    """
+    material, particle_model, convergence = create_basic_elements(RECTANGLE_FILE)
+    with open(RECTANGLE_FILE) as f:
+        data = json.load(f)
+    data['geometry'].setdefault('cur_segments', RECTANGLE_CUR_SEGMENTS)
+    return material, particle_model, convergence, chose_topology(data['geometry'])
+
+
+def bench_drude_events(events: int, repeats: int) -> dict:
+    """
+    Time System.simulate_drude per event (one free flight) on the rectangle example, for every geometry backend
+
+    :param events: number of events of each repetition
+    :param repeats: number of repetitions
+    :return: results by benchmark name
+    """
+    material, particle_model, convergence, topology = rectangle_elements()
+    with open(RECTANGLE_FILE) as f:
+        volt = json.load(f)['voltage']['v_max']
+    e_field = Vector2(-volt, 0) / (topology.bbox.xmax() - topology.bbox.xmin())
+    results = dict()
+    for geometry in ('exact', 'float'):
+        seed_generators(BENCHMARK_SEED)
+        system = System(
+            particle_model, topology, material, e_field, convergence['check_condition'], geometry=geometry
+        )
+        system.set_particle_parameters()
+
+        def run_events():
+            for _ in range(events):
+                system.particle.set_velocity()
+                system.simulate_drude()
+        results[f'system.simulate_drude.{geometry}'] = timed(run_events, repeats, events)
+    return results
+
+
+def bench_monte_carlo(max_coll: float, repeats: int) -> dict:
+    """
+    Time a full monte_carlo() run of the rectangle example (highest voltage of the example range) with the particle,
+    ensemble and event engines
+
+    :param max_coll: maximum collisions (stop criterion)
+    :param repeats: number of repetitions
+    :return: results by benchmark name
+    """
+    material, particle_model, convergence, topology = rectangle_elements()
+    with open(RECTANGLE_FILE) as f:
+        volt = json.load(f)['voltage']['v_max']
+    convergence.update(max_coll=max_coll)
+    convergence.pop('geo')
+    results = dict()
+    for engine in ('particle', 'ensemble', 'event'):
+        def run():
+            seed_generators(BENCHMARK_SEED)
+            monte_carlo(volt, topology, material, particle_model, **convergence, plot_current=False, engine=engine)
+        results[f'monte_carlo.rectangle.{engine}'] = timed(run, repeats)
+    return results
+
+
+def bench_optimizer_generation(max_coll: float, pop_size: int, repeats: int) -> dict:
+    """
+    Time one optimizer generation (evaluate_population of a random population) of the multi-objective example
+
+    :param max_coll: maximum collisions of each simulation (stop criterion)
+    :param pop_size: population size (example value if not defined)
+    :param repeats: number of repetitions
+    :return: results by benchmark name
+    """
+    from model.multi_obj_opt import MultiObjOpt
+
+    material, particle_model, convergence = create_basic_elements(OPTIMIZER_FILE)
+    convergence.pop('geo')
+    convergence.update(max_coll=max_coll)
+    with open(OPTIMIZER_FILE) as f:
+        data = json.load(f)
+    params = data['optimizer']['params']
+    params['seed'] = BENCHMARK_SEED
+    if pop_size is not None:
+        params['pop_size'] = pop_size
+    opt = MultiObjOpt(params, material=material, particle_model=particle_model, convergence=convergence,
+                      scale=data['geometry']['scale'])
+    population = np.random.default_rng(BENCHMARK_SEED).uniform(
+        opt.boundaries[0], opt.boundaries[1], (opt.pop_size, opt.n_var)
+    )
+    return {'optimizer.generation': timed(lambda: opt.evaluate_population(population, opt.methods), repeats)}
+
+
+def bench_startup(repeats: int) -> dict:
+    """
+    Time module imports of a fresh headless interpreter: CLI startup (main) and spawned workers (modules unpickled by
+    sweep and optimizer workers)
+
+    :param repeats: number of repetitions
+    :return: results by benchmark name
+    """
+    env = {**os.environ, PLOT_MODE_VARIABLE: 'off'}
+    results = dict()
+    for name, module in STARTUP_MODULES.items():
+        results[f'startup.{name}'] = timed(
+            lambda: subprocess.run([sys.executable, '-c', f'import {module}'], cwd=ROOT, env=env, check=True), repeats
+        )
+    return results
+
+
+def git_revision() -> str:
+    """
+    Get current git revision (benchmarks are compared between commits)
+
+    :return: revision hash (empty if not available)
+    """
+    try:
+        return subprocess.run(
+            ['git', 'rev-parse', 'HEAD'], cwd=ROOT, capture_output=True, text=True, check=True
+        ).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return ''
+
+
+def compare(results: dict, baseline_file: str, tolerance: float) -> bool:
+    """
+    Compare results with a baseline results file (best time of each benchmark)
+
+    :param results: current results
+    :param baseline_file: baseline results file
+    :param tolerance: accepted relative slowdown
+    :return: boolean indicating if no benchmark regressed beyond tolerance
+    """
+    with open(baseline_file) as f:
+        baseline = json.load(f)['results']
+    passed = True
+    print(f"{'benchmark':<55} {'baseline':>12} {'current':>12} {'ratio':>8}")
+    for name, result in results.items():
+        if name not in baseline:
+            continue
+        ratio = result['best'] / baseline[name]['best']
+        regressed = ratio > 1 + tolerance
+        passed &= not regressed
+        print(f"{name:<55} {baseline[name]['best']:>12.4g} {result['best']:>12.4g} {ratio:>8.3f}"
+              f"{'  REGRESSION' if regressed else ''}")
+    return passed
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='Simulator benchmark suite')
+    parser.add_argument('--output', default='outputs/benchmarks.json', type=str, help='Results file (JSON)')
+    parser.add_argument('--compare', type=str, help='Baseline results file to compare with')
+    parser.add_argument('--tolerance', default=DEFAULT_TOLERANCE, type=float, help='Accepted relative slowdown')
+    parser.add_argument('--only', nargs='*',
+                        default=['startup', 'topology', 'index', 'drude', 'monte_carlo', 'optimizer'],
+                        help='Benchmark groups (startup, topology, index, drude, monte_carlo, optimizer)')
+    parser.add_argument('--repeats', default=DEFAULT_REPEATS, type=int, help='Repetitions of each benchmark')
+    parser.add_argument('--queries', default=DEFAULT_QUERIES, type=int, help='Topology queries per repetition')
+    parser.add_argument('--events', default=DEFAULT_EVENTS, type=int, help='Drude events per repetition')
+    parser.add_argument('--max-coll', default=DEFAULT_MAX_COLL, type=float, help='Collisions of each simulation')
+    parser.add_argument('--pop-size', type=int, help='Optimizer population size (example value if not defined)')
+    args = parser.parse_args()
+
+    groups = {
+        'startup': lambda: bench_startup(args.repeats),
+        'topology': lambda: bench_topology_queries(args.queries, args.repeats),
+        'index': lambda: bench_index_crossover(args.queries, args.repeats),
+        'drude': lambda: bench_drude_events(args.events, args.repeats),
+        'monte_carlo': lambda: bench_monte_carlo(args.max_coll, args.repeats),
+        'optimizer': lambda: bench_optimizer_generation(args.max_coll, args.pop_size, args.repeats)
+    }
+    benchmark_results = dict()
+    for group in args.only:
+        print(f'Benchmark: {group}')
+        benchmark_results.update(groups[group]())
+        if group == 'index':
+            print(f'Spatial index crossovers (segments): {index_crossovers(benchmark_results)}')
+
+    output = Path(args.output)
+    output.parent.mkdir(parents=True, exist_ok=True)
+    with open(output, 'w') as f:
+        json.dump({
+            'revision': git_revision(),
+            'date': datetime.now().isoformat(timespec='seconds'),
+            'python': sys.version.split()[0],
+            'platform': platform.platform(),
+            'settings': vars(args),
+            'results': benchmark_results
+        }, f, indent=2)
+    print(f'Results: {output}')
+
+    if args.compare and not compare(benchmark_results, args.compare, args.tolerance):
+        sys.exit(1)
@@ -1,7 +1,6 @@
 import re
 
 from xml.dom import minidom
-from skgeom.draw import draw
 from skgeom import Polygon, Point2
 from file_readers.xml_attr import func_dict
 
@@ -7,13 +7,11 @@ import numpy as np
 
 from pathlib import Path
 
-from model.multi_obj_opt import MultiObjOpt
 from model.particle import Particle
-from model.single_obj_opt import SingleObjOpt
 from model.topology import Topology
 from model.material import Material
 from simulators.monte_carlo import monte_carlo_non_opt
-from utils.post_processing import calc_asymmetry, plot_figs
+from utils.post_processing import calc_asymmetry, plot_figs, set_plot_mode, PLOT_MODES
 
 
 def create_voltage_range(v_min, v_max, num_points):
@@ -45,12 +43,14 @@ def create_basic_elements(file_name: Path):
     return mat, particle_m, convergence
 
 
-def simulate(file_name: Path, out_file, id_tracker):
+def simulate(file_name: Path, out_file, id_tracker, seed=None):
     currents = list()
     drude_currents = list()
     voltages = list()
 
     mat, particle_m, convergence = create_basic_elements(file_name)
+    if seed is not None:
+        convergence['seed'] = seed
     with open(file_name) as f:
         data = json.load(f)
     pol = chose_topology(data['geometry'])
@@ -65,19 +65,27 @@ def simulate(file_name: Path, out_file, id_tracker):
     return exec_time, vol_asy, asymmetry, voltages, currents, drude_currents
 
 
-def optimize(file_name: Path):
+def optimize(file_name: Path, seed=None):
     mat, particle_m, convergence = create_basic_elements(file_name)
     convergence.pop("geo")
+    convergence.pop("workers", None)
+    file_seed = convergence.pop("seed", None)
 
     with open(file_name) as f:
         data = json.load(f)
+    if seed is not None or file_seed is not None:
+        data['optimizer']['params']['seed'] = file_seed if seed is None else seed
     if data['optimizer']['type'] == 'numpy':
+        from model.single_obj_opt import SingleObjOpt
+
         params = data['optimizer']['params']
         opt = SingleObjOpt(
             params, material=mat, particle_model=particle_m, convergence=convergence, scale=data['geometry']['scale']
         )
         result, exec_time = opt.optimize()
     else:
+        from model.multi_obj_opt import MultiObjOpt
+
         params = data['optimizer']['params']
         opt = MultiObjOpt(
             params, material=mat, particle_model=particle_m, convergence=convergence, scale=data['geometry']['scale']
@@ -99,8 +107,12 @@ if __name__ == '__main__':
     parser.add_argument('--output', '--o', default='currents', type=str, help='Current save output file name')
     parser.add_argument('--id', type=str, help='ID code used to track simulation. Can be a string without whitespace')
     parser.add_argument('--opt', type=bool, default=False, help='Optimization')
+    parser.add_argument('--seed', type=int, help='Root random seed (overrides convergence seed)')
+    parser.add_argument('--plots', choices=PLOT_MODES, help='Plotting mode (interactive if a display is available)')
 
     args = parser.parse_args()
+    if args.plots:
+        set_plot_mode(args.plots)
 
     exec_time_list = list()
     asymmetry_list = list()
@@ -114,7 +126,7 @@ if __name__ == '__main__':
         for file_sim in files:
             print(f'File: {file_sim}')
             exec_time_aux, vol_asy_aux, asymmetry_aux, voltages_aux, curr_aux, drude_curr_aux = \
-                simulate(file_sim, args.output, args.id)
+                simulate(file_sim, args.output, args.id, args.seed)
             exec_time_list.append(exec_time_aux)
             vol_asy_list.append(vol_asy_aux)
             asymmetry_list.append(asymmetry_aux)
@@ -127,9 +139,9 @@ if __name__ == '__main__':
         print(f'File: {file}')
         if not args.opt:
             exec_time_aux, vol_asy_aux, asymmetry_aux, voltages_aux, curr_aux, drude_curr_aux = \
-                simulate(file, args.output, args.id)
+                simulate(file, args.output, args.id, args.seed)
             plot_figs(vol_asy_aux, voltages_aux, asymmetry_aux, curr_aux, drude_curr_aux)
         else:
-            exec_time_aux = optimize(file)
+            exec_time_aux = optimize(file, args.seed)
 
         print(f'Execution time: {"%s" % float("%.3g" % (exec_time_aux / 60))} min')
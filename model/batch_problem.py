@@ -0,0 +1,38 @@
+import numpy as np
+
+from pymoo.core.problem import Problem
+from utils.geometry_template import evaluate_constraints
+
+
+class BatchProblem(Problem):
+    def __init__(
+            self,
+            n_var: int,
+            evaluator,
+            n_obj: int,
+            consts: list,
+            xl: np.ndarray,
+            xu: np.ndarray,
+            callback=None
+    ):
+        """
+        Problem evaluating a whole population at once. Each individual runs its simulation once and returns all
+        objectives; constraints are evaluated for the whole population in bulk
+
+        :param n_var: number of variables
+        :param evaluator: function returning all objectives values of a population (pop, n_obj)
+        :param n_obj: number of objectives
+        :param consts: inequality constraints functions (feasible when <= 0)
+        :param xl: variables lower bounds
+        :param xu: variables upper bounds
+        :param callback: function called with the population and its evaluation output after each evaluation
+        """
+        super().__init__(n_var=n_var, n_obj=n_obj, n_ieq_constr=len(consts), xl=xl, xu=xu, callback=callback)
+        self.evaluator = evaluator
+        self.consts = consts
+
+
+    def _evaluate(self, x, out, *args, **kwargs):
+        out["F"] = np.asarray(self.evaluator(x), dtype=float).reshape(len(x), self.n_obj)
+        if self.consts:
+            out["G"] = evaluate_constraints(self.consts, x)
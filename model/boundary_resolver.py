@@ -0,0 +1,146 @@
+import numpy as np
+
+from collections import Counter
+from model.topology import Topology, WALL
+from utils.vectorized_operations import mirror_vectors
+
+
+EVENT_TOLERANCE = 1e-6
+GRAZING_COSINE = 1e-3
+PARALLEL_COSINE = 1 - 1e-12
+FALLBACKS = ('corner', 'grazing', 'outside', 'truncated')
+
+
+class BoundaryResolver:
+    def __init__(self, topology: Topology):
+        """
+        Deterministic boundary events of free flights. Crossed segments are reached exactly and particles are
+        placed a fixed tolerance (EVENT_TOLERANCE * topology scale) inside the boundary along the inward normal, so
+        grazing paths can not stall against the boundary. Hits closer than the tolerance to a vertex are corner hits:
+        contacts have priority over walls and walls are mirrored by both segments normals. Every fallback path is
+        counted in fallbacks
+
+        :param topology: simulated topology
+        """
+        self.topology = topology
+        self.tolerance = EVENT_TOLERANCE * topology.scale
+        self.fallbacks = Counter({name: 0 for name in FALLBACKS})
+
+
+    def advance(self, positions: np.ndarray, displacements: np.ndarray) -> tuple:
+        """
+        Advance a batch of straight paths until their first boundary event
+
+        :param positions: paths origins ((2,) or (m, 2))
+        :param displacements: paths displacements ((2,) or (m, 2))
+        :return: event segment ids (-1 if the path does not reach the boundary) (m,)
+        :return: traveled fraction of each path (m,)
+        :return: new positions (m, 2)
+        :return: second mirror normals of corner hits (null vectors otherwise) (m, 2)
+        """
+        positions = np.atleast_2d(positions)
+        displacements = np.atleast_2d(displacements)
+        seg_ids, params = self.topology.first_intersections(positions, displacements)
+        seg_ids = np.array(seg_ids, dtype=np.int64)
+        collided = seg_ids >= 0
+        fractions = np.where(collided, params, 1.0)
+        new_positions = positions + fractions[:, None] * displacements
+        corner_normals = np.zeros_like(new_positions)
+        if not collided.any():
+            return seg_ids, fractions, new_positions, corner_normals
+
+        hits = np.flatnonzero(collided)
+        seg_ids[hits], new_positions[hits], corner_normals[hits] = self.settle(
+            seg_ids[hits], new_positions[hits], positions[hits], displacements[hits]
+        )
+        return seg_ids, fractions, new_positions, corner_normals
+
+
+    def settle(self, seg_ids: np.ndarray, points: np.ndarray, previous: np.ndarray, directions: np.ndarray) -> tuple:
+        """
+        Resolve boundary hits of any flight model (straight or parabolic): count grazing hits, find corner hits,
+        place hit points inside the boundary and reset points that still end outside the topology to their previous
+        positions
+
+        :param seg_ids: hit segments ids (k,)
+        :param points: hit points (k, 2)
+        :param previous: positions before the flight (k, 2)
+        :param directions: paths directions at the hit points (k, 2)
+        :return: event segment ids (contacts have priority over walls at corners) (k,)
+        :return: new positions (k, 2)
+        :return: second mirror normals of corner hits (null vectors otherwise) (k, 2)
+        """
+        seg_ids = np.array(seg_ids, dtype=np.int64)
+        points = np.array(points, dtype=float)
+        corner_normals = np.zeros_like(points)
+        normals = self.topology.seg_normals[seg_ids]
+        lengths = np.linalg.norm(directions, axis=1)
+        cosines = np.einsum('ij,ij->i', directions, normals) / np.where(lengths > 0, lengths, 1)
+        self.fallbacks['grazing'] += int(np.count_nonzero(cosines < GRAZING_COSINE))
+
+        neighbours = self._corner_neighbours(points, seg_ids)
+        corner = neighbours >= 0
+        if corner.any():
+            self.fallbacks['corner'] += int(np.count_nonzero(corner))
+            first = seg_ids[corner]
+            second = neighbours[corner]
+            swap = (self.topology.seg_roles[first] == WALL) & (self.topology.seg_roles[second] != WALL)
+            seg_ids[corner] = np.where(swap, second, first)
+            corner_normals[corner] = self.topology.seg_normals[np.where(swap, first, second)]
+
+        inward = self.topology.seg_normals[seg_ids] + corner_normals
+        inward_lengths = np.linalg.norm(inward, axis=1)
+        points -= self.tolerance * inward / np.where(inward_lengths > 0, inward_lengths, 1)[:, None]
+
+        outside = ~np.atleast_1d(self.topology.contains(points))
+        if outside.any():
+            self.fallbacks['outside'] += int(np.count_nonzero(outside))
+            points[outside] = previous[outside]
+        return seg_ids, points, corner_normals
+
+
+    def _corner_neighbours(self, points: np.ndarray, seg_ids: np.ndarray) -> np.ndarray:
+        """
+        Find the segment sharing the hit vertex, for hits closer than the tolerance to one of the segment endpoints
+
+        :param points: hit points (k, 2)
+        :param seg_ids: hit segments (k,)
+        :return: neighbour segment ids (-1 if the hit is not a corner hit) (k,)
+        """
+        topology = self.topology
+        seg_lengths = topology.seg_lengths[seg_ids]
+        along = np.einsum('ij,ij->i', points - topology.seg_starts[seg_ids], topology.seg_unit_directions[seg_ids])
+        neighbours = np.where(
+            along <= self.tolerance, topology.seg_prev[seg_ids],
+            np.where(seg_lengths - along <= self.tolerance, topology.seg_next[seg_ids], -1)
+        )
+        valid = neighbours >= 0
+        parallel = np.einsum(
+            'ij,ij->i', topology.seg_normals[seg_ids], topology.seg_normals[np.maximum(neighbours, 0)]
+        ) >= PARALLEL_COSINE
+        return np.where(valid & ~parallel, neighbours, -1)
+
+
+    @staticmethod
+    def corner_mirror(velocities: np.ndarray, corner_normals: np.ndarray) -> np.ndarray:
+        """
+        Mirror velocities still leaving the topology through the second segment of a corner hit
+
+        :param velocities: velocities after the first mirror ((2,) or (m, 2))
+        :param corner_normals: second mirror normals (null vectors when there is no corner hit) ((2,) or (m, 2))
+        :return: velocities (m, 2)
+        """
+        velocities = np.atleast_2d(velocities)
+        corner_normals = np.atleast_2d(corner_normals)
+        outward = np.einsum('ij,ij->i', velocities, corner_normals) > 0
+        return np.where(outward[:, None], mirror_vectors(velocities, corner_normals), velocities)
+
+
+    def count_truncated(self, number: int = 1):
+        """
+        Count free flights stopped at the maximum loop iterations (the flight ends where the particle is)
+
+        :param number: number of truncated flights
+        :return: None
+        """
+        self.fallbacks['truncated'] += int(number)
@@ -0,0 +1,263 @@
+import os
+import numpy as np
+
+from skgeom import Vector2
+from model.system import System, MAX_LOOP, PROFILED_METHODS
+from utils.current_statistics import DEFAULT_CONFIDENCE, DEFAULT_BATCH_SIZE, DEFAULT_MIN_BATCHES, DEFAULT_TRACE_POINTS
+from model.particle import Particle
+from model.topology import Topology, WALL, DIRECT, REVERSE
+from model.material import Material
+from utils.post_processing import ProgressReporter, plot_stable_current
+from utils.probabilistic_operations import ParticleStreams, random_directions, use_stream
+from utils.vectorized_operations import mirror_vectors
+
+
+class Ensemble(System):
+    def __init__(
+            self,
+            particle: Particle,
+            topology: Topology,
+            material: Material,
+            electric_field: Vector2,
+            check_condition: str,
+            number_of_particles: int = None,
+            max_collisions: float = np.inf,
+            max_time_steps: float = np.inf,
+            rel_error: float = None,
+            abs_error: float = None,
+            confidence: float = DEFAULT_CONFIDENCE,
+            batch_size: int = DEFAULT_BATCH_SIZE,
+            min_batches: int = DEFAULT_MIN_BATCHES,
+            trace_points: int = DEFAULT_TRACE_POINTS,
+            trace_file: str = None,
+            geometry: str = 'float',
+            profile_file: str = None,
+            profile_trace: bool = False
+    ):
+        """
+        Struct-of-arrays system: all macro-particles are simulated at once. Positions, velocities and remaining
+        time/distance are held in arrays, and every free flight is advanced with batched array operations
+
+        :param particle: particle model to be simulated (used as prototype for all macro-particles)
+        :param topology: desired topology
+        :param material: material
+        :param electric_field: defined or calculated electric field created by applied topology voltage [V/m]
+        :param check_condition: define the method to check the scattering behaviour ('time' or 'distance')
+        :param number_of_particles: number of macro-particles (defined by the number of cores if not defined)
+        :param max_collisions: defined maximum accepted collisions. Stop criteria
+        :param max_time_steps: defined maximum ensemble time steps (each step is one free flight of every
+        macro-particle, the unit of batch_size). Stop criteria
+        :param rel_error: target relative error of the current confidence interval. Stop criteria
+        :param abs_error: target absolute error of the current confidence interval. Stop criteria [A]
+        :param confidence: confidence level of the current interval
+        :param batch_size: number of ensemble time steps of each current batch
+        :param min_batches: minimum number of batches before checking the target errors
+        :param trace_points: maximum number of stored current trace points (decimated beyond it)
+        :param trace_file: prefix of the files where the full current trace is streamed (not streamed if not defined)
+        :param geometry: ignored (ensemble engines always run on float64 arrays)
+        :param profile_file: prefix of the files where per-phase timers and counters are saved (not profiled if not
+        defined)
+        :param profile_trace: define if a Chrome trace file is also saved (requires profile_file)
+        """
+        super().__init__(
+            particle, topology, material, electric_field, check_condition, number_of_particles, max_collisions,
+            max_time_steps, rel_error, abs_error, confidence, batch_size, min_batches, trace_points, trace_file,
+            geometry='float', profile_file=profile_file, profile_trace=profile_trace
+        )
+        self.number_of_particles = int(number_of_particles or os.cpu_count() or 1)
+        self.e_field_array = np.array([float(electric_field.x()), float(electric_field.y())])
+        self.positions = np.zeros((self.number_of_particles, 2))
+        self.velocities = np.zeros((self.number_of_particles, 2))
+        self.particle_streams = ParticleStreams(self.number_of_particles, self.stream)
+
+        self.seg_roles = self.topology.seg_roles
+        self.current_ids = self.topology.current_ids
+
+        if self.check_condition == 'time':
+            self.free_flight = self.relax_time
+            self.tolerance = 10 ** (-self.significant_digits_time)
+        else:
+            self.free_flight = self.material.mean_free_path
+            self.tolerance = 10 ** (-self.significant_digits_dist)
+
+
+    def set_particle_parameters(self, indices: np.ndarray = None):
+        """
+        Set macro-particles initial positions (inside topology and far from boundaries). Each macro-particle draws
+        from its own stream until its position is accepted (rejections are counted in topology sampling_rejections)
+
+        :param indices: macro-particles to be (re)positioned. All if not defined
+        :return: None
+        """
+        pending = np.arange(self.number_of_particles) if indices is None else np.asarray(indices)
+        min_distance = self.topology.scale / 20
+        while pending.size:
+            positions = self.topology.triangle_positions(self.particle_streams.uniform(pending, 3))
+            accepted = self.topology.boundary_distances(positions, min_distance) >= min_distance
+            self.positions[pending[accepted]] = positions[accepted]
+            self.topology.sampling_rejections += int(np.count_nonzero(~accepted))
+            pending = pending[~accepted]
+
+
+    def set_velocities(self):
+        """
+        Set macro-particles random Fermi velocities plus drift velocity
+
+        :return: None
+        """
+        fermi_velocities = self.random_directions() * self.particle.scalar_fermi_velocity
+        self.velocities = fermi_velocities + self.drift_velocity()
+
+
+    def random_directions(self) -> np.ndarray:
+        """
+        Draw an isotropic unit direction for every macro-particle from its own stream
+
+        :return: unit directions (number_of_particles, 2)
+        """
+        uniforms = self.particle_streams.uniform(np.arange(self.number_of_particles), 1)[:, 0]
+        return random_directions(self.number_of_particles, uniforms)
+
+
+    def _start_profile(self):
+        """
+        Attach per-phase timers (see System._start_profile), plus the macro-particles streams
+
+        :return: instrumentation (None if not profiled)
+        """
+        profile = super()._start_profile()
+        if profile is not None:
+            profile.attach(self.particle_streams, PROFILED_METHODS['particle_rng'], 'particle_rng')
+        return profile
+
+
+    def drift_velocity(self) -> np.ndarray:
+        """
+        Calculate drift velocity (same for all macro-particles)
+
+        :return: drift velocity
+        """
+        if self.particle.drift_method == 'relax':
+            return self.particle.charge * self.relax_time * self.e_field_array / self.particle.mass
+        else:
+            return -self.material.mobility * self.e_field_array
+
+
+    def simulate(self, model, voltage: list, plot_current: bool = True):
+        """
+        Simulate complete system
+
+        :param voltage: simulated voltage
+        :param model: desired model to simulate. Must be a method callback (ex.: simulate_drude method)
+        :param plot_current: define if stable current will be plotted
+        :return: None
+        """
+        with use_stream(self.stream):
+            profile = self._start_profile()
+            if profile is not None:
+                model = profile.wrap('system.simulate_drude', model)
+            self.set_particle_parameters()
+            self._start_trace(voltage)
+            progress = ProgressReporter(self.max_collisions, label=f"{'%s' % float('%.1g' % voltage)} V")
+            while not self._stop_conditions():
+                self.time_steps_count += 1
+                self.set_velocities()
+                traveled_time, truncated = model()
+                self.resolver.count_truncated(np.count_nonzero(truncated))
+                self.simulated_time += traveled_time.sum()
+                self.batch_means.add(self.particles_counter, self.simulated_time)
+                if self._stop_conditions():
+                    break
+                self.current_trace.add(self.cal_current())
+                progress.update(self.collisions_count, self.time_steps_count)
+            progress.close()
+            self.current_trace.close()
+            self._finish_profile(profile, voltage)
+            self._report_fallbacks()
+            if plot_current:
+                plot_stable_current(*self.current_trace.trace(), voltage)
+            print('\n')
+
+
+    def simulate_drude(self) -> tuple[np.ndarray, np.ndarray]:
+        """
+        Simulate one Drude event (free flight) for all macro-particles. Boundary events are resolved by
+        BoundaryResolver
+
+        :return: traveled time of each macro-particle
+        :return: boolean array indicating macro-particles whose flight was truncated at the maximum loop iterations
+        """
+        n = self.number_of_particles
+        remaining = np.full(n, self.free_flight)
+        traveled_time = np.zeros(n)
+        truncated = np.zeros(n, dtype=bool)
+        active = np.arange(n)
+        count_loop = 0
+
+        while active.size:
+            velocities = self.velocities[active]
+            speeds = np.linalg.norm(velocities, axis=1)
+            if self.check_condition == 'time':
+                displacements = velocities * remaining[active, None]
+                flight_times = remaining[active]
+            else:
+                displacements = velocities / speeds[:, None] * remaining[active, None]
+                flight_times = remaining[active] / speeds
+
+            seg_ids, fractions, positions, corner_normals = self.resolver.advance(self.positions[active], displacements)
+            collided = seg_ids >= 0
+            self.positions[active] = positions
+            traveled_time[active] += fractions * flight_times
+            remaining[active] -= fractions * remaining[active]
+            self.check_current_segment_collision(active[collided], seg_ids[collided], corner_normals[collided])
+
+            count_loop += 1
+            finished = remaining[active] <= self.tolerance
+            if count_loop >= MAX_LOOP:
+                truncated[active[~finished]] = True
+                break
+            active = active[~finished]
+
+        return traveled_time, truncated
+
+
+    def check_current_segment_collision(
+            self, particle_ids: np.ndarray, seg_ids: np.ndarray, corner_normals: np.ndarray = None
+    ):
+        """
+        Count boundary collisions, compute current elements crossings and mirror or teleport macro-particles
+
+        :param particle_ids: collided macro-particles
+        :param seg_ids: collided segments
+        :param corner_normals: second mirror normals of corner hits (see BoundaryResolver.advance)
+        :return: None
+        """
+        self.collisions_count += len(particle_ids)
+        roles = self.seg_roles[seg_ids]
+        direct = particle_ids[roles == DIRECT]
+        reverse = particle_ids[roles == REVERSE]
+        walls = roles == WALL
+        self.particles_counter += self.particle.density * (len(direct) - len(reverse))
+        self.contact_crossings += len(direct) + len(reverse)
+        self.wall_hits += int(np.count_nonzero(walls))
+        self.teleport_particles(direct, 'reverse')
+        self.teleport_particles(reverse, 'direct')
+        velocities = mirror_vectors(self.velocities[particle_ids[walls]], self.topology.seg_normals[seg_ids[walls]])
+        if corner_normals is not None:
+            velocities = self.resolver.corner_mirror(velocities, corner_normals[walls])
+        self.velocities[particle_ids[walls]] = velocities
+
+
+    def teleport_particles(self, particle_ids: np.ndarray, element: str):
+        """
+        Teleport macro-particles to random positions in opposite current segments (uniform along the group)
+
+        :param particle_ids: macro-particles to be teleported
+        :param element: segment current group (i.e. 'direct' or 'reverse')
+        :return: None
+        """
+        if not len(particle_ids):
+            return
+        self.positions[particle_ids] = self.topology.sample_current_positions(
+            element, len(particle_ids), uniforms=self.particle_streams.uniform(particle_ids, 3)
+        )
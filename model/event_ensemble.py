@@ -0,0 +1,108 @@
+import numpy as np
+
+from skgeom import Vector2
+from model.ensemble import Ensemble
+from model.system import MAX_LOOP
+from model.particle import Particle
+from model.topology import Topology
+from model.material import Material
+from utils.current_statistics import DEFAULT_CONFIDENCE, DEFAULT_BATCH_SIZE, DEFAULT_MIN_BATCHES, DEFAULT_TRACE_POINTS
+
+
+class EventEnsemble(Ensemble):
+    def __init__(
+            self,
+            particle: Particle,
+            topology: Topology,
+            material: Material,
+            electric_field: Vector2,
+            check_condition: str,
+            number_of_particles: int = None,
+            max_collisions: float = np.inf,
+            max_time_steps: float = np.inf,
+            rel_error: float = None,
+            abs_error: float = None,
+            confidence: float = DEFAULT_CONFIDENCE,
+            batch_size: int = DEFAULT_BATCH_SIZE,
+            min_batches: int = DEFAULT_MIN_BATCHES,
+            trace_points: int = DEFAULT_TRACE_POINTS,
+            trace_file: str = None,
+            geometry: str = 'float',
+            profile_file: str = None,
+            profile_trace: bool = False
+    ):
+        """
+        Event driven ensemble system: each free flight is an exact parabola under the electric field. The earliest
+        boundary crossing is solved in closed form and the particle jumps straight to the next event (wall mirror,
+        contact teleport or scattering), so there is no path shrinking. Boundary events are resolved by
+        BoundaryResolver (inward offset, corners and outside fallback) and flights stop after MAX_LOOP events.
+        The acceleration is the field force per mass (drift velocity / relaxation time). Flights last the relaxation
+        time, or mean free path / Fermi velocity with the 'distance' check condition. Parameters are the same of
+        Ensemble
+        """
+        super().__init__(
+            particle, topology, material, electric_field, check_condition, number_of_particles, max_collisions,
+            max_time_steps, rel_error, abs_error, confidence, batch_size, min_batches, trace_points, trace_file,
+            geometry='float', profile_file=profile_file, profile_trace=profile_trace
+        )
+        self.acceleration = self.drift_velocity() / self.relax_time
+        if self.check_condition == 'time':
+            self.flight_time = self.relax_time
+        else:
+            self.flight_time = self.material.mean_free_path / self.particle.scalar_fermi_velocity
+
+
+    def set_velocities(self):
+        """
+        Set macro-particles initial velocities. Under a constant acceleration a, the mean velocity of a flight of
+        duration T is v0 + a * T / 2. Initial velocities are random Fermi velocities plus drift velocity minus
+        a * T / 2, so flights move on average with Fermi plus drift velocity, the drift_velocity contract of the other
+        engines (v0 = Fermi + drift / 2 for the 'time' check condition)
+
+        :return: None
+        """
+        fermi_velocities = self.random_directions() * self.particle.scalar_fermi_velocity
+        self.velocities = fermi_velocities + self.drift_velocity() - 0.5 * self.acceleration * self.flight_time
+
+
+    def simulate_drude(self) -> tuple[np.ndarray, np.ndarray]:
+        """
+        Simulate one Drude event (free flight) for all macro-particles, event by event
+
+        :return: traveled time of each macro-particle
+        :return: boolean array indicating macro-particles whose flight was truncated at the maximum loop iterations
+        """
+        n = self.number_of_particles
+        remaining = np.full(n, self.flight_time)
+        traveled_time = np.zeros(n)
+        truncated = np.zeros(n, dtype=bool)
+        active = np.arange(n)
+        count_loop = 0
+
+        while active.size:
+            origins = self.positions[active]
+            seg_ids, event_times = self.topology.first_parabolic_crossings(
+                origins, self.velocities[active], self.acceleration, remaining[active]
+            )
+            collided = seg_ids >= 0
+            times = np.where(collided, event_times, remaining[active])[:, None]
+            self.positions[active] += self.velocities[active] * times + 0.5 * self.acceleration * times ** 2
+            self.velocities[active] += self.acceleration * times
+            traveled_time[active] += times[:, 0]
+            remaining[active] -= times[:, 0]
+
+            hits = active[collided]
+            if not hits.size:
+                break
+            seg_ids, self.positions[hits], corner_normals = self.resolver.settle(
+                seg_ids[collided], self.positions[hits], origins[collided], self.velocities[hits]
+            )
+            self.check_current_segment_collision(hits, seg_ids, corner_normals)
+
+            count_loop += 1
+            if count_loop >= MAX_LOOP:
+                truncated[hits] = True
+                break
+            active = hits
+
+        return traveled_time, truncated
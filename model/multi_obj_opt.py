@@ -3,20 +3,13 @@ import time
 import numpy as np
 
 from datetime import date
+from functools import partial
+from concurrent.futures import ProcessPoolExecutor
 from model.optimizer import Optimizer
 from model.material import Material
 from model.particle import Particle
-
-from pymoo.optimize import minimize
-from pymoo.operators.mutation.pm import PM
-from pymoo.algorithms.moo.nsga2 import NSGA2
-from pymoo.operators.crossover.sbx import SBX
-from pymoo.termination import get_termination
-from pymoo.visualization.scatter import Scatter
-from pymoo.problems.functional import FunctionalProblem
-from pymoo.operators.repair.rounding import RoundingRepair
-from pymoo.operators.sampling.rnd import IntegerRandomSampling
-from pymoo.operators.sampling.rnd import FloatRandomSampling
+from utils.geometry_template import compile_expression
+from utils.post_processing import plot_mode, get_pyplot
 
 
 class MultiObjOpt(Optimizer):
@@ -27,25 +20,38 @@ class MultiObjOpt(Optimizer):
             **params, material=material, particle_model=particle_model, convergence=convergence, scale=scale
         )
         self.n_var = len(self.boundaries[0])
-        self.obj_funcs = self.choose_objective_funcs()
+        self.methods = self.choose_objective_methods()
 
 
-    def choose_objective_funcs(self):
-        obj_funcs = list()
-        if "ZBI" in self.objectives["methods"]:
-            obj_funcs.append(self.zero_voltage_imp)
-        if "ZBR" in self.objectives["methods"]:
-            obj_funcs.append(self.zero_bias_responsivity)
+    def choose_objective_methods(self):
         if "ASY" in self.objectives["methods"]:
-            obj_funcs.append(self.asymmetry)
-        return obj_funcs
+            raise Exception('Asymmetry objective is not implemented')
+        return [method for method in self.objective_funcs.keys() if method in self.objectives["methods"]]
 
 
     def optimize(self):
-        problem = FunctionalProblem(
+        if self.workers != 1:
+            with ProcessPoolExecutor(max_workers=self.workers) as executor:
+                return self._optimize(executor.map)
+        return self._optimize(map)
+
+
+    def _optimize(self, map_func):
+        # pymoo is imported only by the optimizing process (workers unpickle this class without it)
+        from pymoo.optimize import minimize
+        from pymoo.operators.mutation.pm import PM
+        from pymoo.algorithms.moo.nsga2 import NSGA2
+        from pymoo.operators.crossover.sbx import SBX
+        from pymoo.termination import get_termination
+        from pymoo.operators.repair.rounding import RoundingRepair
+        from pymoo.operators.sampling.rnd import IntegerRandomSampling
+        from model.batch_problem import BatchProblem
+
+        problem = BatchProblem(
             self.n_var,
-            self.obj_funcs,
-            constr_ieq=self.consts,
+            partial(self.evaluate_population, methods=self.methods, map_func=map_func),
+            len(self.methods),
+            consts=self.consts,
             xl=self.boundaries[0],
             xu=self.boundaries[1],
             callback=self.save_current_iter
@@ -61,7 +67,8 @@ class MultiObjOpt(Optimizer):
         termination = get_termination("n_gen", self.max_iter)
 
         exec_time = time.time()
-        res = minimize(problem, algorithm, termination, seed=1, save_history=False, verbose=True)
+        seed = 1 if self.seed is None else self.seed
+        res = minimize(problem, algorithm, termination, seed=seed, save_history=False, verbose=True)
         result = res
         exec_time = time.time() - exec_time
         self.plot_pareto(res)
@@ -71,17 +78,26 @@ class MultiObjOpt(Optimizer):
 
     @staticmethod
     def plot_pareto(res):
+        mode = plot_mode()
+        if mode == 'off':
+            return
+        get_pyplot()
+        from pymoo.visualization.scatter import Scatter
+
         plot = Scatter()
         # plot.add(problem.pareto_front(), plot_type="line", color="black", alpha=0.7)
         plot.add(res.F, facecolor="none", edgecolor="red")
-        plot.show()
+        if mode == 'interactive':
+            plot.show()
+        else:
+            plot.save(f'outputs/optimization/{date.today()}.png')
 
 
     @staticmethod
     def constraints(consts: list):
         consts_list = list()
         for const in consts:
-            consts_list.append(eval(const))
+            consts_list.append(compile_expression(const))
         return consts_list
 
 
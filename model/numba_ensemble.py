@@ -0,0 +1,412 @@
+import numpy as np
+
+from skgeom import Vector2
+from model.ensemble import Ensemble
+from model.system import MAX_LOOP
+from model.particle import Particle
+from model.topology import Topology, WALL, DIRECT
+from model.boundary_resolver import GRAZING_COSINE, PARALLEL_COSINE
+from model.material import Material
+from utils.vectorized_operations import PARAM_TOLERANCE
+from utils.probabilistic_operations import (
+    random_int_number, HASH_INCREMENT, HASH_MULTIPLIER_1, HASH_MULTIPLIER_2, HASH_TO_UNIT
+)
+from utils.current_statistics import DEFAULT_CONFIDENCE, DEFAULT_BATCH_SIZE, DEFAULT_MIN_BATCHES, DEFAULT_TRACE_POINTS
+
+try:
+    from numba import njit, prange
+    NUMBA_AVAILABLE = True
+except ImportError:
+    NUMBA_AVAILABLE = False
+    prange = range
+
+    def njit(*args, **kwargs):
+        return lambda func: func
+
+
+@njit(cache=True)
+def hash_uniform(key: np.uint64, particle: int, counter: int) -> float:
+    """
+    Counter-based uniform number in [0, 1) (splitmix64 finalizer of key, particle and draw counter, see
+    hash_uniforms). Draws do not depend on thread scheduling, so parallel kernels are reproducible
+
+    :param key: step key
+    :param particle: particle index
+    :param counter: particle draw counter
+    :return: uniform number
+    """
+    x = key ^ (np.uint64(particle) * HASH_INCREMENT)
+    x = x + np.uint64(counter + 1) * HASH_MULTIPLIER_2
+    x = (x ^ (x >> np.uint64(30))) * HASH_MULTIPLIER_1
+    x = (x ^ (x >> np.uint64(27))) * HASH_MULTIPLIER_2
+    x = x ^ (x >> np.uint64(31))
+    return (x >> np.uint64(11)) * HASH_TO_UNIT
+
+
+@njit(cache=True)
+def path_param(
+        p_x: float,
+        p_y: float,
+        d_x: float,
+        d_y: float,
+        seg_id: int,
+        seg_starts: np.ndarray,
+        seg_directions: np.ndarray,
+        seg_normals: np.ndarray,
+        param_tolerance: float
+) -> float:
+    """
+    Calculate path parameter of the crossing (from inside to outside) between path p + s * d and one segment
+
+    :param p_x: path origin x
+    :param p_y: path origin y
+    :param d_x: path displacement x
+    :param d_y: path displacement y
+    :param seg_id: segment id
+    :param seg_starts: segments source points (m, 2)
+    :param seg_directions: segments directions (m, 2)
+    :param seg_normals: segments unit outward normals (m, 2)
+    :param param_tolerance: path and segment parameters tolerance
+    :return: path parameter s (inf if there is no crossing)
+    """
+    if d_x * seg_normals[seg_id, 0] + d_y * seg_normals[seg_id, 1] <= 0:
+        return np.inf
+    e_x = seg_directions[seg_id, 0]
+    e_y = seg_directions[seg_id, 1]
+    denominator = d_x * e_y - d_y * e_x
+    if denominator == 0:
+        return np.inf
+    r_x = seg_starts[seg_id, 0] - p_x
+    r_y = seg_starts[seg_id, 1] - p_y
+    param = (r_x * e_y - r_y * e_x) / denominator
+    seg_param = (r_x * d_y - r_y * d_x) / denominator
+    if -param_tolerance <= param <= 1 and -param_tolerance <= seg_param <= 1 + param_tolerance:
+        return max(param, 0.0)
+    return np.inf
+
+
+@njit(cache=True)
+def first_crossing(
+        p_x: float,
+        p_y: float,
+        d_x: float,
+        d_y: float,
+        seg_starts: np.ndarray,
+        seg_directions: np.ndarray,
+        seg_normals: np.ndarray,
+        grid_low: np.ndarray,
+        cell_size: float,
+        grid_shape: np.ndarray,
+        cell_offsets: np.ndarray,
+        cell_items: np.ndarray,
+        param_tolerance: float
+) -> tuple:
+    """
+    Calculate the first segment crossed by path p + s * d, 0 <= s <= 1, walking through the SegmentGrid cells
+    crossed by the path (DDA traversal, as SegmentGrid.first_hits), so only segments close to the path are tested
+
+    :param p_x: path origin x
+    :param p_y: path origin y
+    :param d_x: path displacement x
+    :param d_y: path displacement y
+    :param seg_starts: segments source points (m, 2)
+    :param seg_directions: segments directions (m, 2)
+    :param seg_normals: segments unit outward normals (m, 2)
+    :param grid_low: grid lower corner (2,)
+    :param cell_size: grid cell size
+    :param grid_shape: grid number of cells of each axis (2,)
+    :param cell_offsets: cells offsets of the segments lists (compressed sparse row layout) (n_cells + 1,)
+    :param cell_items: concatenated segments ids of the cells
+    :param param_tolerance: path and segment parameters tolerance
+    :return: first crossed segment id (-1 if there is no crossing)
+    :return: path parameter s of the crossing (inf if there is no crossing)
+    """
+    c_x = min(max(int(np.floor((p_x - grid_low[0]) / cell_size)), 0), grid_shape[0] - 1)
+    c_y = min(max(int(np.floor((p_y - grid_low[1]) / cell_size)), 0), grid_shape[1] - 1)
+    step_x = 1 if d_x >= 0 else -1
+    step_y = 1 if d_y >= 0 else -1
+    t_max_x = np.inf
+    t_max_y = np.inf
+    t_delta_x = np.inf
+    t_delta_y = np.inf
+    if d_x != 0:
+        t_max_x = (grid_low[0] + (c_x + (step_x > 0)) * cell_size - p_x) / d_x
+        t_delta_x = cell_size / abs(d_x)
+    if d_y != 0:
+        t_max_y = (grid_low[1] + (c_y + (step_y > 0)) * cell_size - p_y) / d_y
+        t_delta_y = cell_size / abs(d_y)
+
+    while True:
+        cell = c_y * grid_shape[0] + c_x
+        lowest = np.inf
+        seg_id = -1
+        for k in range(cell_offsets[cell], cell_offsets[cell + 1]):
+            param = path_param(
+                p_x, p_y, d_x, d_y, cell_items[k], seg_starts, seg_directions, seg_normals, param_tolerance
+            )
+            if param < lowest:
+                lowest = param
+                seg_id = cell_items[k]
+        cell_exit = min(t_max_x, t_max_y)
+        if seg_id >= 0 and lowest <= min(cell_exit, 1.0):
+            return seg_id, lowest
+        if cell_exit > 1:
+            return -1, np.inf
+        if t_max_x <= t_max_y:
+            c_x += step_x
+            t_max_x += t_delta_x
+        else:
+            c_y += step_y
+            t_max_y += t_delta_y
+        if c_x < 0 or c_y < 0 or c_x >= grid_shape[0] or c_y >= grid_shape[1]:
+            return -1, np.inf
+
+
+@njit(parallel=True, cache=True)
+def drude_step(
+        positions: np.ndarray,
+        velocities: np.ndarray,
+        free_flight: float,
+        time_condition: bool,
+        tolerance: float,
+        seg_starts: np.ndarray,
+        seg_directions: np.ndarray,
+        seg_normals: np.ndarray,
+        seg_lengths: np.ndarray,
+        seg_prev: np.ndarray,
+        seg_next: np.ndarray,
+        seg_roles: np.ndarray,
+        grid_low: np.ndarray,
+        cell_size: float,
+        grid_shape: np.ndarray,
+        cell_offsets: np.ndarray,
+        cell_items: np.ndarray,
+        direct_ids: np.ndarray,
+        direct_prob: np.ndarray,
+        direct_alias: np.ndarray,
+        reverse_ids: np.ndarray,
+        reverse_prob: np.ndarray,
+        reverse_alias: np.ndarray,
+        key: np.uint64,
+        max_loop: int,
+        event_tolerance: float,
+        param_tolerance: float
+):
+    """
+    Simulate one Drude event (free flight) of every macro-particle: path, first boundary crossing (SegmentGrid
+    traversal, see first_crossing), specular mirror on walls and teleport on current segments. Boundary events follow
+    BoundaryResolver (exact crossing, inward offset of event_tolerance, corner hits with contact priority and double
+    mirror). Positions and velocities are updated in place
+
+    :param positions: macro-particles positions (n, 2)
+    :param velocities: macro-particles velocities, drift included (n, 2)
+    :param free_flight: free flight length (relaxation time or mean free path, according time_condition)
+    :param time_condition: True if free flight is measured in time, False if in distance
+    :param tolerance: remaining free flight considered null
+    :param seg_starts: segments source points (m, 2)
+    :param seg_directions: segments directions (m, 2)
+    :param seg_normals: segments unit outward normals (m, 2)
+    :param seg_lengths: segments lengths (m,)
+    :param seg_prev: previous segment sharing each segment source point (-1 if not found) (m,)
+    :param seg_next: next segment sharing each segment target point (-1 if not found) (m,)
+    :param seg_roles: segments roles (WALL, DIRECT or REVERSE) (m,)
+    :param grid_low: segment grid lower corner (2,)
+    :param cell_size: segment grid cell size
+    :param grid_shape: segment grid number of cells of each axis (2,)
+    :param cell_offsets: segment grid cells offsets (n_cells + 1,)
+    :param cell_items: segment grid concatenated segments ids
+    :param direct_ids: direct current segments indexes (not empty)
+    :param direct_prob: direct segments alias table acceptance probabilities (length weighted)
+    :param direct_alias: direct segments alias table aliases
+    :param reverse_ids: reverse current segments indexes (not empty)
+    :param reverse_prob: reverse segments alias table acceptance probabilities (length weighted)
+    :param reverse_alias: reverse segments alias table aliases
+    :param key: step random key (see hash_uniform)
+    :param max_loop: maximum boundary crossings of one free flight (the flight is truncated beyond it)
+    :param event_tolerance: distance kept between particles and the boundary after an event
+    :param param_tolerance: path and segment parameters tolerance
+    :return: traveled time of each macro-particle (n,)
+    :return: boolean array indicating macro-particles whose flight was truncated at the maximum loop iterations (n,)
+    :return: net current crossings of each macro-particle (direct - reverse) (n,)
+    :return: contact crossings of each macro-particle (direct + reverse) (n,)
+    :return: boundary collisions of each macro-particle (n,)
+    :return: corner hits of each macro-particle (n,)
+    :return: grazing hits of each macro-particle (n,)
+    """
+    n = positions.shape[0]
+    traveled_time = np.zeros(n)
+    truncated = np.zeros(n, dtype=np.bool_)
+    crossings = np.zeros(n, dtype=np.int64)
+    contacts = np.zeros(n, dtype=np.int64)
+    collisions = np.zeros(n, dtype=np.int64)
+    corners = np.zeros(n, dtype=np.int64)
+    grazing = np.zeros(n, dtype=np.int64)
+
+    for i in prange(n):
+        p_x = positions[i, 0]
+        p_y = positions[i, 1]
+        v_x = velocities[i, 0]
+        v_y = velocities[i, 1]
+        remaining = free_flight
+        count_loop = 0
+        counter = 0
+        while remaining > tolerance:
+            if time_condition:
+                d_x = v_x * remaining
+                d_y = v_y * remaining
+                flight_time = remaining
+            else:
+                speed = np.sqrt(v_x * v_x + v_y * v_y)
+                d_x = v_x / speed * remaining
+                d_y = v_y / speed * remaining
+                flight_time = remaining / speed
+
+            seg_id, lowest = first_crossing(
+                p_x, p_y, d_x, d_y, seg_starts, seg_directions, seg_normals, grid_low, cell_size, grid_shape,
+                cell_offsets, cell_items, param_tolerance
+            )
+
+            fraction = lowest if seg_id >= 0 else 1.0
+            p_x += fraction * d_x
+            p_y += fraction * d_y
+            traveled_time[i] += fraction * flight_time
+            remaining -= fraction * remaining
+
+            if seg_id >= 0:
+                collisions[i] += 1
+                n_x = seg_normals[seg_id, 0]
+                n_y = seg_normals[seg_id, 1]
+                if d_x * n_x + d_y * n_y < GRAZING_COSINE * np.sqrt(d_x * d_x + d_y * d_y):
+                    grazing[i] += 1
+                along = ((p_x - seg_starts[seg_id, 0]) * seg_directions[seg_id, 0] +
+                         (p_y - seg_starts[seg_id, 1]) * seg_directions[seg_id, 1]) / seg_lengths[seg_id]
+                neighbour = -1
+                if along <= event_tolerance:
+                    neighbour = seg_prev[seg_id]
+                elif seg_lengths[seg_id] - along <= event_tolerance:
+                    neighbour = seg_next[seg_id]
+                c_x = 0.0
+                c_y = 0.0
+                if neighbour >= 0 and n_x * seg_normals[neighbour, 0] + n_y * seg_normals[neighbour, 1] < \
+                        PARALLEL_COSINE:
+                    corners[i] += 1
+                    if seg_roles[seg_id] == WALL and seg_roles[neighbour] != WALL:
+                        seg_id, neighbour = neighbour, seg_id
+                        n_x = seg_normals[seg_id, 0]
+                        n_y = seg_normals[seg_id, 1]
+                    c_x = seg_normals[neighbour, 0]
+                    c_y = seg_normals[neighbour, 1]
+                inward_x = n_x + c_x
+                inward_y = n_y + c_y
+                inward_length = np.sqrt(inward_x * inward_x + inward_y * inward_y)
+                if inward_length > 0:
+                    p_x -= event_tolerance * inward_x / inward_length
+                    p_y -= event_tolerance * inward_y / inward_length
+                role = seg_roles[seg_id]
+                targets = reverse_ids if role == DIRECT else direct_ids
+                if role != WALL:
+                    crossings[i] += 1 if role == DIRECT else -1
+                    contacts[i] += 1
+                    prob = reverse_prob if role == DIRECT else direct_prob
+                    alias = reverse_alias if role == DIRECT else direct_alias
+                    column = min(int(hash_uniform(key, i, counter) * targets.shape[0]), targets.shape[0] - 1)
+                    if hash_uniform(key, i, counter + 1) >= prob[column]:
+                        column = alias[column]
+                    chosen = targets[column]
+                    u = hash_uniform(key, i, counter + 2)
+                    counter += 3
+                    p_x = seg_starts[chosen, 0] + u * seg_directions[chosen, 0]
+                    p_y = seg_starts[chosen, 1] + u * seg_directions[chosen, 1]
+                else:
+                    dot = v_x * n_x + v_y * n_y
+                    v_x -= 2 * dot * n_x
+                    v_y -= 2 * dot * n_y
+                    dot = v_x * c_x + v_y * c_y
+                    if dot > 0:
+                        v_x -= 2 * dot * c_x
+                        v_y -= 2 * dot * c_y
+
+            count_loop += 1
+            if count_loop >= max_loop and remaining > tolerance:
+                truncated[i] = True
+                break
+
+        positions[i, 0] = p_x
+        positions[i, 1] = p_y
+        velocities[i, 0] = v_x
+        velocities[i, 1] = v_y
+
+    return traveled_time, truncated, crossings, contacts, collisions, corners, grazing
+
+
+class NumbaEnsemble(Ensemble):
+    def __init__(
+            self,
+            particle: Particle,
+            topology: Topology,
+            material: Material,
+            electric_field: Vector2,
+            check_condition: str,
+            number_of_particles: int = None,
+            max_collisions: float = np.inf,
+            max_time_steps: float = np.inf,
+            rel_error: float = None,
+            abs_error: float = None,
+            confidence: float = DEFAULT_CONFIDENCE,
+            batch_size: int = DEFAULT_BATCH_SIZE,
+            min_batches: int = DEFAULT_MIN_BATCHES,
+            trace_points: int = DEFAULT_TRACE_POINTS,
+            trace_file: str = None,
+            geometry: str = 'float',
+            profile_file: str = None,
+            profile_trace: bool = False
+    ):
+        """
+        Ensemble system whose free flights run in a numba compiled kernel (parallel across macro-particles) over plain
+        float arrays. Parameters are the same of Ensemble
+        """
+        if not NUMBA_AVAILABLE:
+            raise Exception('numba engine requires the numba package')
+        super().__init__(
+            particle, topology, material, electric_field, check_condition, number_of_particles, max_collisions,
+            max_time_steps, rel_error, abs_error, confidence, batch_size, min_batches, trace_points, trace_file,
+            geometry='float', profile_file=profile_file, profile_trace=profile_trace
+        )
+        self.seg_starts = np.ascontiguousarray(self.topology.seg_starts, dtype=np.float64)
+        self.seg_directions = np.ascontiguousarray(self.topology.seg_directions, dtype=np.float64)
+        self.seg_normals = np.ascontiguousarray(self.topology.seg_normals, dtype=np.float64)
+        self.seg_lengths = np.where(self.topology.seg_lengths > 0, self.topology.seg_lengths, 1)
+        self.alias_tables = dict()
+        for group, sampler in self.topology.current_samplers.items():
+            if sampler is None:
+                raise Exception(f'numba engine requires {group} current segments')
+            self.alias_tables[group] = (self.current_ids[group], sampler.prob, sampler.alias)
+        grid = self.topology.index
+        self.grid = (
+            np.ascontiguousarray(grid.low, dtype=np.float64), float(grid.cell_size), grid.shape.astype(np.int64),
+            grid.cell_offsets.astype(np.int64), grid.cell_items.astype(np.int64)
+        )
+
+
+    def simulate_drude(self) -> tuple[np.ndarray, np.ndarray]:
+        """
+        Simulate one Drude event (free flight) for all macro-particles with the compiled kernel
+
+        :return: traveled time of each macro-particle
+        :return: boolean array indicating macro-particles whose flight was truncated at the maximum loop iterations
+        """
+        key = np.uint64(random_int_number(0, 2 ** 53 - 1))
+        traveled_time, truncated, crossings, contacts, collisions, corners, grazing = drude_step(
+            self.positions, self.velocities, self.free_flight, self.check_condition == 'time', self.tolerance,
+            self.seg_starts, self.seg_directions, self.seg_normals, self.seg_lengths, self.topology.seg_prev,
+            self.topology.seg_next, self.seg_roles, *self.grid, *self.alias_tables['direct'],
+            *self.alias_tables['reverse'], key,
+            MAX_LOOP, self.resolver.tolerance, PARAM_TOLERANCE
+        )
+        self.collisions_count += int(collisions.sum())
+        self.particles_counter += self.particle.density * int(crossings.sum())
+        self.contact_crossings += int(contacts.sum())
+        self.wall_hits += int(collisions.sum() - contacts.sum())
+        self.resolver.fallbacks['corner'] += int(corners.sum())
+        self.resolver.fallbacks['grazing'] += int(grazing.sum())
+        return traveled_time, truncated
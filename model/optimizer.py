@@ -1,10 +1,15 @@
 import numpy as np
 
 from datetime import datetime
+from functools import partial
 from model.material import Material
 from model.particle import Particle
 from model.topology import Topology
 from simulators.monte_carlo import monte_carlo
+from utils.evaluation_cache import EvaluationCache
+from utils.geometry_template import GeometryTemplate
+from utils.post_processing import ProgressReporter
+from utils.probabilistic_operations import seed_generators, spawn_seeds
 
 
 class Optimizer:
@@ -18,19 +23,38 @@ class Optimizer:
             material: Material,
             particle_model: Particle,
             convergence: dict,
-            scale: float
+            scale: float,
+            workers: int = 1,
+            cache: dict = None,
+            seed: int = None
     ):
         self.pop_size = pop_size
         self.max_iter = max_iter
         self.material = material
         self.scale = scale
-        self.result = tuple()
         self.geo_mask = geo_mask
+        self.geo_template = GeometryTemplate(geo_mask)
         self.cur_segments = cur_segments
         self.particle_m = particle_model
         self.convergence = convergence
         self.objectives = objectives
+        self.workers = workers
+        self.seed = seed
+        self.cache = EvaluationCache(**cache) if cache is not None else None
         self.derivative_tech = self.def_derivative_technique()
+        self.objective_funcs = {'ZBI': self.impedance, 'ZBR': self.inverse_responsivity}
+
+
+    def __getstate__(self) -> dict:
+        """
+        Get picklable optimizer state, used to evaluate objectives in worker processes. Constraints are evaluated
+        only by the main process
+
+        :return: optimizer state
+        """
+        state = self.__dict__.copy()
+        state.pop('consts', None)
+        return state
 
 
     def def_derivative_technique(self):
@@ -40,59 +64,221 @@ class Optimizer:
             return self.numerical_derivatives_zero_bias
 
 
-    def build_geometry(self, dimensions):
-        n_dim = len(dimensions)
-        geo_mask = self.geo_mask
-        for i in range(n_dim):
-            geo_mask = [
-                list(
-                    map(
-                        lambda x: x.replace(f'x{i}', str(dimensions[i]))
-                        if (isinstance(x, str) and f'x{i}' in x) else x, points_list
-                    )
-                ) for points_list in geo_mask
-            ]
-        geo_mask = list([*map(lambda x: eval(x) if isinstance(x, str) else x, points_list)] for points_list in geo_mask)
-        return [geo_mask]
-
-
-    def zero_voltage_imp(self, dimensions):
-        if ("method" in self.objectives.keys()) or (self.objectives["methods"][0] == "ZBI"):
-            self.result = self.run_specific_points(dimensions)
-        current_first_derivative, _ = self.derivative_tech(self.result[0], self.result[1])
-        impedance = 1 / current_first_derivative
-        return impedance
-
-
-    def zero_bias_responsivity(self, dimensions):
-        if ("method" in self.objectives.keys()) or (self.objectives["methods"][0] == "ZBR"):
-            self.result = self.run_specific_points(dimensions)
-        current_first_derivative, current_second_derivative = self.derivative_tech(self.result[0], self.result[1])
-        responsivity = current_second_derivative / (2 * current_first_derivative)
-        return 1 / np.abs(responsivity)
+    def build_geometry(self, dimensions) -> list:
+        """
+        Build topology points of one parameters vector
+
+        :param dimensions: geometry parameters
+        :return: topology points (one polygon)
+        """
+        return [self.geo_template.build(dimensions)[0].tolist()]
+
+
+    def build_geometries(self, population) -> tuple[np.ndarray, np.ndarray]:
+        """
+        Build vertices of a whole population in one operation and validate them in bulk
+
+        :param population: geometry parameters matrix (pop, n_params)
+        :return: vertices array (pop, n_points, 2)
+        :return: feasibility of each geometry (pop)
+        """
+        vertices = self.geo_template.build(population)
+        return vertices, self.geo_template.feasible(vertices)
 
 
     def asymmetry(self, dimensions):
         pass
 
 
+    def evaluate(self, dimensions, methods: list) -> list:
+        """
+        Run geometry simulation once and calculate all requested objectives. Does not change optimizer state, so it
+        can be called concurrently
+
+        :param dimensions: geometry parameters
+        :param methods: objectives methods (i.e. 'ZBI', 'ZBR')
+        :return: objectives values (same order of methods)
+        """
+        current, voltage = self.run_specific_points(dimensions)
+        return self.evaluate_currents(current, voltage, methods)
+
+
+    def objective(self, method: str, dimensions) -> float:
+        """
+        Calculate one objective (reentrant and picklable through functools.partial)
+
+        :param method: objective method (i.e. 'ZBI', 'ZBR')
+        :param dimensions: geometry parameters
+        :return: objective value
+        """
+        return self.evaluate(dimensions, [method])[0]
+
+
+    def evaluate_population(self, population, methods: list, map_func=map) -> np.ndarray:
+        """
+        Calculate all requested objectives of a whole population. Geometries are built and validated in bulk and only
+        feasible ones are simulated, distributed by map_func (e.g. a process pool map)
+
+        :param population: geometry parameters matrix (pop, n_params)
+        :param methods: objectives methods (i.e. 'ZBI', 'ZBR')
+        :param map_func: function used to distribute geometries simulation
+        :return: objectives values (pop, n_methods)
+        """
+        population = [self.integer_params(individual) for individual in population]
+        vertices, feasible = self.build_geometries(population)
+        objectives = np.empty((len(population), len(methods)))
+        if not feasible.all():
+            objectives[~feasible] = self.evaluate_currents(*self.null_currents(), methods)
+        indexes = np.flatnonzero(feasible)
+        progress = ProgressReporter(len(indexes), label='Population', unit='geometries', step_interval=1, inline=False)
+        results = map_func(
+            partial(self.evaluate_geometry, methods=methods),
+            [population[i] for i in indexes],
+            [vertices[i].tolist() for i in indexes]
+        )
+        for evaluated, (i, result) in enumerate(zip(indexes, results), 1):
+            objectives[i] = result
+            progress.update(evaluated)
+        return objectives
+
+
+    def evaluate_geometry(self, dimensions: list, topology_points: list, methods: list) -> list:
+        """
+        Simulate an already built geometry and calculate all requested objectives (reentrant and picklable)
+
+        :param dimensions: rounded geometry parameters
+        :param topology_points: geometry points (one polygon)
+        :param methods: objectives methods (i.e. 'ZBI', 'ZBR')
+        :return: objectives values (same order of methods)
+        """
+        current, voltage = self.simulate_geometry(dimensions, [topology_points])
+        return self.evaluate_currents(current, voltage, methods)
+
+
+    def evaluate_currents(self, current, voltage, methods: list) -> list:
+        """
+        Calculate objectives from simulated currents
+
+        :param current: simulated currents
+        :param voltage: simulated voltages
+        :param methods: objectives methods (i.e. 'ZBI', 'ZBR')
+        :return: objectives values (same order of methods)
+        """
+        return [self.objective_funcs[method](current, voltage) for method in methods]
+
+
+    def impedance(self, current, voltage) -> float:
+        """
+        Calculate zero bias impedance
+
+        :param current: simulated currents
+        :param voltage: simulated voltages
+        :return: zero bias impedance
+        """
+        current_first_derivative, _ = self.derivative_tech(current, voltage)
+        return 1 / current_first_derivative
+
+
+    def inverse_responsivity(self, current, voltage) -> float:
+        """
+        Calculate inverse of zero bias responsivity absolute value (minimized objective)
+
+        :param current: simulated currents
+        :param voltage: simulated voltages
+        :return: inverse of zero bias responsivity
+        """
+        current_first_derivative, current_second_derivative = self.derivative_tech(current, voltage)
+        responsivity = current_second_derivative / (2 * current_first_derivative)
+        return 1 / np.abs(responsivity)
+
+
     def run_specific_points(self, dimensions):
+        dimensions = self.integer_params(dimensions)
+        vertices, feasible = self.build_geometries([dimensions])
+        if not feasible[0]:
+            return self.null_currents()
+        return self.simulate_geometry(dimensions, [vertices[0].tolist()])
+
+
+    def null_currents(self):
+        """
+        Currents assigned to infeasible geometries (negative coordinates)
+
+        :return: null currents
+        :return: voltages
+        """
+        voltage_range = self.objectives['voltage_range']
+        return [0] * len(voltage_range), voltage_range
+
+
+    def simulate_geometry(self, dimensions: list, topology_points: list):
+        """
+        Simulate geometry currents on every objective voltage (cached when cache is enabled)
+
+        :param dimensions: rounded geometry parameters
+        :param topology_points: geometry points
+        :return: simulated currents
+        :return: simulated voltages
+        """
         voltage = list()
         current = list()
-        voltage_range = self.objectives['voltage_range']
-        dimensions = self.integer_params(dimensions)
-        topology_points = self.build_geometry(dimensions)
-        if any([coord < 0 for point in topology_points[0] for coord in point]):
-            return [0] * len(voltage_range), voltage_range
+        if self.cache is not None:
+            key = self.cache_key(dimensions)
+            cached = self.cache.get(key)
+            if cached is not None:
+                return cached[0], cached[1]
         topology = Topology.from_points(topology_points, self.scale, tuple(self.cur_segments))
-        for volt in voltage_range:
-            e_field, simulation_current, time_steps_count, collisions_count = \
+        seeds = spawn_seeds(self.geometry_seed(dimensions), len(self.objectives['voltage_range']))
+        for volt, point_seed in zip(self.objectives['voltage_range'], seeds):
+            seed_generators(point_seed)
+            e_field, simulation_current, current_error, time_steps_count, collisions_count = \
                 monte_carlo(volt, topology, self.material, self.particle_m, **self.convergence, plot_current=False)
             voltage.append(volt)
             current.append(simulation_current)
+        if self.cache is not None:
+            self.cache.put(key, [current, voltage])
         return current, voltage
 
 
+    def geometry_seed(self, dimensions: list):
+        """
+        Derive geometry simulation seed from optimizer seed and geometry content, so results do not depend on which
+        process evaluates the geometry nor on the evaluation order
+
+        :param dimensions: rounded geometry parameters
+        :return: geometry entropy (None for non-deterministic seed)
+        """
+        if self.seed is None:
+            return None
+        return [self.seed, int(self.cache_key(dimensions)[:16], 16)]
+
+
+    def cache_key(self, dimensions: list) -> str:
+        """
+        Create simulation content address: everything that defines the simulated currents of a geometry
+
+        :param dimensions: rounded geometry parameters
+        :return: cache key
+        """
+        particle = {
+            'density': self.particle_m.density,
+            'drift_method': self.particle_m.drift_method,
+            'effective_mass': self.particle_m.effective_mass,
+            'scalar_fermi_velocity': self.particle_m.scalar_fermi_velocity
+        }
+        return EvaluationCache.make_key(
+            dimensions=dimensions,
+            geo_mask=self.geo_mask,
+            cur_segments=self.cur_segments,
+            scale=self.scale,
+            material=vars(self.material),
+            particle=particle,
+            convergence=self.convergence,
+            voltage=self.objectives['voltage_range'],
+            seed=self.seed
+        )
+
+
     def poly_fit_derivatives_zero_bias(self, current, voltage):
         iv_f = np.poly1d(np.polyfit(voltage, current, self.objectives['poly_order']))
         current_first_derivative = np.polyder(iv_f, 1)
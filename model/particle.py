@@ -1,10 +1,10 @@
 import itertools
 from typing import Union
-from skgeom.draw import draw
 from skgeom import Bbox2, Vector2, Segment2
 from utils.probabilistic_operations import random_vec
 from scipy.constants import elementary_charge, electron_mass
-from utils.complementary_operations import mirror, calc_versor
+from utils.geometry_backends import ExactGeometry
+from utils.post_processing import get_pyplot
 
 
 STOP_CONDITION = 10
@@ -12,6 +12,7 @@ STOP_CONDITION = 10
 
 class Particle:
     id_iter = itertools.count()
+    geometry = ExactGeometry
 
 
     def __init__(self, density: float, drift_method: str, effective_mass: float, fermi_velocity: float, position=None):
@@ -38,6 +39,28 @@ class Particle:
         self.drift_method = drift_method
 
 
+    def __getstate__(self) -> dict:
+        """
+        Get picklable particle state. Runtime kinematic state (exact geometry vectors) is not shipped
+
+        :return: particle state
+        """
+        state = self.__dict__.copy()
+        state.update({'acceleration': None, 'fermi_velocity': None, 'velocity': None, 'position': None})
+        state['positions'] = list()
+        return state
+
+
+    def use_geometry(self, geometry):
+        """
+        Define geometry backend of particle kinematics (vectors created after this call use it)
+
+        :param geometry: geometry backend (see utils.geometry_backends)
+        :return: None
+        """
+        self.geometry = geometry
+
+
     def set_init_position(self, bbox: Bbox2):
         """
         Set particle initial position into box bbox
@@ -47,7 +70,9 @@ class Particle:
         """
         min_range = (bbox.xmin(), bbox.ymin())
         max_range = (bbox.xmax(), bbox.ymax())
-        self.position = Vector2(*random_vec(min_value=min_range, max_value=max_range, is_normalized=False))
+        self.position = self.geometry.vector(
+            *random_vec(min_value=min_range, max_value=max_range, is_normalized=False)
+        )
 
 
     def set_velocity(self):
@@ -56,7 +81,7 @@ class Particle:
 
         :return: None
         """
-        self.fermi_velocity = Vector2(*random_vec()) * self.scalar_fermi_velocity
+        self.fermi_velocity = self.geometry.vector(*random_vec()) * self.scalar_fermi_velocity
         self.velocity = self.fermi_velocity
 
 
@@ -83,7 +108,7 @@ class Particle:
         if check_condition == "time":
             next_pos = self.position + self.velocity * delta_t
         else:
-            next_pos = self.position + calc_versor(self.velocity) * delta_s
+            next_pos = self.position + self.geometry.versor(self.velocity) * delta_s
 
         return next_pos
 
@@ -95,7 +120,7 @@ class Particle:
         :param normal_vec: collided segment normal vector
         :return: mirrored velocity
         """
-        self.velocity = mirror(self.velocity, normal_vec)
+        self.velocity = self.geometry.mirror(self.velocity, normal_vec)
 
 
     def calc_drift_velocity(self, relax_time, electric_field: Vector2, mobility: float) -> None:
@@ -107,12 +132,15 @@ class Particle:
         :param mobility: electronic material mobility
         """
         if self.drift_method == 'relax':
-            self.velocity += self.charge * relax_time * electric_field / self.mass
+            self.velocity = self.velocity + self.charge * relax_time * electric_field / self.mass
         else:
-            self.velocity += -mobility * electric_field
+            self.velocity = self.velocity - mobility * electric_field
 
 
     def plot_traveled_path(self):
+        get_pyplot()
+        from skgeom.draw import draw
+
         pos0 = self.positions[0]
         for pos in self.positions[1:]:
             draw(Segment2(pos0, pos))
@@ -1,11 +1,13 @@
 import time
 import numpy as np
 
+from functools import partial
+
 from model.material import Material
 from model.optimizer import Optimizer
-from scipy.optimize import differential_evolution, NonlinearConstraint
 
 from model.particle import Particle
+from utils.geometry_template import compile_expression
 
 
 class SingleObjOpt(Optimizer):
@@ -21,6 +23,8 @@ class SingleObjOpt(Optimizer):
         self.obj_funcs = self.choose_objective_func()
 
     def optimize(self):
+        from scipy.optimize import differential_evolution
+
         exec_time = time.time()
         result = differential_evolution(
             self.obj_funcs,
@@ -32,26 +36,31 @@ class SingleObjOpt(Optimizer):
             recombination=self.recombination,
             disp=True,
             constraints=self.consts,
-            callback=self.save_current_iter
+            callback=self.save_current_iter,
+            workers=self.workers,
+            seed=self.seed,
+            updating='deferred' if self.workers != 1 else 'immediate'
         )
         exec_time = time.time() - exec_time
         return result, exec_time
 
 
     def choose_objective_func(self):
-        if self.objectives["method"] == "ZBI":
-            return self.zero_voltage_imp
-        elif self.objectives["method"] == "ZBR":
-            return self.zero_bias_responsivity
+        if self.objectives["method"] in self.objective_funcs.keys():
+            return partial(self.objective, self.objectives["method"])
         else:
             return self.asymmetry
 
 
     @staticmethod
     def constraints(consts: list):
+        from scipy.optimize import NonlinearConstraint
+
         consts_set = set()
         for const in consts:
-            nlc = NonlinearConstraint(eval(const[0]), eval(const[1]), eval(const[2]))
+            nlc = NonlinearConstraint(
+                compile_expression(const[0]), compile_expression(const[1]), compile_expression(const[2])
+            )
             consts_set.add(nlc)
         return consts_set
 
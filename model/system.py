@@ -1,4 +1,3 @@
-import matplotlib
 import numpy as np
 
 from math import log10, floor
@@ -7,8 +6,15 @@ from model.topology import Topology
 from model.material import Material
 from skgeom import Vector2, Point2, Segment2
 from scipy.constants import elementary_charge
-from utils.post_processing import progress_bar, plot_stable_current
-from utils.complementary_operations import vec_to_point, point_to_vec, calc_normal, norm, calc_versor
+from utils.post_processing import ProgressReporter, plot_stable_current
+from utils.current_statistics import BatchMeans, CurrentTrace
+from utils.current_statistics import DEFAULT_CONFIDENCE, DEFAULT_BATCH_SIZE, DEFAULT_MIN_BATCHES, DEFAULT_TRACE_POINTS
+from utils.geometry_backends import GEOMETRIES
+from utils.instrumentation import Instrumentation
+from utils.probabilistic_operations import get_stream, use_stream
+from model.topology import WALL, DIRECT, REVERSE
+from model.boundary_resolver import BoundaryResolver
+from utils.complementary_operations import vec_to_point, point_to_vec, norm, calc_versor
 
 
 TEST = False
@@ -17,8 +23,20 @@ TIME_PRECISION = 0.99
 DIST_PRECISION = 1
 SIGNIFICANT_DIGITS = 4
 MAX_LOOP = 200
-MAX_RECONFIG = 200
-matplotlib.use('TkAgg')
+PROFILED_METHODS = {
+    'system': [
+        'calc_closer_intersection', 'check_current_segment_collision', 'teleport_particle', 'teleport_particles',
+        'set_particle_parameters', 'set_velocities'
+    ],
+    'topology': [
+        'intersection_points', 'contains', 'first_intersections', 'first_parabolic_crossings', 'sample_positions',
+        'triangle_positions', 'sample_current_positions'
+    ],
+    'particle': ['set_velocity', 'calc_next_position', 'mirror_particle', 'calc_drift_velocity'],
+    'resolver': ['advance', 'corner_mirror'],
+    'rng': ['uniform', 'scalar'],
+    'particle_rng': ['uniform']
+}
 
 
 class System:
@@ -31,7 +49,17 @@ class System:
             check_condition: str,
             number_of_particles: int = None,
             max_collisions: float = np.inf,
-            max_time_steps: float = np.inf
+            max_time_steps: float = np.inf,
+            rel_error: float = None,
+            abs_error: float = None,
+            confidence: float = DEFAULT_CONFIDENCE,
+            batch_size: int = DEFAULT_BATCH_SIZE,
+            min_batches: int = DEFAULT_MIN_BATCHES,
+            trace_points: int = DEFAULT_TRACE_POINTS,
+            trace_file: str = None,
+            geometry: str = 'exact',
+            profile_file: str = None,
+            profile_trace: bool = False
     ):
         """
         Create system to be simulated (topology + particles + materials + etc.)
@@ -43,27 +71,52 @@ class System:
         :param check_condition: define the method to check the scattering behaviour ('time' or 'distance')
         :param number_of_particles: number of particles (defined by the number of cores if not defined)
         :param max_collisions: defined maximum accepted collisions. Stop criteria
-        :param max_time_steps: defined maximum time steps. Stop criteria [s]
+        :param max_time_steps: defined maximum time steps (free flights of the particle). Stop criteria
+        :param rel_error: target relative error of the current confidence interval. Stop criteria
+        :param abs_error: target absolute error of the current confidence interval. Stop criteria [A]
+        :param confidence: confidence level of the current interval
+        :param batch_size: number of time steps of each current batch
+        :param min_batches: minimum number of batches before checking the target errors
+        :param trace_points: maximum number of stored current trace points (decimated beyond it)
+        :param trace_file: prefix of the files where the full current trace is streamed (not streamed if not defined)
+        :param geometry: geometry backend of particle kinematics and boundary events ('exact' or 'float')
+        :param profile_file: prefix of the files where per-phase timers and counters are saved (not profiled if not
+        defined)
+        :param profile_trace: define if a Chrome trace file is also saved (requires profile_file)
         """
-        self.currents = list()
+        if geometry not in GEOMETRIES:
+            raise Exception(f'Unknown geometry: {geometry}')
+        self.geometry = GEOMETRIES[geometry]
+        particle.use_geometry(self.geometry)
+        self.current_trace = CurrentTrace(trace_points)
+        self.trace_file = trace_file
+        self.profile_file = profile_file
+        self.profile_trace = profile_trace
         self.check_condition = check_condition
 
         self.particle = particle
         self.topology = topology
         self.material = material
-        self.e_field = electric_field
+        self.e_field = self.geometry.convert(electric_field)
         self.relax_time = self.material.relax_time
+        self.resolver = BoundaryResolver(topology)
+        self.stream = get_stream().spawn(1)[0]
 
         self.total_macro_particles = particle.density
         self.particles_counter = 0
         self.collisions_count = 0
         self.time_steps_count = 0
         self.simulated_time = 0
+        self.wall_hits = 0
+        self.contact_crossings = 0
 
         self.max_collisions = max_collisions
         self.collisions_count = 0
         self.max_time_steps = max_time_steps
         self.time_steps_count = 0
+        self.rel_error = rel_error
+        self.abs_error = abs_error
+        self.batch_means = BatchMeans(batch_size, confidence, min_batches)
 
         self.significant_digits_time = -(int(floor(log10(self.material.relax_time)))) + SIGNIFICANT_DIGITS
         self.significant_digits_dist = -(int(floor(log10(self.material.mean_free_path)))) + SIGNIFICANT_DIGITS
@@ -75,15 +128,10 @@ class System:
 
         :return: None
         """
-        self.particle.set_init_position(self.topology.bbox)
-        init_pos = vec_to_point(self.particle.position)
-        _, lowest_dist = self.topology.get_closer_segment(init_pos)
-        while (not self.topology.contains(init_pos)) or (lowest_dist < self.topology.scale / 20):
-            self.particle.set_init_position(self.topology.bbox)
-            init_pos = vec_to_point(self.particle.position)
-            _, lowest_dist = self.topology.get_closer_segment(init_pos)
+        position = self.topology.sample_positions(1, self.topology.scale / 20)[0]
+        self.particle.position = self.geometry.vector(*position)
         if TEST and self.particle.id == followed_particle_id:
-            self.particle.positions.append(init_pos)
+            self.particle.positions.append(Point2(*position))
 
 
     def simulate(self, model, voltage: list, plot_current: bool = True):
@@ -95,26 +143,98 @@ class System:
         :param plot_current: define if stable current will be plotted
         :return: None
         """
-        reconfig_count = 0
-        self.set_particle_parameters()
-        while (not self._stop_conditions()) and (reconfig_count <= MAX_RECONFIG):
-            self.time_steps_count += 1
-            self.particle.set_velocity()
-            traveled_time, loop_condition = model()
-            if loop_condition:
-                self.set_particle_parameters()
-                reconfig_count += 1
-            else:
+        with use_stream(self.stream):
+            profile = self._start_profile()
+            if profile is not None:
+                model = profile.wrap('system.simulate_drude', model)
+            self.set_particle_parameters()
+            self._start_trace(voltage)
+            progress = ProgressReporter(self.max_collisions, label=f"{'%s' % float('%.1g' % voltage)} V")
+            while not self._stop_conditions():
+                self.time_steps_count += 1
+                self.particle.set_velocity()
+                traveled_time, truncated = model()
+                if truncated:
+                    self.resolver.count_truncated()
                 self.simulated_time += traveled_time
+                self.batch_means.add(self.particles_counter, self.simulated_time)
                 if self._stop_conditions():
                     break
-                self.currents.append(self.cal_current())
-                progress_bar(self.collisions_count, self.max_collisions)
-        if reconfig_count > MAX_RECONFIG:
-            raise Exception('Max reconfiguration')
-        if plot_current:
-            plot_stable_current(self.currents, voltage)
-        print('\n')
+                self.current_trace.add(self.cal_current())
+                progress.update(self.collisions_count, self.time_steps_count)
+            progress.close()
+            self.current_trace.close()
+            self._finish_profile(profile, voltage)
+            self._report_fallbacks()
+            if plot_current:
+                plot_stable_current(*self.current_trace.trace(), voltage)
+            print('\n')
+
+
+    def _start_profile(self):
+        """
+        Attach per-phase timers to system, topology, particle, boundary resolver and random stream (if profile_file is
+        defined)
+
+        :return: instrumentation (None if not profiled)
+        """
+        if self.profile_file is None:
+            return None
+        profile = Instrumentation(trace=self.profile_trace)
+        profile.attach(self, PROFILED_METHODS['system'], 'system')
+        profile.attach(self.topology, PROFILED_METHODS['topology'], 'topology')
+        profile.attach(self.particle, PROFILED_METHODS['particle'], 'particle')
+        profile.attach(self.resolver, PROFILED_METHODS['resolver'], 'resolver')
+        profile.attach(get_stream(), PROFILED_METHODS['rng'], 'rng')
+        self._profile_rejections = self.topology.sampling_rejections
+        return profile
+
+
+    def _finish_profile(self, profile, voltage):
+        """
+        Detach timers and save JSON summary (and Chrome trace, if requested) of the simulated voltage point
+
+        :param profile: instrumentation created by _start_profile (nothing is done if None)
+        :param voltage: simulated voltage
+        :return: None
+        """
+        if profile is None:
+            return
+        profile.detach()
+        counters = {
+            'steps': self.time_steps_count,
+            'collisions': self.collisions_count,
+            'wall_hits': self.wall_hits,
+            'contact_crossings': self.contact_crossings,
+            'sampling_rejections': self.topology.sampling_rejections - self._profile_rejections,
+            **{f'fallback_{name}': count for name, count in self.resolver.fallbacks.items()}
+        }
+        file = f"{self.profile_file}{'%s' % float('%.1g' % voltage)}"
+        profile.save(f'{file}.json', counters, voltage=voltage, engine=type(self).__name__, geometry=self.geometry.name)
+        if self.profile_trace:
+            profile.save_trace(f'{file}.trace.json')
+
+
+    def _report_fallbacks(self):
+        """
+        Print how many times each boundary fallback path was used (if any)
+
+        :return: None
+        """
+        fallbacks = {name: count for name, count in self.resolver.fallbacks.items() if count}
+        if fallbacks:
+            print(f'Boundary fallbacks: {fallbacks}')
+
+
+    def _start_trace(self, voltage):
+        """
+        Start streaming the full current trace to file (if trace_file is defined)
+
+        :param voltage: simulated voltage
+        :return: None
+        """
+        if self.trace_file is not None:
+            self.current_trace.stream(f"{self.trace_file}{'%s' % float('%.1g' % voltage)}.csv")
 
 
     def _stop_conditions(self) -> bool:
@@ -126,7 +246,20 @@ class System:
         time_steps_condition = self.time_steps_count > self.max_time_steps
         collisions_condition = self.collisions_count > self.max_collisions
 
-        return time_steps_condition or collisions_condition
+        return time_steps_condition or collisions_condition or self._error_condition()
+
+
+    def _error_condition(self) -> bool:
+        """
+        Calculate if the current confidence interval reached the target relative or absolute error
+
+        :return: error condition
+        """
+        if (self.rel_error is None and self.abs_error is None) or self.simulated_time == 0:
+            return False
+        return self.batch_means.converged(
+            self.cal_current(), self.rel_error, self.abs_error, scale=self.current_factor()
+        )
 
 
     def simulate_drude(self):
@@ -135,6 +268,8 @@ class System:
 
         :return: None
         """
+        if self.geometry.name == 'float':
+            return self.simulate_drude_float()
         self.particle.calc_drift_velocity(self.relax_time, self.e_field, self.material.mobility)
         count_loop = 0
 
@@ -146,19 +281,97 @@ class System:
         while not (stop_conditions or loop_cond):
             traveled_path = self.calc_traveled_path(remaining_time, remaining_dist)
             intersection_points = self.topology.intersection_points(traveled_path)
-            lowest_time_to_collision, lowest_dist_to_collision, closest_collision_segment, next_pos = \
+            lowest_time_to_collision, lowest_dist_to_collision, closest_collision_segment, seg_id, next_pos = \
                 self.calc_closer_intersection(remaining_time, remaining_dist, intersection_points, traveled_path)
-            particle_p0 = vec_to_point(self.particle.position)
-            self.particle.position = next_pos
 
-            if not self.topology.contains(vec_to_point(self.particle.position)):
-                raise Exception('Particle is outside geometry')
+            if self.topology.contains(vec_to_point(next_pos)):
+                self.particle.position = next_pos
+                collision_normal_vec = self.topology.seg_normal_vectors[seg_id] if closest_collision_segment else None
+                self.check_current_segment_collision(seg_id, collision_normal_vec)
+                traveled_time += lowest_time_to_collision
+                remaining_time -= lowest_time_to_collision
+                remaining_dist -= lowest_dist_to_collision
+            else:
+                self.resolver.fallbacks['outside'] += 1
+                fraction, flight_time = self._resolve_outside_event(traveled_path, remaining_time, remaining_dist)
+                traveled_time += fraction * flight_time
+                remaining_time -= fraction * remaining_time
+                remaining_dist -= fraction * remaining_dist
+            count_loop += 1
+            stop_conditions, loop_cond = self._calc_stop_conditions(remaining_time, remaining_dist, count_loop)
+            self.save_particle_data()
+
+        return traveled_time, loop_cond
+
+
+    def _resolve_outside_event(self, traveled_path: Segment2, remaining_time: float, remaining_dist: float) -> tuple:
+        """
+        Resolve an exact path step whose event point falls outside the topology with BoundaryResolver (float
+        crossing, inward offset, corner mirror and previous position if still outside), so collisions, current and
+        time are accounted as in the float path
+
+        :param traveled_path: step path
+        :param remaining_time: time until scattering process
+        :param remaining_dist: distance until scattering process
+        :return: traveled fraction of the step
+        :return: step flight time
+        """
+        if self.check_condition == "time":
+            flight_time = remaining_time
+        else:
+            flight_time = remaining_dist / float(self.geometry.norm(self.particle.velocity))
+        source, target = traveled_path.source(), traveled_path.target()
+        position = np.array([float(source.x()), float(source.y())])
+        displacement = np.array([float(target.x()), float(target.y())]) - position
+        seg_ids, fractions, positions, corner_normals = self.resolver.advance(position, displacement)
+        seg_id = int(seg_ids[0])
+        self.particle.position = self.geometry.vector(*map(float, positions[0]))
+
+        if seg_id >= 0:
+            self.check_current_segment_collision(seg_id, self.topology.seg_normal_vectors[seg_id])
+            if self.topology.seg_roles[seg_id] == WALL:
+                velocity = self.resolver.corner_mirror(self.geometry.coords(self.particle.velocity), corner_normals[0])
+                self.particle.velocity = self.geometry.vector(*map(float, velocity[0]))
+        return float(fractions[0]), flight_time
+
+
+    def simulate_drude_float(self):
+        """
+        Simulate Drude event on float64 arrays: paths, boundary crossings (topology segment table) and mirroring
+        (precomputed unit outward normals) do not build exact geometry objects. Boundary events (corners, grazing
+        paths) are resolved by BoundaryResolver
+
+        :return: traveled time
+        :return: boolean indicating if the flight was truncated at the maximum loop iterations
+        """
+        self.particle.calc_drift_velocity(self.relax_time, self.e_field, self.material.mobility)
+        count_loop = 0
 
-            collision_normal_vec = calc_normal(closest_collision_segment, particle_p0)
-            self.check_current_segment_collision(closest_collision_segment, collision_normal_vec)
-            traveled_time += lowest_time_to_collision
-            remaining_time -= lowest_time_to_collision
-            remaining_dist -= lowest_dist_to_collision
+        traveled_time = 0
+        remaining_time = self.relax_time
+        remaining_dist = self.material.mean_free_path
+        stop_conditions, loop_cond = self._calc_stop_conditions(remaining_time, remaining_dist, count_loop)
+
+        while not (stop_conditions or loop_cond):
+            position = self.particle.position
+            displacement = self.particle.calc_next_position(remaining_time, remaining_dist, self.check_condition) - \
+                position
+            if self.check_condition == "time":
+                flight_time = remaining_time
+            else:
+                flight_time = remaining_dist / self.geometry.norm(self.particle.velocity)
+            seg_ids, fractions, positions, corner_normals = self.resolver.advance(position, displacement)
+            seg_id = int(seg_ids[0])
+            fraction = float(fractions[0])
+            self.particle.position = positions[0]
+
+            if seg_id >= 0:
+                self.check_current_segment_collision(seg_id, self.topology.seg_normals[seg_id])
+                if self.topology.seg_roles[seg_id] == WALL:
+                    self.particle.velocity = self.resolver.corner_mirror(self.particle.velocity, corner_normals[0])[0]
+            traveled_time += fraction * flight_time
+            remaining_time -= fraction * remaining_time
+            remaining_dist -= fraction * remaining_dist
             count_loop += 1
             stop_conditions, loop_cond = self._calc_stop_conditions(remaining_time, remaining_dist, count_loop)
             self.save_particle_data()
@@ -175,35 +388,38 @@ class System:
         return travel_path
 
 
-    def check_current_segment_collision(self, closest_collision_segment, segment_normal_vec):
+    def check_current_segment_collision(self, seg_id: int, segment_normal_vec):
         """
         Check if macroparticle collide with current computation segment
 
-        :param closest_collision_segment: collided segment
+        :param seg_id: collided segment id
         :param segment_normal_vec: collided segment normal vector
         :return: None
         """
-        if segment_normal_vec:
+        if segment_normal_vec is not None:
             self.collisions_count += 1
-            current_collision, element = self.particle_computation(closest_collision_segment)
+            current_collision, element = self.particle_computation(seg_id)
             if current_collision:
+                self.contact_crossings += 1
                 self.teleport_particle(element)
             else:
+                self.wall_hits += 1
                 self.particle.mirror_particle(segment_normal_vec)
 
 
-    def particle_computation(self, collided_element: Segment2) -> tuple[bool, str]:
+    def particle_computation(self, seg_id: int) -> tuple[bool, str]:
         """
         Compute collisions in current elements
 
-        :param collided_element: collided geometry segment
+        :param seg_id: collided segment id
         :return: boolean indicating if there was rectification
         :return: string indicating segment group
         """
-        if collided_element and collided_element in self.topology.current_computing_elements['direct']:
+        role = self.topology.seg_roles[seg_id]
+        if role == DIRECT:
             self.particles_counter += self.particle.density
             return True, 'reverse'
-        elif collided_element and collided_element in self.topology.current_computing_elements['reverse']:
+        elif role == REVERSE:
             self.particles_counter -= self.particle.density
             return True, 'direct'
         return False, ''
@@ -211,15 +427,14 @@ class System:
 
     def teleport_particle(self, element: str):
         """
-        Teleport particle to opposite current segment
+        Teleport particle to opposite current segment (position drawn on float arrays, so the float backend does not
+        build exact geometry objects)
 
         :param element: segment current group (i.e. 'direct' or 'reverse')
         :return: None
         """
-        pos = self.topology.random_segment_pos(element)
-        # pos = self.topology.specific_segment_pos(element, self.particle.position)
-        # pos = Point2(pos.x(), particle.position.y())
-        self.particle.position = point_to_vec(pos)
+        pos = self.topology.sample_current_positions(element, 1)[0]
+        self.particle.position = self.geometry.vector(float(pos[0]), float(pos[1]))
 
 
     def calc_closer_intersection(
@@ -228,7 +443,7 @@ class System:
             remaining_dist,
             intersection_points: list[Point2],
             traveled_path: Segment2
-    ) -> (float, float, Segment2, Vector2):
+    ) -> (float, float, Segment2, int, Vector2):
         """
         Calculate closer intersection between particle path and geometries boundaries according to stop criterion
 
@@ -238,51 +453,57 @@ class System:
         :param traveled_path: corresponding particle path
         :return lowest_time_to_collision: the lowest time to collision
         :return lowest_collision_segment: collided segment
+        :return lowest_collision_id: collided segment id
         :return next_pos: particle next position
         """
 
         if self.check_condition == "time":
-            lowest_time_to_collision, lowest_collision_segment, next_pos = \
+            lowest_time_to_collision, lowest_collision_segment, lowest_collision_id, next_pos = \
                 self.time_intersection(remaining_time, intersection_points, traveled_path)
             lowest_dist_to_collision = norm(calc_versor(self.particle.velocity) * lowest_time_to_collision)
         else:
-            lowest_dist_to_collision, lowest_collision_segment, next_pos = \
+            lowest_dist_to_collision, lowest_collision_segment, lowest_collision_id, next_pos = \
                 self.dist_intersection(remaining_dist, intersection_points, traveled_path)
             lowest_time_to_collision = lowest_dist_to_collision / norm(self.particle.velocity)
 
-        return lowest_time_to_collision, lowest_dist_to_collision, lowest_collision_segment, next_pos
+        return lowest_time_to_collision, lowest_dist_to_collision, lowest_collision_segment, lowest_collision_id, \
+            next_pos
 
 
     def time_intersection(self, remaining_time, intersection_points, traveled_path):
         lowest_time_to_collision = remaining_time
         next_pos = None
         lowest_collision_segment = None
-        for intersection_point, collision_element in intersection_points:
+        lowest_collision_id = -1
+        for intersection_point, collision_element, collision_id in intersection_points:
             time_to_collision = self._time_to_collision(intersection_point, traveled_path)
             if time_to_collision < lowest_time_to_collision:
                 lowest_time_to_collision = time_to_collision
                 lowest_collision_segment = collision_element
+                lowest_collision_id = collision_id
                 next_pos = point_to_vec(intersection_point)
         lowest_time_to_collision *= TIME_PRECISION
         if not next_pos:
             next_pos = self.particle.calc_next_position(lowest_time_to_collision, None, self.check_condition)
-        return lowest_time_to_collision, lowest_collision_segment, next_pos
+        return lowest_time_to_collision, lowest_collision_segment, lowest_collision_id, next_pos
 
 
     def dist_intersection(self, remaining_dist, intersection_points, traveled_path):
         lowest_dist_to_collision = remaining_dist
         next_pos = None
         lowest_collision_segment = None
-        for intersection_point, collision_element in intersection_points:
+        lowest_collision_id = -1
+        for intersection_point, collision_element, collision_id in intersection_points:
             dist_to_collision = norm(traveled_path[0] - intersection_point)
             if dist_to_collision < lowest_dist_to_collision:
                 lowest_dist_to_collision = dist_to_collision
                 lowest_collision_segment = collision_element
+                lowest_collision_id = collision_id
                 next_pos = point_to_vec(intersection_point)
         lowest_dist_to_collision *= DIST_PRECISION
         if not next_pos:
             next_pos = self.particle.calc_next_position(None, lowest_dist_to_collision, self.check_condition)
-        return lowest_dist_to_collision, lowest_collision_segment, next_pos
+        return lowest_dist_to_collision, lowest_collision_segment, lowest_collision_id, next_pos
 
 
     def cal_current(self):
@@ -291,11 +512,26 @@ class System:
 
         :return: calculated current
         """
+        return self.current_factor() * self.particles_counter / self.simulated_time
+
+
+    def current_factor(self) -> float:
+        """
+        Calculate factor converting particles counter rate into current
+
+        :return: current factor [A s]
+        """
         carrier_concentration = self.material.carrier_concentration
-        current = (
-                          carrier_concentration * self.topology.area * elementary_charge * self.particles_counter
-                  ) / (self.simulated_time * self.total_macro_particles)
-        return current
+        return carrier_concentration * self.topology.area * elementary_charge / self.total_macro_particles
+
+
+    def current_error(self) -> float:
+        """
+        Calculate confidence interval half width of the total current (batch means)
+
+        :return: current error (inf if there are not enough batches) [A]
+        """
+        return self.current_factor() * self.batch_means.half_width()
 
 
     def _calc_stop_conditions(self, remaining_time, remaining_dist, count_loop):
@@ -304,7 +540,8 @@ class System:
         :param remaining_time: defined remaining_time
         :param remaining_dist: defined remaining_dist
         :param count_loop: check if loop is still executing
-        :return: bool
+        :return: bool indicating if the free flight is complete
+        :return: bool indicating if the free flight must be truncated (maximum loop iterations)
         """
         if self.check_condition == "time":
             stop_conditions = np.isclose(
@@ -312,8 +549,7 @@ class System:
         else:
             stop_conditions = np.isclose(
                 remaining_dist, 0, atol=10 ** (-self.significant_digits_dist)) or remaining_dist < 0
-        if count_loop >= MAX_LOOP:
-            print("Max loop iterations")
+        if count_loop >= MAX_LOOP and not stop_conditions:
             return stop_conditions, True
         return stop_conditions, False
 
@@ -337,5 +573,5 @@ class System:
         :return: None
         """
         if TEST and self.particle.id == followed_particle_id:
-            particle_pos = Point2(self.particle.position.x(), self.particle.position.y())
+            particle_pos = Point2(*self.geometry.coords(self.particle.position))
             self.particle.positions.append(particle_pos)
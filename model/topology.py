@@ -1,17 +1,30 @@
 import numpy as np
-import matplotlib.pyplot as plt
 
-from skgeom.draw import draw
-from matplotlib.widgets import Button
-from matplotlib.ticker import EngFormatter
 from file_readers.xml_reader import XMLReader
-from matplotlib.backend_bases import MouseButton
-from skgeom import Point2, PolygonSet, Segment2, Polygon, intersection, Vector2
-from utils.probabilistic_operations import random_int_number, random_pos_in_segment
-from utils.complementary_operations import calc_distance_between, calc_normal, segment_to_vec, dot_prod
+from skgeom import Point2, PolygonSet, Segment2, Polygon, Vector2
+from utils.probabilistic_operations import random_numbers, random_directions, AliasTable
+from utils.spatial_index import SegmentGrid
+from utils.post_processing import plot_mode, get_pyplot
+from utils.vectorized_operations import (
+    segments_to_arrays, outward_normals, first_intersections, point_segment_distances, slab_triangulation,
+    triangle_areas, supporting_lines, mirror_vectors, first_parabolic_crossings
+)
 
 
 DIST_PRECISION = 0.99
+# Spatial index thresholds, set from the crossovers of the benchmarks.suite "index" group (see README). Single queries
+# use the index from INDEX_MIN_SEGMENTS segments: nearest segment and clipped distance queries switch at about 1024
+# segments, while the brute force pass of one flight length ray is faster up to at least 4096 segments (its cost is
+# mostly call overhead, flat up to about a thousand segments). Batches use the index from INDEX_MIN_PAIRS queried
+# points or paths times segments (batches of 100 rays switch between 64 and 256 segments, batches of 100 flight length
+# parabolas between 16 and 64 segments)
+INDEX_MIN_SEGMENTS = {'ray': 20000, 'parabola': 20000, 'nearest': 1024, 'distance': 1024}
+INDEX_MIN_PAIRS = {'ray': 20000, 'parabola': 6400, 'nearest': 20000, 'distance': 20000}
+SAMPLING_OVERHEAD = 1.1
+WALL = 0
+DIRECT = 1
+REVERSE = 2
+ROLES = {'direct': DIRECT, 'reverse': REVERSE}
 
 
 class Topology:
@@ -30,10 +43,29 @@ class Topology:
         self._get_boundaries_polygons()
         self.area = self.calc_topology_area()
         self.segments = dict()
+        self.segment_list = list()
+        self.seg_starts = None
+        self.seg_ends = None
+        self.seg_directions = None
+        self.seg_normals = None
+        self.seg_lengths = None
+        self.seg_unit_directions = None
+        self.seg_lines = None
+        self.seg_normal_vectors = None
+        self.seg_prev = None
+        self.seg_next = None
+        self.seg_roles = None
+        self.current_ids = None
+        self.current_samplers = None
+        self.index = None
+        self.triangles = None
+        self.triangles_cdf = None
+        self.sampling_rejections = 0
         self._get_segments()
         self.scale = scale
         self.current_computing_elements = {'direct': list(), 'reverse': list()}
         self._get_current_computing_elements(current_segments)
+        self._build_segment_roles()
         print(self.current_computing_elements)
 
     @classmethod
@@ -64,6 +96,73 @@ class Topology:
             topologies.append(Polygon(cls._create_points(geometry, scale)))
         return cls(topologies, scale, cur_segments)
 
+    def __getstate__(self) -> dict:
+        """
+        Get picklable topology state (float coordinates of polygons and current segments), used to ship topology to
+        worker processes
+
+        :return: topology state
+        """
+        polygons = [
+            (self._polygon_coords(polygon.outer_boundary()), [self._polygon_coords(hole) for hole in polygon.holes])
+            for polygon in self.topologies.polygons
+        ]
+        current_segments = {
+            group: segments_to_arrays(segments) for group, segments in self.current_computing_elements.items()
+        }
+        return {'polygons': polygons, 'scale': self.scale, 'current_segments': current_segments}
+
+    def __setstate__(self, state: dict):
+        """
+        Rebuild topology from state created by __getstate__
+
+        :param state: topology state
+        :return: None
+        """
+        self.scale = state['scale']
+        self.sampling_rejections = 0
+        self.bbox = None
+        self.boundaries = dict()
+        self.segments = dict()
+        outer_boundaries = [Polygon([Point2(*point) for point in outer]) for outer, _ in state['polygons']]
+        self.topologies = PolygonSet(self._set_orientation(outer_boundaries))
+        for _, holes in state['polygons']:
+            for hole in self._set_orientation([Polygon([Point2(*point) for point in hole]) for hole in holes]):
+                self.topologies = self.topologies.difference(hole)
+        self._get_boundaries_polygons()
+        self.area = self.calc_topology_area()
+        self._get_segments()
+        self.current_computing_elements = {
+            group: [self.segment_list[seg_id] for seg_id in self._match_segments(*coords)]
+            for group, coords in state['current_segments'].items()
+        }
+        self._build_segment_roles()
+
+    def _match_segments(self, starts: np.ndarray, ends: np.ndarray) -> list[int]:
+        """
+        Find topology segments with the given endpoints (in any orientation)
+
+        :param starts: segments source points (k, 2)
+        :param ends: segments target points (k, 2)
+        :return: segments ids
+        """
+        seg_ids = list()
+        for start, end in zip(starts, ends):
+            direct = np.linalg.norm(self.seg_starts - start, axis=1) + np.linalg.norm(self.seg_ends - end, axis=1)
+            inverse = np.linalg.norm(self.seg_starts - end, axis=1) + np.linalg.norm(self.seg_ends - start, axis=1)
+            seg_ids.append(int(np.argmin(np.minimum(direct, inverse))))
+        return seg_ids
+
+    @staticmethod
+    def _polygon_coords(polygon: Polygon) -> list[tuple[float, float]]:
+        """
+        Get polygon vertices as floats
+
+        :param polygon: polygon
+        :return: list of vertices coordinates
+        """
+        return [(float(vertex.x()), float(vertex.y())) for vertex in polygon.vertices]
+
     def calc_topology_area(self):
         area = {'external': 0, 'internal': 0}
         for boundary_type, polygons in self.boundaries.items():
@@ -71,9 +170,23 @@ class Topology:
                 area[boundary_type] += polygon.area()
         return float(area['external'] - area['internal'])
 
-    def contains(self, point: Point2) -> bool:
+    def contains(self, point):
+        """
+        Check if point (or array of points) is inside geometry. Uses the rasterized inside/outside/boundary mask of
+        the spatial index and a vectorized crossing test for points near the boundary
+
+        :param point: point to be checked (Point2, (2,) array or (m, 2) array)
+        :return: boolean (or boolean array) indicating if point is or is not inside geometry
         """
-        Check if point is inside geometry
+        if isinstance(point, Point2):
+            return bool(self.index.contains(np.array([float(point.x()), float(point.y())]))[0])
+        points = np.asarray(point, dtype=np.float64)
+        inside = self.index.contains(points)
+        return bool(inside[0]) if points.ndim == 1 else inside
+
+    def locate(self, point: Point2) -> bool:
+        """
+        Check if point is inside geometry using exact polygon set location
 
         :param point: point to be checked
         :return: boolean indicating if point is or is not inside geometry
@@ -107,6 +220,7 @@ class Topology:
             self.topologies = self.topologies.difference(pol)
         self._get_boundaries_polygons()
         self._get_segments()
+        self._build_segment_roles()
 
     def union_polygon(self, polygon: Polygon):
         """
@@ -120,6 +234,7 @@ class Topology:
             self.topologies = self.topologies.union(pol)
         self._get_boundaries_polygons()
         self._get_segments()
+        self._build_segment_roles()
 
     def _get_segments(self):
         """
@@ -143,26 +258,137 @@ class Topology:
                 external_segments.extend(extract_segments(polygons))
         self.segments['internal'] = internal_segments
         self.segments['external'] = external_segments
+        self._build_segment_table()
+
+    def _build_segment_table(self):
+        """
+        Build float64 arrays of segments endpoints, directions, lengths, unit directions, outward normals, supporting
+        lines and vertex adjacency. Segments are ordered as in sum(self.segments.values(), []), so array indexes are
+        the same used to define current segments. Everything is rebuilt whenever segments change (diff_polygon,
+        union_polygon), so the simulation hot path only reads these caches
+
+        :return: None
+        """
+        self.segment_list = sum(self.segments.values(), [])
+        self.seg_starts, self.seg_ends = segments_to_arrays(self.segment_list)
+        self.seg_directions = self.seg_ends - self.seg_starts
+        self.seg_lengths = np.linalg.norm(self.seg_directions, axis=1)
+        self.seg_unit_directions = self.seg_directions / np.where(self.seg_lengths > 0, self.seg_lengths, 1)[:, None]
+        self.seg_normals = outward_normals(self.seg_directions)
+        self.seg_lines = supporting_lines(self.seg_starts, self.seg_normals)
+        self.seg_normal_vectors = [Vector2(*normal) for normal in self.seg_normals]
+        self.seg_prev, self.seg_next = self._segment_adjacency()
+        self.index = SegmentGrid(self.seg_starts, self.seg_ends, self.seg_normals)
+        self.triangles = slab_triangulation(self.seg_starts, self.seg_ends)
+        areas = triangle_areas(self.triangles)
+        self.triangles_cdf = np.cumsum(areas) / areas.sum()
+
+    def _segment_adjacency(self) -> tuple[np.ndarray, np.ndarray]:
+        """
+        Find segments sharing each segment vertex (boundaries are closed chains, so a segment source point is the
+        target point of the previous one)
+
+        :return: previous segment id of each segment (-1 if not found)
+        :return: next segment id of each segment (-1 if not found)
+        """
+        by_start = {tuple(start): seg_id for seg_id, start in enumerate(self.seg_starts)}
+        by_end = {tuple(end): seg_id for seg_id, end in enumerate(self.seg_ends)}
+        seg_prev = np.array([by_end.get(tuple(start), -1) for start in self.seg_starts], dtype=np.int64)
+        seg_next = np.array([by_start.get(tuple(end), -1) for end in self.seg_ends], dtype=np.int64)
+        return seg_prev, seg_next
+
+    def _build_segment_roles(self):
+        """
+        Build per-segment role array (WALL, DIRECT or REVERSE) and current segments ids, so collided segments are
+        classified by array indexing. Current segments are matched to segment ids once. A length weighted alias table
+        is built for each current group (re-injection positions are uniform along the whole contact)
+
+        :return: None
+        """
+        self.seg_roles = np.full(len(self.segment_list), WALL, dtype=np.int8)
+        self.current_ids = dict()
+        self.current_samplers = dict()
+        for group, role in ROLES.items():
+            ids = [self.segment_id(segment) for segment in self.current_computing_elements[group]]
+            self.current_ids[group] = np.array([seg_id for seg_id in ids if seg_id >= 0], dtype=np.int64)
+            self.seg_roles[self.current_ids[group]] = role
+            lengths = self.seg_lengths[self.current_ids[group]]
+            self.current_samplers[group] = AliasTable(lengths) if lengths.sum() > 0 else None
+
+    def segment_id(self, segment: Segment2) -> int:
+        """
+        Get integer id of a topology segment (index in segment_list and segments arrays)
+
+        :param segment: topology segment
+        :return: segment id (-1 if segment is not a topology segment)
+        """
+        for seg_id, topology_segment in enumerate(self.segment_list):
+            if topology_segment is segment:
+                return seg_id
+        return self.segment_list.index(segment) if segment in self.segment_list else -1
+
+    def use_index(self, kind: str, n_queries: int = 1) -> bool:
+        """
+        Define if queries go through the spatial index (brute force vectorized passes are faster for few segments, see
+        INDEX_MIN_SEGMENTS and INDEX_MIN_PAIRS)
+
+        :param kind: query kind ('ray', 'parabola', 'nearest' or 'distance')
+        :param n_queries: number of points or paths queried at once
+        :return: boolean indicating if spatial index is used
+        """
+        if n_queries == 1:
+            return len(self.segment_list) >= INDEX_MIN_SEGMENTS[kind]
+        return n_queries * len(self.segment_list) >= INDEX_MIN_PAIRS[kind]
 
     def intersection_points(self, traveled_path: Segment2) -> list:
         """
-        Define all possible intersection points
+        Define the closest intersection point (the only one that can be reached by the particle)
 
         :param traveled_path: line segment eventually travelled by particle
-        :return: all possible intersection points
-        """
-        actual_pos = traveled_path[0]
-        intersection_points = list()
-        pos_vec = segment_to_vec(traveled_path)
-        for segments in self.segments.values():
-            for segment in segments:
-                intersection_point = intersection(segment, traveled_path)
-                segment_normal_vec = calc_normal(segment, actual_pos)
-                segments_product = dot_prod(pos_vec, segment_normal_vec)
-                if intersection_point and (segments_product < 0):
-                    intersection_point = traveled_path[0] - DIST_PRECISION * (traveled_path[0] - intersection_point)
-                    intersection_points.append([intersection_point, segment])
-        return intersection_points
+        :return: list with the closest intersection point, its segment and segment id (empty if there is no
+        intersection)
+        """
+        origin = np.array([float(traveled_path[0].x()), float(traveled_path[0].y())])
+        target = np.array([float(traveled_path[1].x()), float(traveled_path[1].y())])
+        displacement = target - origin
+        seg_ids, path_params = self.first_intersections(origin, displacement)
+        if seg_ids[0] < 0:
+            return list()
+        intersection_point = origin + DIST_PRECISION * path_params[0] * displacement
+        return [[Point2(*intersection_point), self.segment_list[seg_ids[0]], int(seg_ids[0])]]
+
+    def first_intersections(self, origins: np.ndarray, displacements: np.ndarray) -> tuple[np.ndarray, np.ndarray]:
+        """
+        Calculate the first segment crossed by one path or a batch of paths (origin + s * displacement, 0 <= s <= 1)
+
+        :param origins: paths origins ((2,) or (m, 2))
+        :param displacements: paths displacements ((2,) or (m, 2))
+        :return: index of the first crossed segment for each path (-1 if there is no crossing)
+        :return: path parameter s of the crossing (inf if there is no crossing)
+        """
+        if self.use_index('ray', len(np.atleast_2d(origins))):
+            return self.index.first_hits(origins, displacements)
+        return first_intersections(origins, displacements, self.seg_starts, self.seg_directions, self.seg_normals)
+
+    def first_parabolic_crossings(
+            self, origins: np.ndarray, velocities: np.ndarray, acceleration: np.ndarray, horizons: np.ndarray
+    ) -> tuple[np.ndarray, np.ndarray]:
+        """
+        Calculate the first segment crossed by a batch of uniformly accelerated trajectories
+        (origin + v * t + a * t ** 2 / 2, 0 <= t <= horizon)
+
+        :param origins: trajectories origins (m, 2)
+        :param velocities: trajectories initial velocities (m, 2)
+        :param acceleration: acceleration shared by all trajectories (2,)
+        :param horizons: trajectories durations (m,)
+        :return: index of the first crossed segment for each trajectory (-1 if there is no crossing)
+        :return: crossing time (inf if there is no crossing)
+        """
+        if self.use_index('parabola', len(np.atleast_2d(origins))):
+            return self.index.first_parabolic_hits(origins, velocities, acceleration, horizons)
+        return first_parabolic_crossings(
+            origins, velocities, acceleration, horizons, self.seg_starts, self.seg_directions, self.seg_lines
+        )
 
     def get_closer_segment(self, selected_point: Point2) -> tuple[Segment2, float]:
         """
@@ -171,15 +397,77 @@ class Topology:
         :param selected_point: desired point
         :return: closest segment
         """
-        min_distance = np.inf
-        selected_segment = None
-        for segments in self.segments.values():
-            for segment in segments:
-                dist = calc_distance_between(segment, selected_point)
-                if dist < min_distance:
-                    min_distance = dist
-                    selected_segment = segment
-        return selected_segment, min_distance
+        point = np.array([float(selected_point.x()), float(selected_point.y())])
+        if self.use_index('nearest'):
+            seg_id, min_distance = self.index.nearest_segment(point)
+        else:
+            distances = point_segment_distances(point, self.seg_starts, self.seg_ends, self.seg_lengths)[0]
+            seg_id = int(np.argmin(distances))
+            min_distance = float(distances[seg_id])
+        return self.segment_list[seg_id], min_distance
+
+    def segments_near(self, selected_point: Point2, radius: float) -> list[Segment2]:
+        """
+        Get segments closer than radius to desired point
+
+        :param selected_point: desired point
+        :param radius: search radius
+        :return: list of segments
+        """
+        point = np.array([float(selected_point.x()), float(selected_point.y())])
+        return [self.segment_list[seg_id] for seg_id in self.index.segments_near(point, radius)]
+
+    def sample_positions(self, number: int, min_distance: float = 0) -> np.ndarray:
+        """
+        Draw uniformly distributed positions inside topology: triangles are chosen according their areas and points
+        are drawn uniformly inside them. Positions closer than min_distance to the boundary are drawn again (counted in
+        sampling_rejections)
+
+        :param number: number of positions
+        :param min_distance: minimum accepted distance to topology boundaries
+        :return: positions (number, 2)
+        """
+        accepted = list()
+        missing = number
+        while missing > 0:
+            n_draws = int(np.ceil(missing * SAMPLING_OVERHEAD))
+            positions = self.triangle_positions(random_numbers(0, 1, 3 * n_draws).reshape(3, n_draws).T)
+            if min_distance > 0:
+                positions = positions[self.boundary_distances(positions, min_distance) >= min_distance]
+                self.sampling_rejections += n_draws - len(positions)
+            accepted.append(positions[:missing])
+            missing -= len(accepted[-1])
+        return np.concatenate(accepted)
+
+    def triangle_positions(self, uniforms: np.ndarray) -> np.ndarray:
+        """
+        Map uniform numbers to uniformly distributed positions inside topology (area weighted triangle choice and
+        uniform point inside the triangle)
+
+        :param uniforms: uniform numbers (n, 3): triangle choice and two barycentric coordinates
+        :return: positions (n, 2)
+        """
+        triangle_ids = np.searchsorted(self.triangles_cdf, uniforms[:, 0], side='right')
+        triangles = self.triangles[np.minimum(triangle_ids, len(self.triangles) - 1)]
+        u = uniforms[:, 1].copy()
+        v = uniforms[:, 2].copy()
+        flip = u + v > 1
+        u[flip], v[flip] = 1 - u[flip], 1 - v[flip]
+        return triangles[:, 0] + u[:, None] * (triangles[:, 1] - triangles[:, 0]) + \
+            v[:, None] * (triangles[:, 2] - triangles[:, 0])
+
+    def boundary_distances(self, points: np.ndarray, max_distance: float) -> np.ndarray:
+        """
+        Calculate distances between points and topology boundaries, clipped to max_distance
+
+        :param points: points ((2,) or (m, 2))
+        :param max_distance: maximum distance of interest
+        :return: min(distance to the closest segment, max_distance) for each point
+        """
+        if self.use_index('distance', len(np.atleast_2d(points))):
+            return self.index.min_distances(points, max_distance)
+        distances = point_segment_distances(points, self.seg_starts, self.seg_ends, self.seg_lengths)
+        return np.minimum(distances.min(axis=1), max_distance)
 
 
     def _get_current_computing_elements(self, opt):
@@ -190,12 +478,19 @@ class Topology:
 
 
     def _current_elements_from_points(self, edges_tuple: tuple):
-        segments = sum(self.segments.values(), [])
-        [self.current_computing_elements['direct'].append(segments[i]) for i in edges_tuple[0]]
-        [self.current_computing_elements['reverse'].append(segments[i]) for i in edges_tuple[1]]
+        [self.current_computing_elements['direct'].append(self.segment_list[i]) for i in edges_tuple[0]]
+        [self.current_computing_elements['reverse'].append(self.segment_list[i]) for i in edges_tuple[1]]
 
 
     def _current_elements_from_image(self):
+        if plot_mode() != 'interactive':
+            raise Exception('Current segments selection requires interactive plots (define cur_segments)')
+        plt = get_pyplot()
+        from skgeom.draw import draw
+        from matplotlib.widgets import Button
+        from matplotlib.ticker import EngFormatter
+        from matplotlib.backend_bases import MouseButton
+
         plots = {'direct': list(), 'reverse': list()}
         current_elements = {'direct': list(), 'reverse': list()}
         fig, ax = plt.subplots(num='Current elements choice', figsize=(9, 6))
@@ -256,32 +551,37 @@ class Topology:
         plt.show()
 
 
-    def random_segment_pos(self, elements_list: str) -> Point2:
+    def sample_current_positions(
+            self, elements_list: str, number: int, inward: bool = False, uniforms: np.ndarray = None
+    ):
         """
-        Generate random position in a random current element
+        Draw a batch of re-injection positions uniformly distributed along a current group: segments are chosen by
+        the length weighted alias table and positions are drawn uniformly inside them
 
         :param elements_list: list of elements (can be 'direct' or 'reverse')
-        :return: random position in a random segment
+        :param number: number of positions
+        :param inward: define if random unit directions pointing into topology are also returned
+        :param uniforms: uniform numbers to be used (number, 3), plus a fourth column if inward: segment choice (two
+        columns), position along the segment and direction (drawn from the process stream if not defined)
+        :return: positions (number, 2)
+        :return: inward unit directions (number, 2) (only if inward)
         """
-        possible_segments = self.current_computing_elements[elements_list]
-        rand_pos = random_int_number(0, len(possible_segments) - 1)
-        segment = possible_segments[rand_pos]
-        return random_pos_in_segment(segment)
-
-
-    def specific_segment_pos(self, elements_list: str, particle_pos: Vector2) -> Point2:
-        """
-        Generate random position in a random current element
-
-        :param elements_list: list of elements (can be 'direct' or 'reverse')
-        :param particle_pos: actual particle position
-        :return: specific position in a random segment
-        """
-        possible_segments = self.current_computing_elements[elements_list]
-        rand_pos = random_int_number(0, len(possible_segments) - 1)
-        segment = possible_segments[rand_pos]
-        point_1 = segment[0]
-        return Point2(point_1.x(), particle_pos.y())
+        sampler = self.current_samplers[elements_list]
+        if sampler is None:
+            raise Exception(f'No {elements_list} current segments to sample')
+        if uniforms is None:
+            chosen = self.current_ids[elements_list][sampler.sample(number)]
+            u = random_numbers(0, 1, number)[:, None]
+        else:
+            chosen = self.current_ids[elements_list][sampler.sample(number, uniforms[:, :2])]
+            u = uniforms[:, 2, None]
+        positions = self.seg_starts[chosen] + u * self.seg_directions[chosen]
+        if not inward:
+            return positions
+        directions = random_directions(number, None if uniforms is None else uniforms[:, 3])
+        outward = np.einsum('ij,ij->i', directions, self.seg_normals[chosen]) > 0
+        directions[outward] = mirror_vectors(directions[outward], self.seg_normals[chosen[outward]])
+        return positions, directions
 
 
     @staticmethod
@@ -1,9 +1,35 @@
+from itertools import repeat
+from importlib import import_module
+from concurrent.futures import ProcessPoolExecutor
+
 from skgeom import Vector2
-from model.system import System
 from scipy.constants import electron_mass
-from utils.post_processing import save_current
-from matplotlib.ticker import EngFormatter
+from utils.post_processing import save_current, ProgressReporter
 from simulators.drude_analytical import drude_analytical_model
+from utils.probabilistic_operations import seed_generators, spawn_seeds
+from utils.current_statistics import DEFAULT_CONFIDENCE, DEFAULT_BATCH_SIZE, DEFAULT_MIN_BATCHES, DEFAULT_TRACE_POINTS
+
+
+ENGINES = {
+    'particle': ('model.system', 'System'),
+    'ensemble': ('model.ensemble', 'Ensemble'),
+    'numba': ('model.numba_ensemble', 'NumbaEnsemble'),
+    'event': ('model.event_ensemble', 'EventEnsemble')
+}
+_worker_elements = dict()
+
+
+def engine_class(engine: str):
+    """
+    Import simulation engine class (deferred, so only the used engine stack, i.e. numba, is imported)
+
+    :param engine: engine name
+    :return: engine class
+    """
+    if engine not in ENGINES:
+        raise Exception(f'Unknown engine: {engine}')
+    module, name = ENGINES[engine]
+    return getattr(import_module(module), name)
 
 
 def monte_carlo(
@@ -14,23 +40,116 @@ def monte_carlo(
         max_coll,
         n_particles=100,
         check_condition='time',
-        plot_current=True
+        plot_current=True,
+        engine='particle',
+        rel_error=None,
+        abs_error=None,
+        confidence=DEFAULT_CONFIDENCE,
+        batch_size=DEFAULT_BATCH_SIZE,
+        min_batches=DEFAULT_MIN_BATCHES,
+        trace_points=DEFAULT_TRACE_POINTS,
+        trace_file=None,
+        geometry='exact',
+        profile_file=None,
+        profile_trace=False
 ):
     volt_vec = [-volt, 0]
     # For now, simulator considers only x electric fields
     e_field = Vector2(*volt_vec) / (topology.bbox.xmax() - topology.bbox.xmin())
-    system = System(
+    system = engine_class(engine)(
         topology=topology,
         material=material,
         particle=particle_model,
         electric_field=e_field,
         max_collisions=max_coll,
         number_of_particles=n_particles,
-        check_condition=check_condition
+        check_condition=check_condition,
+        rel_error=rel_error,
+        abs_error=abs_error,
+        confidence=confidence,
+        batch_size=batch_size,
+        min_batches=min_batches,
+        trace_points=trace_points,
+        trace_file=trace_file,
+        geometry=geometry,
+        profile_file=profile_file,
+        profile_trace=profile_trace
     )
     system.simulate(system.simulate_drude, volt, plot_current)
     simulation_current = system.cal_current()
-    return e_field, simulation_current, system.time_steps_count, system.collisions_count
+    return e_field, simulation_current, system.current_error(), system.time_steps_count, system.collisions_count
+
+
+def rectangle_drude_current(e_field, topology, material) -> float:
+    """
+    Analytical Drude current of a rectangular geometry (reference of rectangle simulations)
+
+    :param e_field: applied electric field
+    :param topology: simulated (rectangular) topology
+    :param material: material
+    :return: analytical current [A]
+    """
+    return drude_analytical_model(
+        e_field=e_field,
+        relax_time=material.relax_time,
+        width=float(topology.bbox.ymax() - topology.bbox.ymin()),
+        carrier_concentration=material.carrier_concentration,
+        effective_mass=material.effective_mass * electron_mass
+    )
+
+
+def _init_sweep_worker(topology, material, particle_model):
+    """
+    Store sweep elements in worker process (shipped once per worker)
+
+    :param topology: simulated topology
+    :param material: material
+    :param particle_model: particle model
+    :return: None
+    """
+    _worker_elements.update(topology=topology, material=material, particle_model=particle_model)
+
+
+def _sweep_point(volt, seed, kwargs):
+    """
+    Simulate one voltage point in a worker process
+
+    :param volt: applied voltage
+    :param seed: voltage point seed
+    :param kwargs: monte_carlo keyword arguments
+    :return: monte_carlo results (electric field as float coordinates)
+    """
+    seed_generators(seed)
+    e_field, *results = monte_carlo(
+        volt, _worker_elements['topology'], _worker_elements['material'], _worker_elements['particle_model'], **kwargs
+    )
+    return (float(e_field.x()), float(e_field.y())), *results
+
+
+def _sweep(voltage_range, topology, material, particle_model, workers, seed, kwargs):
+    """
+    Simulate all voltage points (serial or in a process pool). Results are yielded in voltage order
+
+    :param voltage_range: applied voltages
+    :param topology: simulated topology
+    :param material: material
+    :param particle_model: particle model
+    :param workers: number of worker processes (1 for serial execution)
+    :param seed: root seed
+    :param kwargs: monte_carlo keyword arguments
+    :return: monte_carlo results generator
+    """
+    seeds = spawn_seeds(seed, len(voltage_range))
+    if workers > 1:
+        with ProcessPoolExecutor(
+                max_workers=workers, initializer=_init_sweep_worker, initargs=(topology, material, particle_model)
+        ) as executor:
+            for e_field, *results in executor.map(_sweep_point, voltage_range, seeds, repeat(kwargs)):
+                yield Vector2(*e_field), *results
+    else:
+        for volt, point_seed in zip(voltage_range, seeds):
+            seed_generators(point_seed)
+            yield monte_carlo(volt, topology, material, particle_model, **kwargs)
 
 
 def monte_carlo_non_opt(
@@ -46,33 +165,51 @@ def monte_carlo_non_opt(
         n_particles=100,
         out_file='currents',
         id_tracker='test',
-        check_condition='time'
+        check_condition='time',
+        engine='particle',
+        workers=1,
+        seed=None,
+        rel_error=None,
+        abs_error=None,
+        confidence=DEFAULT_CONFIDENCE,
+        batch_size=DEFAULT_BATCH_SIZE,
+        min_batches=DEFAULT_MIN_BATCHES,
+        trace_points=DEFAULT_TRACE_POINTS,
+        trace_file=None,
+        geometry='exact',
+        profile_file=None,
+        profile_trace=False
 ):
-    for volt in voltage_range:
-        eng_formatter = EngFormatter(places=4, unit='A')
+    from matplotlib.ticker import EngFormatter
+
+    kwargs = dict(
+        max_coll=max_coll, n_particles=n_particles, check_condition=check_condition, plot_current=True, engine=engine,
+        rel_error=rel_error, abs_error=abs_error, confidence=confidence, batch_size=batch_size, min_batches=min_batches,
+        trace_points=trace_points, trace_file=trace_file, geometry=geometry, profile_file=profile_file,
+        profile_trace=profile_trace
+    )
+    results = _sweep(voltage_range, topology, material, particle_model, workers, seed, kwargs)
+    eng_formatter = EngFormatter(places=4, unit='A')
+    progress = ProgressReporter(len(voltage_range), label='Sweep', unit='points', step_interval=1, inline=False)
+    for point, (volt, (e_field, simulation_current, current_error, time_steps_count, collisions_count)) in \
+            enumerate(zip(voltage_range, results), 1):
         voltages.append(volt)
-        e_field, simulation_current, time_steps_count, collisions_count = monte_carlo(
-            volt, topology, material, particle_model, max_coll, n_particles, check_condition, plot_current=True
-        )
         currents.append(simulation_current)
         save_current(f'outputs/{out_file}.csv', simulation_current, geo, volt, id_tracker)
 
         print(f"Voltage: {'%s' % float('%.1g' % volt)}")
         print(f"Current:{eng_formatter.format_eng(num=simulation_current)}A")
+        if current_error != float('inf'):
+            print(f"Current error:{eng_formatter.format_eng(num=current_error)}A")
 
         if 'rectangle' in geo:
-            drude_current = drude_analytical_model(
-                e_field=e_field,
-                relax_time=material.relax_time,
-                width=float(topology.bbox.ymax() - topology.bbox.ymin()),
-                carrier_concentration=material.carrier_concentration,
-                effective_mass=material.effective_mass * electron_mass
-            )
+            drude_current = rectangle_drude_current(e_field, topology, material)
             save_current(f'outputs/{out_file}.csv', drude_current, geo, volt, id_tracker)
             drude_currents.append(drude_current)
             print(f'Drude current: {drude_current}')
 
         print(f'Time steps: {time_steps_count}')
         print(f'Collisions: {collisions_count}')
+        progress.update(point)
         print(f'-' * 100)
         print('\r')
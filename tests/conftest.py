@@ -0,0 +1,10 @@
+import pytest
+
+from tests.shapes import L_OUTLINE, L_HOLE, closed_segments
+from utils.vectorized_operations import outward_normals
+
+
+@pytest.fixture
+def l_shape():
+    seg_starts, seg_ends = closed_segments([L_OUTLINE, L_HOLE])
+    return seg_starts, seg_ends, outward_normals(seg_ends - seg_starts)
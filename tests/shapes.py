@@ -0,0 +1,13 @@
+import numpy as np
+
+
+# Counterclockwise L-shaped outline with a clockwise square hole
+L_OUTLINE = [[0, 0], [4, 0], [4, 1.5], [1.5, 1.5], [1.5, 4], [0, 4]]
+L_HOLE = [[0.5, 0.5], [0.5, 1], [1, 1], [1, 0.5]]
+L_AREA = 4 * 1.5 + 1.5 * 2.5 - 0.5 * 0.5
+
+
+def closed_segments(polygons: list) -> tuple[np.ndarray, np.ndarray]:
+    starts = np.concatenate([np.asarray(points, dtype=np.float64) for points in polygons])
+    ends = np.concatenate([np.roll(np.asarray(points, dtype=np.float64), -1, axis=0) for points in polygons])
+    return starts, ends
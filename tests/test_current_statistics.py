@@ -0,0 +1,43 @@
+import numpy as np
+import pytest
+
+from utils.current_statistics import BatchMeans, CurrentTrace
+
+
+def test_current_trace_statistics_and_decimation():
+    values = np.random.default_rng(4).normal(2, 0.5, 1000)
+    trace = CurrentTrace(max_points=64)
+    for value in values:
+        trace.add(value)
+    assert trace.count == len(values)
+    assert trace.mean == pytest.approx(values.mean())
+    assert trace.variance == pytest.approx(values.var(ddof=1))
+    steps, stored = trace.trace()
+    assert len(steps) <= trace.max_points
+    assert steps[0] == 0 and (np.diff(steps) == trace.stride).all()
+    np.testing.assert_array_equal(stored, values[steps])
+
+
+def test_current_trace_stream(tmp_path):
+    file = tmp_path / 'trace.txt'
+    trace = CurrentTrace(max_points=4)
+    trace.stream(file)
+    for value in range(10):
+        trace.add(float(value))
+    trace.close()
+    np.testing.assert_array_equal(np.loadtxt(file), np.arange(10))
+
+
+def test_batch_means_interval():
+    pytest.importorskip('scipy')
+    batch_means = BatchMeans(batch_size=10, min_batches=5)
+    rng = np.random.default_rng(5)
+    numerator = 0
+    for step in range(1, 101):
+        numerator += 3 + rng.normal(0, 0.1)
+        batch_means.add(numerator, float(step))
+    assert batch_means.n_batches == 10
+    assert np.mean(batch_means.batches) == pytest.approx(3, abs=0.05)
+    assert 0 < batch_means.half_width() < 0.1
+    assert batch_means.converged(3, rel_error=0.05)
+    assert not batch_means.converged(3, abs_error=1e-6)
@@ -0,0 +1,80 @@
+import json
+import numpy as np
+import pytest
+
+from pathlib import Path
+
+pytest.importorskip('skgeom')
+
+from model.particle import Particle
+from model.material import Material
+from model.topology import Topology
+from scipy.constants import elementary_charge
+from skgeom import Vector2
+from simulators.monte_carlo import engine_class, monte_carlo, rectangle_drude_current
+from utils.probabilistic_operations import seed_generators
+
+
+RECTANGLE_FILE = Path(__file__).resolve().parent.parent / 'input_examples' / 'rectangle.json'
+# Short rectangle (1 x 0.5 um) with the right edge as anode, so a few thousand collisions give many contact crossings
+RECTANGLE_POINTS = [[[0, 0], [1, 0], [1, 0.5], [0, 0.5]]]
+RECTANGLE_CUR_SEGMENTS = [[1], [3]]
+VOLTAGE = 0.4
+MAX_COLL = 1e4
+N_PARTICLES = 100
+SEED = 13548
+TOLERANCE = 0.15
+
+
+@pytest.fixture(scope='module')
+def rectangle():
+    with open(RECTANGLE_FILE) as f:
+        data = json.load(f)
+    material = Material(**data['material'])
+    particle = Particle(
+        **data['particle'], effective_mass=material.effective_mass, fermi_velocity=material.scalar_fermi_velocity
+    )
+    topology = Topology.from_points(RECTANGLE_POINTS, data['geometry']['scale'], RECTANGLE_CUR_SEGMENTS)
+    return material, particle, topology
+
+
+def simulate_rectangle(rectangle, engine: str, **kwargs) -> tuple[float, float]:
+    material, particle, topology = rectangle
+    seed_generators(SEED)
+    e_field, current, *_ = monte_carlo(
+        VOLTAGE, topology, material, particle, MAX_COLL, check_condition='time', plot_current=False, engine=engine,
+        **kwargs
+    )
+    return current, rectangle_drude_current(e_field, topology, material)
+
+
+@pytest.mark.parametrize('engine, kwargs', [
+    ('particle', {'geometry': 'float'}),
+    ('ensemble', {'n_particles': N_PARTICLES}),
+    ('event', {'n_particles': N_PARTICLES}),
+    ('numba', {'n_particles': N_PARTICLES}),
+])
+def test_engine_matches_drude(rectangle, engine, kwargs):
+    if engine == 'numba':
+        pytest.importorskip('numba')
+    current, reference = simulate_rectangle(rectangle, engine, **kwargs)
+    assert current * reference > 0
+    assert current == pytest.approx(reference, rel=TOLERANCE)
+
+
+def test_event_flights_average_drude_drift(rectangle):
+    # Flights accelerate from v0 to v0 + a * T: the a * T / 2 shift of set_velocities makes the flight average Fermi
+    # plus drift velocity, the drift of drude_analytical_model (I = n * e * drift * width)
+    material, particle, topology = rectangle
+    seed_generators(SEED)
+    e_field = Vector2(-VOLTAGE, 0) / (topology.bbox.xmax() - topology.bbox.xmin())
+    ensemble = engine_class('event')(
+        particle, topology, material, e_field, 'time', number_of_particles=N_PARTICLES, max_collisions=MAX_COLL
+    )
+    ensemble.set_velocities()
+    drift = ensemble.drift_velocity()
+    flight_mean = ensemble.velocities + 0.5 * ensemble.acceleration * ensemble.flight_time
+    np.testing.assert_allclose(np.linalg.norm(flight_mean - drift, axis=1), particle.scalar_fermi_velocity)
+    width = float(topology.bbox.ymax() - topology.bbox.ymin())
+    drude_current = material.carrier_concentration * elementary_charge * drift[0] * width
+    assert drude_current == pytest.approx(rectangle_drude_current(e_field, topology, material))
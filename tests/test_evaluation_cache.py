@@ -0,0 +1,27 @@
+import numpy as np
+
+from utils.evaluation_cache import EvaluationCache
+
+
+def test_make_key():
+    key = EvaluationCache.make_key(volt=np.float64(0.5), geometry=[[0, 1]])
+    assert key == EvaluationCache.make_key(geometry=[[0, 1]], volt=0.5)
+    assert key != EvaluationCache.make_key(geometry=[[0, 1]], volt=0.6)
+
+
+def test_put_get_and_persistence(tmp_path):
+    file = tmp_path / 'cache' / 'cache.sqlite'
+    cache = EvaluationCache(file)
+    assert cache.get('missing') is None
+    cache.put('key', {'current': np.float64(1.5), 'values': [1, 2]})
+    assert EvaluationCache(file).get('key') == {'current': 1.5, 'values': [1, 2]}
+
+
+def test_least_recently_used_eviction(tmp_path):
+    cache = EvaluationCache(tmp_path / 'cache.sqlite', max_entries=2)
+    cache.put('a', 1)
+    cache.put('b', 2)
+    assert cache.get('a') == 1
+    cache.put('c', 3)
+    assert cache.get('b') is None
+    assert (cache.get('a'), cache.get('c')) == (1, 3)
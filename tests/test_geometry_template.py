@@ -0,0 +1,42 @@
+import pickle
+import numpy as np
+import pytest
+
+from utils.geometry_template import GeometryTemplate, compile_expression, evaluate_constraints
+
+
+GEO_MASK = [[0, 0], ['x0', 0], ['x0', 'x1'], ['x0 / 2', 'np.sqrt(x1)'], [0, 'x1']]
+
+
+def test_build_population():
+    template = GeometryTemplate(GEO_MASK)
+    assert template.n_points == 5 and template.n_params == 2
+    population = np.array([[4, 9], [2, 1]])
+    vertices = template.build(population)
+    assert vertices.shape == (2, 5, 2)
+    np.testing.assert_allclose(vertices[0], [[0, 0], [4, 0], [4, 9], [2, 3], [0, 9]])
+    np.testing.assert_allclose(template.build(population[1])[0], vertices[1])
+
+
+def test_invalid_masks_and_parameters():
+    with pytest.raises(ValueError):
+        GeometryTemplate([[0, 0, 0]])
+    with pytest.raises(ValueError):
+        GeometryTemplate([['x0 +', 0]])
+    with pytest.raises(ValueError):
+        GeometryTemplate(GEO_MASK).build([1])
+
+
+def test_pickle_and_feasibility():
+    template = pickle.loads(pickle.dumps(GeometryTemplate(GEO_MASK)))
+    vertices = template.build([[4, 9], [-1, 1]])
+    np.testing.assert_array_equal(GeometryTemplate.feasible(vertices), [True, False])
+
+
+def test_evaluate_constraints():
+    consts = [
+        compile_expression('lambda x: x[0] - x[1]'),
+        lambda x: float(max(x)),
+    ]
+    population = np.array([[1, 2], [5, 3]])
+    np.testing.assert_allclose(evaluate_constraints(consts, population), [[-1, 2], [2, 5]])
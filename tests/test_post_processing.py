@@ -0,0 +1,31 @@
+import os
+import sys
+import subprocess
+import pytest
+
+from pathlib import Path
+
+from utils.post_processing import PLOT_MODE_VARIABLE, get_pyplot
+
+
+ROOT = Path(__file__).resolve().parent.parent
+HEADLESS_MODULES = ['main', 'simulators.monte_carlo', 'model.particle', 'model.topology', 'file_readers.xml_reader']
+
+
+def test_headless_imports_do_not_load_pyplot():
+    pytest.importorskip('skgeom')
+    code = (
+        'import sys, importlib, skgeom\n'
+        "loaded = 'matplotlib.pyplot' in sys.modules\n"
+        f'for name in {HEADLESS_MODULES!r}:\n'
+        '    importlib.import_module(name)\n'
+        "assert ('matplotlib.pyplot' in sys.modules) == loaded, name\n"
+    )
+    subprocess.run([sys.executable, '-c', code], cwd=ROOT, check=True, env={**os.environ, PLOT_MODE_VARIABLE: 'off'})
+
+
+def test_get_pyplot_switches_preloaded_backend(monkeypatch):
+    plt = pytest.importorskip('matplotlib.pyplot')
+    monkeypatch.setenv(PLOT_MODE_VARIABLE, 'agg')
+    assert get_pyplot() is plt
+    assert plt.get_backend().lower() == 'agg'
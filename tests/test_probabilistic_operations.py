@@ -0,0 +1,72 @@
+import numpy as np
+import pytest
+
+from utils.probabilistic_operations import (
+    AliasTable, RandomStream, ParticleStreams, seed_generators, get_stream, use_stream, random_directions,
+    hash_uniforms
+)
+
+
+N_SAMPLES = 200000
+
+
+def alias_probabilities(table: AliasTable) -> np.ndarray:
+    probabilities = table.prob.copy()
+    np.add.at(probabilities, table.alias, 1 - table.prob)
+    return probabilities / len(table)
+
+
+def test_random_stream_blocks_are_reproducible():
+    stream = RandomStream(9, block_size=16)
+    values = np.concatenate([stream.uniform(5), [stream.scalar()], stream.uniform(40)])
+    np.testing.assert_array_equal(values, np.random.Generator(np.random.Philox(np.random.SeedSequence(9))).random(46))
+
+
+def test_random_directions_are_isotropic():
+    seed_generators(7)
+    directions = random_directions(N_SAMPLES)
+    np.testing.assert_allclose(np.linalg.norm(directions, axis=1), 1)
+    angles = np.arctan2(directions[:, 1], directions[:, 0])
+    counts = np.histogram(angles, bins=16, range=(-np.pi, np.pi))[0]
+    np.testing.assert_allclose(counts / N_SAMPLES, 1 / 16, atol=3e-3)
+
+
+def test_use_stream_restores_process_stream():
+    seed_generators(8)
+    process_stream = get_stream()
+    child = RandomStream(9)
+    with use_stream(child):
+        assert get_stream() is child
+    assert get_stream() is process_stream
+
+
+def test_alias_table_probabilities():
+    weights = np.array([1, 0, 3, 0.5, 5.5])
+    table = AliasTable(weights)
+    np.testing.assert_allclose(alias_probabilities(table), weights / weights.sum())
+    seed_generators(6)
+    counts = np.bincount(table.sample(N_SAMPLES), minlength=len(weights))
+    assert counts[1] == 0
+    np.testing.assert_allclose(counts / N_SAMPLES, weights / weights.sum(), atol=5e-3)
+
+
+def test_alias_table_requires_positive_weights():
+    with pytest.raises(Exception):
+        AliasTable([0, 0])
+
+
+def test_particle_streams_do_not_depend_on_batches():
+    batched = ParticleStreams(6, RandomStream(10))
+    first = batched.uniform(np.arange(6), 2)
+    second = batched.uniform(np.array([4, 1]), 1)
+    single = ParticleStreams(6, RandomStream(10))
+    np.testing.assert_array_equal(first, np.concatenate([single.uniform([particle], 2) for particle in range(6)]))
+    np.testing.assert_array_equal(second, np.concatenate((single.uniform([4], 1), single.uniform([1], 1))))
+    assert len(np.unique(np.concatenate((first.ravel(), second.ravel())))) == 14
+
+
+def test_hash_uniforms_are_uniform():
+    values = hash_uniforms(np.uint64(11), np.arange(1000)[:, None], np.arange(200)[None, :]).ravel()
+    assert ((values >= 0) & (values < 1)).all()
+    counts = np.histogram(values, bins=20, range=(0, 1))[0]
+    np.testing.assert_allclose(counts / len(values), 1 / 20, atol=2e-3)
@@ -0,0 +1,71 @@
+import numpy as np
+import pytest
+
+from utils.spatial_index import SegmentGrid
+from utils.vectorized_operations import (
+    crossing_test, first_intersections, first_parabolic_crossings, point_segment_distances, supporting_lines
+)
+
+
+N_POINTS = 2000
+
+
+def test_contains_matches_crossing_test(l_shape):
+    seg_starts, seg_ends, seg_normals = l_shape
+    grid = SegmentGrid(seg_starts, seg_ends, seg_normals)
+    points = np.random.default_rng(0).uniform(-0.5, 4.5, (N_POINTS, 2))
+    np.testing.assert_array_equal(grid.contains(points), crossing_test(points, seg_starts, seg_ends))
+
+
+def test_contains_boundary_points(l_shape):
+    seg_starts, seg_ends, seg_normals = l_shape
+    grid = SegmentGrid(seg_starts, seg_ends, seg_normals)
+    assert grid.contains(0.5 * (seg_starts + seg_ends)).all()
+
+
+def test_first_hits_match_brute_force(l_shape):
+    seg_starts, seg_ends, seg_normals = l_shape
+    grid = SegmentGrid(seg_starts, seg_ends, seg_normals)
+    rng = np.random.default_rng(1)
+    origins = rng.uniform(0, 4, (N_POINTS, 2))
+    origins = origins[crossing_test(origins, seg_starts, seg_ends)]
+    displacements = rng.normal(0, 2, (len(origins), 2))
+    hit_ids, hit_params = grid.first_hits(origins, displacements)
+    expected_ids, expected_params = first_intersections(
+        origins, displacements, seg_starts, seg_ends - seg_starts, seg_normals
+    )
+    np.testing.assert_array_equal(hit_ids, expected_ids)
+    np.testing.assert_allclose(hit_params, expected_params)
+    assert (hit_ids >= 0).any() and (hit_ids < 0).any()
+
+
+def test_first_parabolic_hits_match_brute_force(l_shape):
+    seg_starts, seg_ends, seg_normals = l_shape
+    grid = SegmentGrid(seg_starts, seg_ends, seg_normals)
+    rng = np.random.default_rng(2)
+    origins = rng.uniform(0, 4, (N_POINTS, 2))
+    origins = origins[crossing_test(origins, seg_starts, seg_ends)]
+    velocities = rng.normal(0, 2, (len(origins), 2))
+    acceleration = np.array([-3.0, 1.0])
+    horizons = rng.uniform(0, 1.5, len(origins))
+    hit_ids, hit_times = grid.first_parabolic_hits(origins, velocities, acceleration, horizons)
+    expected_ids, expected_times = first_parabolic_crossings(
+        origins, velocities, acceleration, horizons, seg_starts, seg_ends - seg_starts,
+        supporting_lines(seg_starts, seg_normals)
+    )
+    np.testing.assert_array_equal(hit_ids, expected_ids)
+    np.testing.assert_allclose(hit_times, expected_times)
+    assert (hit_ids >= 0).any() and (hit_ids < 0).any()
+
+
+def test_nearest_segment_and_min_distances(l_shape):
+    seg_starts, seg_ends, seg_normals = l_shape
+    grid = SegmentGrid(seg_starts, seg_ends, seg_normals)
+    points = np.random.default_rng(2).uniform(-1, 5, (200, 2))
+    distances = point_segment_distances(points, seg_starts, seg_ends)
+    for point, point_distances in zip(points, distances):
+        seg_id, distance = grid.nearest_segment(point)
+        assert distance == pytest.approx(point_distances.min())
+        assert point_distances[seg_id] == pytest.approx(distance)
+    radius = 0.3
+    np.testing.assert_allclose(grid.min_distances(points, radius), np.minimum(distances.min(axis=1), radius))
@@ -0,0 +1,32 @@
+import numpy as np
+import pytest
+
+from pathlib import Path
+
+skgeom = pytest.importorskip('skgeom')
+
+from model.topology import Topology
+
+
+SVG_GEOMETRIES = sorted(Path(__file__).resolve().parent.glob('diode*.svg'))
+SVG_SCALE = 1e-9
+SVG_CUR_SEGMENTS = ((0,), (1,))
+N_POINTS = 500
+# Points closer to the boundary than this fraction of the bounding box diagonal are skipped (float rounding zone)
+EDGE_FRACTION = 1e-6
+# Sampling box margin (fraction of the bounding box), so some points fall outside the geometry
+BOX_MARGIN = 0.1
+
+
+@pytest.mark.parametrize('file', SVG_GEOMETRIES, ids=lambda file: file.stem)
+def test_contains_matches_locate(file):
+    topology = Topology.from_file(str(file), SVG_SCALE, SVG_CUR_SEGMENTS)
+    low = np.minimum(topology.seg_starts, topology.seg_ends).min(axis=0)
+    high = np.maximum(topology.seg_starts, topology.seg_ends).max(axis=0)
+    tolerance = EDGE_FRACTION * float(np.hypot(*(high - low)))
+    margin = BOX_MARGIN * (high - low)
+    points = np.random.default_rng(0).uniform(low - margin, high + margin, (N_POINTS, 2))
+    points = points[topology.boundary_distances(points, tolerance) >= tolerance]
+    expected = [topology.locate(skgeom.Point2(*point)) for point in points]
+    np.testing.assert_array_equal(topology.contains(points), expected)
+    assert any(expected) and not all(expected)
@@ -0,0 +1,61 @@
+import numpy as np
+import pytest
+
+from tests.shapes import L_AREA
+from utils.vectorized_operations import (
+    slab_triangulation, triangle_areas, crossing_test, intersection_params, parabolic_crossing_times,
+    first_parabolic_crossings, outward_normals, supporting_lines
+)
+
+
+UNIT_SQUARE = np.array([[0, 0], [1, 0], [1, 1], [0, 1]], dtype=np.float64)
+
+
+def square_segments() -> tuple[np.ndarray, np.ndarray, np.ndarray]:
+    seg_starts = UNIT_SQUARE
+    seg_directions = np.roll(UNIT_SQUARE, -1, axis=0) - seg_starts
+    return seg_starts, seg_directions, supporting_lines(seg_starts, outward_normals(seg_directions))
+
+
+def test_slab_triangulation_covers_region(l_shape):
+    seg_starts, seg_ends, _ = l_shape
+    triangles = slab_triangulation(seg_starts, seg_ends)
+    assert triangle_areas(triangles).sum() == pytest.approx(L_AREA)
+    centroids = triangles.mean(axis=1)
+    assert crossing_test(centroids[triangle_areas(triangles) > 0], seg_starts, seg_ends).all()
+
+
+def test_slab_triangulation_empty():
+    assert slab_triangulation(np.zeros((0, 2)), np.zeros((0, 2))).shape == (0, 3, 2)
+
+
+def test_parabolic_crossings_without_acceleration_match_straight_paths():
+    seg_starts, seg_directions, seg_lines = square_segments()
+    rng = np.random.default_rng(3)
+    origins = rng.uniform(0.1, 0.9, (500, 2))
+    velocities = rng.normal(0, 1, (500, 2))
+    horizons = rng.uniform(0.1, 2, 500)
+    times = parabolic_crossing_times(
+        origins, velocities, np.zeros(2), horizons, seg_starts, seg_directions, seg_lines
+    )
+    params = intersection_params(
+        origins, velocities * horizons[:, None], seg_starts, seg_directions, seg_lines[:, :2]
+    )
+    np.testing.assert_allclose(times, params * horizons[:, None])
+
+
+def test_first_parabolic_crossings_analytic_times():
+    seg_starts, seg_directions, seg_lines = square_segments()
+    origins = np.array([[0.5, 0.5], [0.5, 0.5], [0.5, 0.5]])
+    # Pushed from rest toward the right edge; launched right but turned back to the left edge; stopped before any edge
+    velocities = np.array([[0, 0], [1, 0], [1, 0]])
+    accelerations = np.array([[2, 0], [-4, 0], [-4, 0]])
+    horizons = np.array([10, 10, 0.5])
+    hits = [
+        first_parabolic_crossings(
+            origin, velocity, acceleration, horizon, seg_starts, seg_directions, seg_lines
+        ) for origin, velocity, acceleration, horizon in zip(origins, velocities, accelerations, horizons)
+    ]
+    assert hits[0][0][0] == 1 and hits[0][1][0] == pytest.approx(np.sqrt(0.5))
+    assert hits[1][0][0] == 3 and hits[1][1][0] == pytest.approx((1 + np.sqrt(5)) / 4)
+    assert hits[2][0][0] == -1 and hits[2][1][0] == np.inf
@@ -52,21 +52,6 @@ def mirror(vec: Vector2, normal_vec: Vector2) -> Vector2:
         return vec
 
 
-def calc_normal(segment: Segment2, point: Point2):
-    """
-    Calculate segment normal vector
-
-    :param segment: segment to define normal vector
-    :param point: point to direct normal vector
-    :return: normal vector (or None, if there is no segment)
-    """
-    if not segment:
-        return None
-    supporting_line = segment.supporting_line()
-    perpendicular_line = supporting_line.perpendicular(point)
-    return perpendicular_line.to_vector()
-
-
 def vec_to_point(vector: Vector2) -> Point2:
     """
     Convert vector to point
@@ -0,0 +1,180 @@
+import numpy as np
+
+
+DEFAULT_CONFIDENCE = 0.95
+DEFAULT_BATCH_SIZE = 100
+DEFAULT_MIN_BATCHES = 10
+DEFAULT_TRACE_POINTS = 10000
+
+
+class BatchMeans:
+    def __init__(
+            self,
+            batch_size: int = DEFAULT_BATCH_SIZE,
+            confidence: float = DEFAULT_CONFIDENCE,
+            min_batches: int = DEFAULT_MIN_BATCHES
+    ):
+        """
+        Batch means estimator of a ratio of cumulative quantities (e.g. crossed charge / simulated time). Consecutive
+        time steps are grouped into batches; each batch gives one nearly independent estimate (increment ratio), and
+        the estimator confidence interval is calculated from the dispersion of the batches estimates
+
+        :param batch_size: number of time steps of each batch
+        :param confidence: confidence level of the interval
+        :param min_batches: minimum number of batches before an interval is reported
+        """
+        self.batch_size = int(batch_size)
+        self.confidence = confidence
+        self.min_batches = max(int(min_batches), 2)
+        self.batches = list()
+        self._steps = 0
+        self._numerator = 0
+        self._denominator = 0
+        self._half_width = np.inf
+
+
+    def add(self, numerator: float, denominator: float, steps: int = 1):
+        """
+        Add cumulative values after new time steps. A batch is closed every batch_size steps
+
+        :param numerator: cumulative numerator (e.g. particles counter)
+        :param denominator: cumulative denominator (e.g. simulated time)
+        :param steps: number of time steps since the last call
+        :return: None
+        """
+        self._steps += steps
+        if self._steps >= self.batch_size and denominator > self._denominator:
+            self.batches.append((numerator - self._numerator) / (denominator - self._denominator))
+            self._steps = 0
+            self._numerator = numerator
+            self._denominator = denominator
+            self._half_width = self._calc_half_width()
+
+
+    @property
+    def n_batches(self) -> int:
+        return len(self.batches)
+
+
+    def half_width(self) -> float:
+        """
+        Get confidence interval half width of the estimator (updated only when a batch is closed)
+
+        :return: half width (inf while there are not enough batches)
+        """
+        return self._half_width
+
+
+    def _calc_half_width(self) -> float:
+        """
+        Calculate confidence interval half width of the estimator (student t interval of batch means)
+
+        :return: half width (inf while there are not enough batches)
+        """
+        if self.n_batches < self.min_batches:
+            return np.inf
+        from scipy.stats import t as student_t
+
+        quantile = student_t.ppf((1 + self.confidence) / 2, self.n_batches - 1)
+        return quantile * np.std(self.batches, ddof=1) / np.sqrt(self.n_batches)
+
+
+    def converged(self, estimate: float, rel_error: float = None, abs_error: float = None, scale: float = 1) -> bool:
+        """
+        Check if the confidence interval reached any of the target errors
+
+        :param estimate: current estimator value (same unit of the targets)
+        :param rel_error: target relative error (None to disable)
+        :param abs_error: target absolute error (None to disable)
+        :param scale: factor converting batches estimates to the estimate unit
+        :return: convergence condition
+        """
+        if rel_error is None and abs_error is None:
+            return False
+        error = scale * self.half_width()
+        if abs_error is not None and error <= abs_error:
+            return True
+        return rel_error is not None and error <= rel_error * abs(estimate)
+
+
+class CurrentTrace:
+    def __init__(self, max_points: int = DEFAULT_TRACE_POINTS):
+        """
+        Fixed memory record of the current along the simulation: running mean and variance (Welford) of every value,
+        plus a decimated trace for plotting. When the trace is full, every other point is dropped and the recording
+        stride is doubled. The full trace can be streamed to a file
+
+        :param max_points: maximum number of stored trace points
+        """
+        self.max_points = max(2, int(max_points) // 2 * 2)
+        self.steps = np.empty(self.max_points, dtype=np.int64)
+        self.values = np.empty(self.max_points)
+        self.n_points = 0
+        self.stride = 1
+        self.count = 0
+        self.mean = 0.0
+        self._m2 = 0.0
+        self._file = None
+
+
+    def stream(self, file: str):
+        """
+        Stream every added value to a file (one value per line)
+
+        :param file: trace file path
+        :return: None
+        """
+        self.close()
+        self._file = open(file, 'w')
+
+
+    def close(self):
+        """
+        Close trace file (if streaming)
+
+        :return: None
+        """
+        if self._file is not None:
+            self._file.close()
+            self._file = None
+
+
+    def add(self, value: float):
+        """
+        Add value of a new time step
+
+        :param value: current value
+        :return: None
+        """
+        self.count += 1
+        delta = value - self.mean
+        self.mean += delta / self.count
+        self._m2 += delta * (value - self.mean)
+        if self._file is not None:
+            self._file.write(f'{value}\n')
+        if (self.count - 1) % self.stride:
+            return
+        if self.n_points == self.max_points:
+            half = self.max_points // 2
+            self.steps[:half] = self.steps[::2]
+            self.values[:half] = self.values[::2]
+            self.n_points = half
+            self.stride *= 2
+        self.steps[self.n_points] = self.count - 1
+        self.values[self.n_points] = value
+        self.n_points += 1
+
+
+    @property
+    def variance(self) -> float:
+        return self._m2 / (self.count - 1) if self.count > 1 else 0.0
+
+
+    def trace(self) -> tuple[np.ndarray, np.ndarray]:
+        """
+        Get decimated trace
+
+        :return: time steps of the stored points
+        :return: stored current values
+        """
+        return self.steps[:self.n_points], self.values[:self.n_points]
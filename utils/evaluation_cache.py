@@ -0,0 +1,84 @@
+import json
+import time
+import sqlite3
+import hashlib
+
+from pathlib import Path
+
+
+DEFAULT_FILE = 'outputs/optimization/evaluation_cache.sqlite'
+DEFAULT_MAX_ENTRIES = 10000
+CONNECTION_TIMEOUT = 60
+
+
+class EvaluationCache:
+    def __init__(self, file: str = DEFAULT_FILE, max_entries: int = DEFAULT_MAX_ENTRIES):
+        """
+        Persistent content-addressed cache of simulation results (sqlite file). Entries are addressed by the hash of
+        everything that defines a simulation, so the cache can be shared across optimizer restarts and worker
+        processes. The least recently used entries are evicted when max_entries is exceeded
+
+        :param file: cache file path
+        :param max_entries: maximum number of stored results
+        """
+        self.file = Path(file)
+        self.max_entries = int(max_entries)
+        self.file.parent.mkdir(parents=True, exist_ok=True)
+        with self._connect() as connection:
+            connection.execute(
+                'CREATE TABLE IF NOT EXISTS results (key TEXT PRIMARY KEY, value TEXT NOT NULL, last_access REAL)'
+            )
+
+
+    def _connect(self) -> sqlite3.Connection:
+        """
+        Open a new connection (connections are not shared, so the cache can be used by several processes)
+
+        :return: sqlite connection
+        """
+        return sqlite3.connect(self.file, timeout=CONNECTION_TIMEOUT)
+
+
+    @staticmethod
+    def make_key(**parts) -> str:
+        """
+        Create content address of a simulation
+
+        :param parts: JSON serializable simulation definition (numpy scalars are converted to float)
+        :return: sha256 hex digest
+        """
+        content = json.dumps(parts, sort_keys=True, default=float)
+        return hashlib.sha256(content.encode()).hexdigest()
+
+
+    def get(self, key: str):
+        """
+        Get cached value and mark it as recently used
+
+        :param key: content address
+        :return: cached value (None if not cached)
+        """
+        with self._connect() as connection:
+            row = connection.execute('SELECT value FROM results WHERE key = ?', (key,)).fetchone()
+            if row is None:
+                return None
+            connection.execute('UPDATE results SET last_access = ? WHERE key = ?', (time.time(), key))
+        return json.loads(row[0])
+
+
+    def put(self, key: str, value):
+        """
+        Store value and evict least recently used entries beyond max_entries
+
+        :param key: content address
+        :param value: JSON serializable value
+        :return: None
+        """
+        with self._connect() as connection:
+            connection.execute(
+                'INSERT OR REPLACE INTO results VALUES (?, ?, ?)', (key, json.dumps(value, default=float), time.time())
+            )
+            connection.execute(
+                'DELETE FROM results WHERE key NOT IN (SELECT key FROM results ORDER BY last_access DESC LIMIT ?)',
+                (self.max_entries,)
+            )
@@ -0,0 +1,90 @@
+import numpy as np
+
+from skgeom import Vector2
+from utils.complementary_operations import mirror, calc_versor, norm
+
+
+FLOAT_EPSILON = 1e-15
+
+
+class ExactGeometry:
+    """
+    Particle kinematics on scikit-geometry exact vectors
+    """
+    name = 'exact'
+
+
+    @staticmethod
+    def vector(x: float, y: float) -> Vector2:
+        return Vector2(x, y)
+
+
+    @staticmethod
+    def convert(vector: Vector2) -> Vector2:
+        return vector
+
+
+    @staticmethod
+    def coords(vector: Vector2) -> np.ndarray:
+        return np.array([float(vector.x()), float(vector.y())])
+
+
+    @staticmethod
+    def norm(vector: Vector2) -> float:
+        return norm(vector)
+
+
+    @staticmethod
+    def versor(vector: Vector2) -> Vector2:
+        return calc_versor(vector)
+
+
+    @staticmethod
+    def mirror(vector: Vector2, normal_vec: Vector2) -> Vector2:
+        return mirror(vector, normal_vec)
+
+
+class FloatGeometry:
+    """
+    Particle kinematics on float64 arrays (2,). Null vectors (norm below FLOAT_EPSILON) are not normalized
+    """
+    name = 'float'
+
+
+    @staticmethod
+    def vector(x: float, y: float) -> np.ndarray:
+        return np.array([x, y], dtype=np.float64)
+
+
+    @staticmethod
+    def convert(vector) -> np.ndarray:
+        if isinstance(vector, np.ndarray):
+            return vector.astype(np.float64)
+        return np.array([float(vector.x()), float(vector.y())])
+
+
+    @staticmethod
+    def coords(vector: np.ndarray) -> np.ndarray:
+        return vector
+
+
+    @staticmethod
+    def norm(vector: np.ndarray) -> float:
+        return float(np.hypot(vector[0], vector[1]))
+
+
+    @staticmethod
+    def versor(vector: np.ndarray) -> np.ndarray:
+        length = np.hypot(vector[0], vector[1])
+        return vector / length if length > FLOAT_EPSILON else vector
+
+
+    @staticmethod
+    def mirror(vector: np.ndarray, normal_vec: np.ndarray) -> np.ndarray:
+        squared_length = normal_vec[0] ** 2 + normal_vec[1] ** 2
+        if squared_length <= FLOAT_EPSILON ** 2:
+            return vector
+        return vector - 2 * (vector[0] * normal_vec[0] + vector[1] * normal_vec[1]) / squared_length * normal_vec
+
+
+GEOMETRIES = {ExactGeometry.name: ExactGeometry, FloatGeometry.name: FloatGeometry}
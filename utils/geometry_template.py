@@ -0,0 +1,131 @@
+import re
+import numpy as np
+
+
+PARAM_PATTERN = re.compile(r'\bx(\d+)\b')
+EXPRESSION_NAMESPACE = {'np': np}
+
+
+def compile_expression(expression: str):
+    """
+    Evaluate a configuration expression (e.g. constraint lambda or bound) once, with numpy available as np
+
+    :param expression: python expression
+    :return: expression value
+    """
+    return eval(compile(expression, '<expression>', 'eval'), dict(EXPRESSION_NAMESPACE))
+
+
+def evaluate_constraints(consts: list, population: np.ndarray) -> np.ndarray:
+    """
+    Evaluate constraints functions of a whole population. Each constraint is called once with the transposed
+    population (x[i] is the i-th parameter of every individual); constraints that do not return one value per
+    individual are evaluated individually
+
+    :param consts: constraints functions of one parameters vector
+    :param population: parameters matrix (pop, n_params)
+    :return: constraints values (pop, n_consts)
+    """
+    population = np.atleast_2d(np.asarray(population, dtype=np.float64))
+    values = np.empty((len(population), len(consts)))
+    for i, const in enumerate(consts):
+        try:
+            value = np.asarray(const(population.T), dtype=np.float64)
+        except (TypeError, ValueError, IndexError):
+            value = None
+        if value is None or value.shape != (len(population),):
+            value = np.array([const(individual) for individual in population], dtype=np.float64)
+        values[:, i] = value
+    return values
+
+
+class GeometryTemplate:
+    def __init__(self, geo_mask: list):
+        """
+        Geometry mask compiled once into a vectorized function of the parameters. Coordinates can be numbers or
+        expressions of the parameters x0, x1, ... (and numpy as np). A whole parameters matrix (population) is mapped
+        to vertices arrays in one numpy operation
+
+        :param geo_mask: list of points [x, y] (numbers or expressions strings)
+        """
+        self.geo_mask = geo_mask
+        self.n_points = len(geo_mask)
+        self.n_params = 1 + max(
+            [int(index) for point in geo_mask for coord in point if isinstance(coord, str)
+             for index in PARAM_PATTERN.findall(coord)],
+            default=-1
+        )
+        self._compile()
+
+
+    def __getstate__(self) -> dict:
+        """
+        Get picklable state (code objects are recompiled by the worker processes)
+
+        :return: template state
+        """
+        return {'geo_mask': self.geo_mask}
+
+
+    def __setstate__(self, state: dict):
+        self.__init__(state['geo_mask'])
+
+
+    def _compile(self):
+        """
+        Compile all coordinates into one code object building a (n_points, 2) tuple of parameters columns
+
+        :return: None
+        """
+        coords = list()
+        for point in self.geo_mask:
+            if len(point) != 2:
+                raise ValueError(f'Invalid geo_mask point {point}: points must have two coordinates')
+            coords.append('(' + ', '.join(self._coord_source(coord) for coord in point) + ',)')
+        source = 'lambda x: (' + ', '.join(coords) + ',)'
+        try:
+            self._builder = eval(compile(source, '<geo_mask>', 'eval'), dict(EXPRESSION_NAMESPACE))
+        except SyntaxError as error:
+            raise ValueError(f'Invalid geo_mask expression: {error}') from error
+
+
+    @staticmethod
+    def _coord_source(coord) -> str:
+        """
+        Translate one coordinate into source code indexing the transposed parameters matrix (x{i} -> x[i])
+
+        :param coord: number or expression string
+        :return: coordinate source code
+        """
+        if isinstance(coord, str):
+            return '(' + PARAM_PATTERN.sub(r'x[\1]', coord) + ')'
+        return repr(float(coord))
+
+
+    def build(self, params) -> np.ndarray:
+        """
+        Calculate vertices of every parameters vector
+
+        :param params: parameters matrix (pop, n_params) or vector (n_params)
+        :return: vertices array (pop, n_points, 2)
+        """
+        params = np.atleast_2d(np.asarray(params, dtype=np.float64))
+        if params.shape[1] < self.n_params:
+            raise ValueError(f'geo_mask requires {self.n_params} parameters, but {params.shape[1]} were given')
+        coords = self._builder(params.T)
+        vertices = np.empty((len(params), self.n_points, 2))
+        for i, point in enumerate(coords):
+            for j, coord in enumerate(point):
+                vertices[:, i, j] = coord
+        return vertices
+
+
+    @staticmethod
+    def feasible(vertices: np.ndarray) -> np.ndarray:
+        """
+        Validate vertices arrays in bulk: geometries must have finite and non-negative coordinates
+
+        :param vertices: vertices array (pop, n_points, 2)
+        :return: feasibility of each geometry (pop)
+        """
+        return np.all(np.isfinite(vertices) & (vertices >= 0), axis=(1, 2))
@@ -0,0 +1,132 @@
+import os
+import json
+import time
+
+from functools import wraps
+
+
+DEFAULT_TRACE_EVENTS = 200000
+_MISSING = object()
+
+
+class Instrumentation:
+    def __init__(self, trace: bool = False, max_events: int = DEFAULT_TRACE_EVENTS):
+        """
+        Opt-in per-phase timers. Methods are timed by replacing them on the instrumented instances (attach) and
+        restored afterward (detach), so nothing is paid when instrumentation is not created. Every call of a timed
+        phase can also be recorded as a Chrome trace event
+
+        :param trace: define if call events are recorded for the Chrome trace
+        :param max_events: maximum number of recorded trace events (phases are still timed beyond it)
+        """
+        self.trace = trace
+        self.max_events = int(max_events)
+        self.phases = dict()
+        self.events = list()
+        self.start = time.perf_counter()
+        self._attached = list()
+
+
+    def wrap(self, phase: str, func):
+        """
+        Create timed version of a function
+
+        :param phase: phase name
+        :param func: function to be timed
+        :return: timed function
+        """
+        stats = self.phases.setdefault(phase, [0, 0.0])
+        events = self.events
+
+        @wraps(func)
+        def timed(*args, **kwargs):
+            start = time.perf_counter()
+            try:
+                return func(*args, **kwargs)
+            finally:
+                elapsed = time.perf_counter() - start
+                stats[0] += 1
+                stats[1] += elapsed
+                if self.trace and len(events) < self.max_events:
+                    events.append((phase, start, elapsed))
+        return timed
+
+
+    def attach(self, obj, methods: list, prefix: str):
+        """
+        Time methods of one instance (missing methods are ignored)
+
+        :param obj: instrumented instance
+        :param methods: methods names
+        :param prefix: phases names prefix (i.e. 'topology')
+        :return: None
+        """
+        for name in methods:
+            method = getattr(obj, name, None)
+            if method is None:
+                continue
+            self._attached.append((obj, name, obj.__dict__.get(name, _MISSING)))
+            setattr(obj, name, self.wrap(f'{prefix}.{name}', method))
+
+
+    def detach(self):
+        """
+        Restore all attached methods
+
+        :return: None
+        """
+        for obj, name, original in reversed(self._attached):
+            if original is _MISSING:
+                obj.__dict__.pop(name, None)
+            else:
+                setattr(obj, name, original)
+        self._attached = list()
+
+
+    def summary(self, counters: dict = None) -> dict:
+        """
+        Build run summary: wall time, inclusive time of each phase (nested phases are also counted in their callers)
+        and counters
+
+        :param counters: run counters (i.e. steps, wall hits)
+        :return: summary dictionary
+        """
+        phases = {
+            phase: {'calls': calls, 'total': total, 'mean': total / calls if calls else 0.0}
+            for phase, (calls, total) in sorted(self.phases.items(), key=lambda item: -item[1][1])
+        }
+        return {
+            'wall_time': time.perf_counter() - self.start,
+            'phases': phases,
+            'counters': dict(counters or {}),
+            'trace_events': len(self.events)
+        }
+
+
+    def save(self, file: str, counters: dict = None, **metadata):
+        """
+        Save JSON summary (see summary)
+
+        :param file: summary file path
+        :param counters: run counters
+        :param metadata: extra values saved with the summary (i.e. voltage, engine)
+        :return: None
+        """
+        with open(file, 'w') as f:
+            json.dump({**metadata, **self.summary(counters)}, f, indent=2, default=float)
+
+
+    def save_trace(self, file: str):
+        """
+        Save recorded events in Chrome trace format (chrome://tracing or Perfetto)
+
+        :param file: trace file path
+        :return: None
+        """
+        pid = os.getpid()
+        trace_events = [
+            {'name': phase, 'ph': 'X', 'ts': (start - self.start) * 1e6, 'dur': elapsed * 1e6, 'pid': pid, 'tid': 0}
+            for phase, start, elapsed in self.events
+        ]
+        with open(file, 'w') as f:
+            json.dump({'traceEvents': trace_events, 'displayTimeUnit': 'ms'}, f)
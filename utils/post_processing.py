@@ -1,7 +1,64 @@
-import matplotlib.pyplot as plt
+import os
+import sys
+import time
 
-from datetime import datetime
-from matplotlib.ticker import EngFormatter
+from datetime import datetime, timedelta
+
+
+DEFAULT_PROGRESS_INTERVAL = 1.0
+PROGRESS_BAR_WIDTH = 50
+PLOT_MODES = ('interactive', 'agg', 'off')
+PLOT_MODE_VARIABLE = 'DIODE_PLOTS'
+INTERACTIVE_BACKEND = 'TkAgg'
+
+_backend = None
+
+
+def set_plot_mode(mode: str):
+    """
+    Define plotting mode of this process and of the processes it starts (environment variable inherited by workers)
+
+    :param mode: 'interactive' (windows with TkAgg), 'agg' (headless, figures are only saved) or 'off' (no plots)
+    :return: None
+    """
+    if mode not in PLOT_MODES:
+        raise Exception(f'Unknown plot mode: {mode}')
+    os.environ[PLOT_MODE_VARIABLE] = mode
+
+
+def plot_mode() -> str:
+    """
+    Get plotting mode. If not defined, it is 'interactive' when a display is available and 'agg' otherwise
+
+    :return: plotting mode
+    """
+    mode = os.environ.get(PLOT_MODE_VARIABLE)
+    if mode is None:
+        display = not sys.platform.startswith('linux') or 'DISPLAY' in os.environ or 'WAYLAND_DISPLAY' in os.environ
+        return 'interactive' if display else 'agg'
+    if mode not in PLOT_MODES:
+        raise Exception(f'Unknown plot mode: {mode}')
+    return mode
+
+
+def get_pyplot():
+    """
+    Import pyplot with the backend of the plotting mode. Imports are deferred to the first plot, so processes that do
+    not plot (i.e. workers) never load matplotlib nor GUI backends. The backend is switched even if pyplot was already
+    imported by another module, and again if the plotting mode changes
+
+    :return: matplotlib.pyplot module
+    """
+    global _backend
+    backend = INTERACTIVE_BACKEND if plot_mode() == 'interactive' else 'Agg'
+    if 'matplotlib.pyplot' not in sys.modules:
+        import matplotlib
+        matplotlib.use(backend)
+    import matplotlib.pyplot as plt
+    if backend != _backend:
+        plt.switch_backend(backend)
+        _backend = backend
+    return plt
 
 
 def calc_asymmetry(current_list: list, voltages: list) -> tuple[list, list]:
@@ -24,6 +81,9 @@ def calc_asymmetry(current_list: list, voltages: list) -> tuple[list, list]:
 
 
 def plot_figs(asymmetric_voltages, curr_voltages, asymmetry, current, drude_curr):
+    if plot_mode() == 'off':
+        return
+    plt = get_pyplot()
     fig_asymmetry = plt.figure(figsize=(12, 6))
     plt.plot(asymmetric_voltages, asymmetry)
     plt.ticklabel_format(axis='y', style='sci', scilimits=(0, 0))
@@ -58,24 +118,121 @@ def save_current(current_file: str, meas_current: float, simulated_geometry: str
         f.write(string_to_be_saved)
 
 
-def progress_bar(progress, total):
-    """
-    Print progress bar
-
-    :param progress: evolved situation
-    :param total: expect max situation
-    :return: None
-    """
-    percent = 100 * (progress / total)
-    bar = '█' * int(percent) + '-' * (100 - int(percent))
-    print(f'\r|{bar}| {percent:.2f}%', end='\r')
-
-
-def plot_stable_current(currents, voltage):
+class ProgressReporter:
+    def __init__(
+            self,
+            total: float,
+            label: str = '',
+            unit: str = 'collisions',
+            interval: float = DEFAULT_PROGRESS_INTERVAL,
+            step_interval: int = None,
+            stream=None,
+            enabled: bool = None,
+            inline: bool = True
+    ):
+        """
+        Throttled progress and throughput report (bar, rates and ETA). A report is written at most every interval
+        seconds (or every step_interval updates, if defined) and the reporter is disabled when the stream is not a
+        terminal, so redirected runs are not flooded
+
+        :param total: expected final progress (inf if unknown: no bar nor ETA)
+        :param label: text written before the report
+        :param unit: progress unit (i.e. 'collisions', 'points')
+        :param interval: minimum time between reports [s]
+        :param step_interval: number of updates between reports (time interval is used if not defined)
+        :param stream: output stream (stdout if not defined)
+        :param enabled: force reporter on or off (enabled only on terminals if not defined)
+        :param inline: define if reports overwrite each other on one line (each report has its own line otherwise)
+        """
+        self.total = total
+        self.label = label
+        self.unit = unit
+        self.interval = interval
+        self.step_interval = step_interval
+        self.stream = stream if stream is not None else sys.stdout
+        isatty = getattr(self.stream, 'isatty', None)
+        self.enabled = enabled if enabled is not None else bool(isatty and isatty())
+        self.inline = inline
+        self.start = time.monotonic()
+        self._last_report = self.start
+        self._updates = 0
+        self._progress = 0
+        self._steps = None
+
+
+    def update(self, progress: float, steps: int = None):
+        """
+        Record progress and write a report if the interval has elapsed
+
+        :param progress: current progress (same unit of total)
+        :param steps: current number of time steps (steps rate is reported if defined)
+        :return: None
+        """
+        if not self.enabled:
+            return
+        self._progress = progress
+        self._steps = steps
+        self._updates += 1
+        if self.step_interval is not None:
+            if self._updates % self.step_interval:
+                return
+        else:
+            now = time.monotonic()
+            if now - self._last_report < self.interval:
+                return
+            self._last_report = now
+        self._write()
+
+
+    def close(self):
+        """
+        Write the final report and end the line (inline reports only)
+
+        :return: None
+        """
+        if not self.enabled or not self.inline:
+            return
+        self._write()
+        self.stream.write('\n')
+        self.stream.flush()
+
+
+    def _write(self):
+        """
+        Write report line (bar, percentage, rates and ETA)
+
+        :return: None
+        """
+        elapsed = max(time.monotonic() - self.start, 1e-9)
+        rate = self._progress / elapsed
+        fields = [self.label] if self.label else []
+        if self.total != float('inf') and self.total > 0:
+            fraction = min(self._progress / self.total, 1)
+            filled = int(PROGRESS_BAR_WIDTH * fraction)
+            fields.append(f"|{'█' * filled}{'-' * (PROGRESS_BAR_WIDTH - filled)}| {100 * fraction:.2f}%")
+        fields.append(f'{rate:.3g} {self.unit}/s')
+        if self._steps is not None:
+            fields.append(f'{self._steps / elapsed:.3g} steps/s')
+        if self.total != float('inf') and rate > 0:
+            remaining = max(self.total - self._progress, 0) / rate
+            fields.append(f'ETA {timedelta(seconds=int(remaining))}')
+        if self.inline:
+            self.stream.write('\r' + ' '.join(fields) + '\x1b[K')
+        else:
+            self.stream.write(' '.join(fields) + '\n')
+        self.stream.flush()
+
+
+def plot_stable_current(time_steps, currents, voltage):
+    if plot_mode() == 'off':
+        return
+    from matplotlib.ticker import EngFormatter
+
+    plt = get_pyplot()
     fig_curr, ax = plt.subplots(figsize=(12, 6))
     formatter = EngFormatter(places=1, sep="\N{THIN SPACE}")
     ax.yaxis.set_major_formatter(formatter)
-    plt.plot(currents)
+    plt.plot(time_steps, currents)
     ax.set_xlabel('time step')
     ax.set_ylabel('Current [A]')
     plt.savefig(f"outputs/current_stable/currents{'%s' % float('%.1g' % voltage)}.png", dpi=fig_curr.dpi)
@@ -1,8 +1,212 @@
-import random
 import numpy as np
-from skgeom import Point2, Segment2
 
-# random.seed(13548)
+from contextlib import contextmanager
+
+
+DEFAULT_BLOCK_SIZE = 4096
+HASH_INCREMENT = np.uint64(0x9E3779B97F4A7C15)
+HASH_MULTIPLIER_1 = np.uint64(0xBF58476D1CE4E5B9)
+HASH_MULTIPLIER_2 = np.uint64(0x94D049BB133111EB)
+HASH_TO_UNIT = 1.0 / 9007199254740992.0
+
+
+class RandomStream:
+    def __init__(self, seed=None, block_size: int = DEFAULT_BLOCK_SIZE):
+        """
+        Counter-based (Philox) random stream. Uniform numbers are pre-generated in blocks, so scalar and batched draws
+        share the same sequence and the per-draw overhead is an array slice. Independent child streams can be spawned
+        for workers or tasks
+
+        :param seed: int seed or numpy SeedSequence (None for non-deterministic seed)
+        :param block_size: number of uniform numbers generated at once
+        """
+        self.seed_sequence = seed if isinstance(seed, np.random.SeedSequence) else np.random.SeedSequence(seed)
+        self.generator = np.random.Generator(np.random.Philox(self.seed_sequence))
+        self.block_size = int(block_size)
+        self._block = np.empty(0)
+        self._pos = 0
+
+
+    def spawn(self, number: int) -> list:
+        """
+        Create independent child streams
+
+        :param number: number of streams
+        :return: list of RandomStream
+        """
+        return [RandomStream(seed, self.block_size) for seed in self.seed_sequence.spawn(number)]
+
+
+    def uniform(self, number: int) -> np.ndarray:
+        """
+        Draw uniform numbers in [0, 1) from the pre-generated blocks
+
+        :param number: number of values
+        :return: uniform numbers
+        """
+        if self._pos + number > len(self._block):
+            remaining = self._block[self._pos:]
+            n_new = max(self.block_size, number - len(remaining))
+            self._block = np.concatenate((remaining, self.generator.random(n_new)))
+            self._pos = 0
+        values = self._block[self._pos:self._pos + number]
+        self._pos += number
+        return values
+
+
+    def scalar(self) -> float:
+        """
+        Draw one uniform number in [0, 1)
+
+        :return: uniform number
+        """
+        if self._pos >= len(self._block):
+            self._block = self.generator.random(self.block_size)
+            self._pos = 0
+        value = self._block[self._pos]
+        self._pos += 1
+        return float(value)
+
+
+def hash_uniforms(key: np.uint64, particles: np.ndarray, counters: np.ndarray) -> np.ndarray:
+    """
+    Counter-based uniform numbers in [0, 1) (splitmix64 finalizer of key, particle and draw counter, the same hash of
+    the numba kernel draws)
+
+    :param key: stream key
+    :param particles: particles indexes (broadcastable with counters)
+    :param counters: particles draw counters
+    :return: uniform numbers
+    """
+    x = np.uint64(key) ^ (np.asarray(particles, dtype=np.uint64) * HASH_INCREMENT)
+    x = x + (np.asarray(counters, dtype=np.uint64) + np.uint64(1)) * HASH_MULTIPLIER_2
+    x = (x ^ (x >> np.uint64(30))) * HASH_MULTIPLIER_1
+    x = (x ^ (x >> np.uint64(27))) * HASH_MULTIPLIER_2
+    x = x ^ (x >> np.uint64(31))
+    return (x >> np.uint64(11)) * HASH_TO_UNIT
+
+
+class ParticleStreams:
+    def __init__(self, number: int, stream: RandomStream):
+        """
+        Independent counter-based streams of a set of particles: the k-th draw of particle i is the hash of (key, i, k),
+        so the numbers drawn by a particle do not depend on the other particles (nor on the order or the batches they
+        are drawn in). The key is drawn from the parent stream
+
+        :param number: number of particles
+        :param stream: parent stream
+        """
+        self.key = np.uint64(int(stream.scalar() * 2 ** 53))
+        self.counters = np.zeros(number, dtype=np.uint64)
+
+
+    def uniform(self, particle_ids: np.ndarray, number: int) -> np.ndarray:
+        """
+        Draw the next uniform numbers of each particle
+
+        :param particle_ids: particles indexes (without repetition)
+        :param number: number of values of each particle
+        :return: uniform numbers (len(particle_ids), number)
+        """
+        particle_ids = np.asarray(particle_ids, dtype=np.int64)
+        counters = self.counters[particle_ids, None] + np.arange(number, dtype=np.uint64)
+        self.counters[particle_ids] += np.uint64(number)
+        return hash_uniforms(self.key, particle_ids[:, None], counters)
+
+
+_stream = RandomStream()
+
+
+def seed_generators(seed) -> None:
+    """
+    Replace the process random stream (all draws of this module use it)
+
+    :param seed: int seed or numpy SeedSequence (None for non-deterministic seed)
+    :return: None
+    """
+    global _stream
+    _stream = RandomStream(seed)
+
+
+def get_stream() -> RandomStream:
+    """
+    Get the process random stream
+
+    :return: random stream
+    """
+    return _stream
+
+
+@contextmanager
+def use_stream(stream: RandomStream):
+    """
+    Make a stream the process random stream inside a with block (the previous stream is restored afterward), so
+    every draw of a simulation comes from its own stream whatever the draws made outside it
+
+    :param stream: random stream
+    :return: None
+    """
+    global _stream
+    previous = _stream
+    _stream = stream
+    try:
+        yield stream
+    finally:
+        _stream = previous
+
+
+def spawn_seeds(seed, number: int) -> list:
+    """
+    Create independent and deterministic seeds (one for each task)
+
+    :param seed: root seed (None for non-deterministic seeds)
+    :param number: number of seeds
+    :return: list of SeedSequence
+    """
+    return np.random.SeedSequence(seed).spawn(number)
+
+
+class AliasTable:
+    def __init__(self, weights: np.ndarray):
+        """
+        Walker/Vose alias table: draws indexes with probability proportional to weights in O(1) per draw (one uniform
+        column choice plus one uniform acceptance test), whatever the number of weights
+
+        :param weights: non-negative weights (not all null)
+        """
+        weights = np.asarray(weights, dtype=np.float64)
+        if len(weights) == 0 or weights.sum() <= 0:
+            raise Exception('Alias table requires positive weights')
+        n = len(weights)
+        scaled = weights * n / weights.sum()
+        self.prob = np.ones(n)
+        self.alias = np.arange(n, dtype=np.int64)
+        small = [i for i in range(n) if scaled[i] < 1]
+        large = [i for i in range(n) if scaled[i] >= 1]
+        while small and large:
+            less, more = small.pop(), large.pop()
+            self.prob[less] = scaled[less]
+            self.alias[less] = more
+            scaled[more] -= 1 - scaled[less]
+            (small if scaled[more] < 1 else large).append(more)
+
+
+    def __len__(self) -> int:
+        return len(self.prob)
+
+
+    def sample(self, number: int, uniforms: np.ndarray = None) -> np.ndarray:
+        """
+        Draw a batch of indexes
+
+        :param number: number of indexes
+        :param uniforms: uniform numbers to be used (number, 2) (drawn from the process stream if not defined)
+        :return: drawn indexes (number,)
+        """
+        if uniforms is None:
+            uniforms = _stream.uniform(2 * number).reshape(2, number).T
+        columns = np.minimum((uniforms[:, 0] * len(self.prob)).astype(np.int64), len(self.prob) - 1)
+        return np.where(uniforms[:, 1] < self.prob[columns], columns, self.alias[columns])
 
 
 def random_vec(shape=2, min_value: tuple = (-1, -1), max_value: tuple = (1, 1), is_normalized: bool = True) -> np.array:
@@ -12,19 +216,56 @@ def random_vec(shape=2, min_value: tuple = (-1, -1), max_value: tuple = (1, 1),
     :param shape: returned vector shape
     :param min_value: tuple of acceptable minimum value (size should be equal to shape param)
     :param max_value: tuple of acceptable maximum value (size should be equal to shape param)
-    :param is_normalized: define if returned vector should be normalized
+    :param is_normalized: define if returned vector should be normalized (2D normalized vectors are isotropic unit
+    vectors and bounds are ignored)
     :return: random vector
     """
-    random_numbers = list()
-    for pos in range(shape):
-        random_numbers.append(random.uniform(min_value[pos], max_value[pos]))
-    rand_vec = np.array(random_numbers)
+    if is_normalized and shape == 2:
+        return random_directions(1)[0]
+    min_value = np.asarray(min_value[:shape], dtype=np.float64)
+    max_value = np.asarray(max_value[:shape], dtype=np.float64)
+    rand_vec = min_value + (max_value - min_value) * _stream.uniform(shape)
     if is_normalized:
         vec_norm = np.linalg.norm(rand_vec)
         rand_vec = rand_vec / vec_norm
     return rand_vec
 
 
+def random_vectors(
+        number: int, min_value: tuple = (-1, -1), max_value: tuple = (1, 1), is_normalized: bool = True
+) -> np.ndarray:
+    """
+    Calculate a batch of random vectors (same distribution as random_vec). Normalized 2D vectors are isotropic unit
+    vectors (see random_directions): normalizing uniform square samples would bunch directions toward the diagonals
+
+    :param number: number of vectors
+    :param min_value: tuple of acceptable minimum value for each coordinate
+    :param max_value: tuple of acceptable maximum value for each coordinate
+    :param is_normalized: define if returned vectors should be normalized (bounds are ignored for 2D vectors)
+    :return: random vectors (number, len(min_value))
+    """
+    if is_normalized and len(min_value) == 2:
+        return random_directions(number)
+    min_value = np.asarray(min_value, dtype=np.float64)
+    max_value = np.asarray(max_value, dtype=np.float64)
+    rand_vecs = min_value + (max_value - min_value) * _stream.uniform(number * len(min_value)).reshape(number, -1)
+    if is_normalized:
+        rand_vecs /= np.linalg.norm(rand_vecs, axis=1)[:, None]
+    return rand_vecs
+
+
+def random_directions(number: int, uniforms: np.ndarray = None) -> np.ndarray:
+    """
+    Calculate a batch of isotropic unit vectors (uniform angle)
+
+    :param number: number of vectors
+    :param uniforms: uniform numbers to be used (number,) (drawn from the process stream if not defined)
+    :return: unit vectors (number, 2)
+    """
+    angles = 2 * np.pi * (_stream.uniform(number) if uniforms is None else uniforms)
+    return np.column_stack((np.cos(angles), np.sin(angles)))
+
+
 def decision(probability) -> bool:
     """
     Execute decision according probability
@@ -32,7 +273,7 @@ def decision(probability) -> bool:
     :param probability: probability of successfully event
     :return: boolean indicating if event was a success
     """
-    return random.uniform(0, 1) < probability
+    return _stream.scalar() < probability
 
 
 def random_number(min_value, max_value) -> float:
@@ -43,7 +284,19 @@ def random_number(min_value, max_value) -> float:
     :param max_value: maximum acceptable value
     :return: random number
     """
-    return random.uniform(min_value, max_value)
+    return min_value + (max_value - min_value) * _stream.scalar()
+
+
+def random_numbers(min_value, max_value, number: int) -> np.ndarray:
+    """
+    Calculate a batch of random numbers
+
+    :param min_value: minimum acceptable value
+    :param max_value: maximum acceptable value
+    :param number: number of generated values
+    :return: random numbers
+    """
+    return min_value + (max_value - min_value) * _stream.uniform(number)
 
 
 def random_int_number(min_value, max_value) -> int:
@@ -54,19 +307,17 @@ def random_int_number(min_value, max_value) -> int:
     :param max_value: maximum acceptable int value
     :return: random int number
     """
-    return random.randint(min_value, max_value)
+    return min_value + int((max_value - min_value + 1) * _stream.scalar())
 
 
-def random_pos_in_segment(segment: Segment2) -> Point2:
+def random_int_numbers(min_value, max_value, number: int) -> np.ndarray:
     """
-    Generate a random position in a segment
+    Generate a batch of random int numbers
 
-    :param segment: Segment to guide point generation
-    :return: random point in segment
+    :param min_value: minimum acceptable int value
+    :param max_value: maximum acceptable int value
+    :param number: number of generated values
+    :return: random int numbers
     """
-    point_1 = segment[0]
-    point_2 = segment[1]
-    u = random_number(0, 1)
-    p_x = (1 - u) * float(point_1.x()) + u * float(point_2.x())
-    p_y = (1 - u) * float(point_1.y()) + u * float(point_2.y())
-    return Point2(p_x, p_y)
+    return min_value + ((max_value - min_value + 1) * _stream.uniform(number)).astype(np.int64)
+
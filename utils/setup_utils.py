@@ -1,6 +1,3 @@
-from numba import cuda
-
-
 cc_cores_per_SM_dict = {
     (2, 0): 32,
     (2, 1): 48,
@@ -21,6 +18,8 @@ cc_cores_per_SM_dict = {
 
 
 def cuda_cores_status():
+    from numba import cuda
+
     total_cores = 0
     sm_number = 0
     compute_capability = 0
@@ -0,0 +1,401 @@
+import numpy as np
+
+from utils.vectorized_operations import (
+    cross, point_segment_distances, crossing_test, supporting_lines, parabolic_crossing_times, PARAM_TOLERANCE
+)
+
+
+CELLS_PER_SEGMENT = 4
+MAX_CELLS_PER_AXIS = 512
+BOX_PADDING = 1e-3
+NEAREST_CHUNK = 256
+BOUNDARY_TOLERANCE = 1e-9
+OUTSIDE = 0
+INSIDE = 1
+BOUNDARY = 2
+
+
+class SegmentGrid:
+    def __init__(self, seg_starts: np.ndarray, seg_ends: np.ndarray, seg_normals: np.ndarray):
+        """
+        Uniform grid over boundary segments. Each cell stores the segments whose bounding box overlaps it, so queries
+        only visit the segments close to the query point or ray
+
+        :param seg_starts: segments source points (n, 2)
+        :param seg_ends: segments target points (n, 2)
+        :param seg_normals: segments outward normals (n, 2)
+        """
+        self.seg_starts = seg_starts
+        self.seg_ends = seg_ends
+        self.seg_directions = seg_ends - seg_starts
+        self.seg_normals = seg_normals
+        self.seg_lines = supporting_lines(seg_starts, seg_normals)
+
+        points = np.concatenate((seg_starts, seg_ends))
+        low = points.min(axis=0)
+        high = points.max(axis=0)
+        padding = BOX_PADDING * max(float(np.max(high - low)), np.finfo(float).tiny)
+        self.low = low - padding
+        self.high = high + padding
+        size = self.high - self.low
+        self.cell_size = np.sqrt(size[0] * size[1] / max(CELLS_PER_SEGMENT * len(seg_starts), 1))
+        self.shape = np.clip(np.ceil(size / self.cell_size).astype(int), 1, MAX_CELLS_PER_AXIS)
+        self.cell_size = float(np.max(size / self.shape))
+
+        self.cell_offsets, self.cell_items = self._assign_segments()
+        self.nearest_offsets, self.nearest_items = self._build_nearest_lists()
+        self.boundary_tolerance = BOUNDARY_TOLERANCE * float(np.max(size))
+        self.cell_state = self._rasterize()
+
+
+    def _assign_segments(self) -> tuple[np.ndarray, np.ndarray]:
+        """
+        Assign segments to every cell overlapped by their bounding boxes (compressed sparse row layout)
+
+        :return: cells offsets (n_cells + 1,) and concatenated segments ids
+        """
+        margin = BOX_PADDING * self.cell_size
+        cell_min = self.cell_of(np.minimum(self.seg_starts, self.seg_ends) - margin)
+        cell_max = self.cell_of(np.maximum(self.seg_starts, self.seg_ends) + margin)
+        cells = list()
+        items = list()
+        for seg_id, (c_min, c_max) in enumerate(zip(cell_min, cell_max)):
+            ix, iy = np.meshgrid(np.arange(c_min[0], c_max[0] + 1), np.arange(c_min[1], c_max[1] + 1))
+            cells.append(self.cell_id(ix.ravel(), iy.ravel()))
+            items.append(np.full(ix.size, seg_id))
+        cells = np.concatenate(cells) if cells else np.zeros(0, dtype=int)
+        items = np.concatenate(items) if items else np.zeros(0, dtype=int)
+        order = np.argsort(cells, kind='stable')
+        counts = np.bincount(cells, minlength=int(np.prod(self.shape)))
+        offsets = np.concatenate(([0], np.cumsum(counts)))
+        return offsets, items[order]
+
+
+    def _rasterize(self) -> np.ndarray:
+        """
+        Classify grid cells as inside, outside or boundary. Cells without segments are entirely inside or outside
+        the topology, so their center classifies the whole cell
+
+        :return: cells states (n_cells,)
+        """
+        ix, iy = np.meshgrid(np.arange(self.shape[0]), np.arange(self.shape[1]))
+        centers = self.low + (np.column_stack((ix.ravel(), iy.ravel())) + 0.5) * self.cell_size
+        state = np.where(crossing_test(centers, self.seg_starts, self.seg_ends), INSIDE, OUTSIDE).astype(np.int8)
+        state[np.diff(self.cell_offsets) > 0] = BOUNDARY
+        return state
+
+
+    def contains(self, points: np.ndarray) -> np.ndarray:
+        """
+        Check if points are inside topology (points on the boundary are considered inside). Inside and outside cells
+        answer directly; only points in boundary cells run the crossing test
+
+        :param points: points (m, 2)
+        :return: boolean array (m,)
+        """
+        points = np.atleast_2d(points)
+        in_box = np.all((points >= self.low) & (points <= self.high), axis=1)
+        state = np.where(in_box, self.cell_state[self.cell_id(*self.cell_of(points).T)], OUTSIDE)
+        result = state == INSIDE
+        undefined = np.flatnonzero(state == BOUNDARY)
+        if undefined.size:
+            near = self._distances(
+                points[undefined], self._gather(self.cell_id(*self.cell_of(points[undefined]).T)[:, None])
+            ).min(axis=1) <= self.boundary_tolerance
+            result[undefined] = near | crossing_test(points[undefined], self.seg_starts, self.seg_ends)
+        return result
+
+
+    def cell_of(self, points: np.ndarray) -> np.ndarray:
+        """
+        Get (clipped) grid cell coordinates of points
+
+        :param points: points (m, 2)
+        :return: cells coordinates (m, 2)
+        """
+        cells = np.floor((np.atleast_2d(points) - self.low) / self.cell_size).astype(int)
+        return np.clip(cells, 0, self.shape - 1)
+
+
+    def cell_id(self, ix: np.ndarray, iy: np.ndarray) -> np.ndarray:
+        """
+        Get flat cell ids from cells coordinates
+
+        :param ix: x cells coordinates
+        :param iy: y cells coordinates
+        :return: flat cell ids
+        """
+        return iy * self.shape[0] + ix
+
+
+    def _gather(self, cells: np.ndarray) -> np.ndarray:
+        """
+        Gather the segments stored in each row of cells (padded with -1)
+
+        :param cells: flat cell ids (m, w)
+        :return: segments ids (m, k)
+        """
+        starts = self.cell_offsets[cells]
+        counts = self.cell_offsets[cells + 1] - starts
+        width = int(counts.max()) if counts.size else 0
+        if not width:
+            return np.full((len(cells), 0), -1)
+        positions = starts[..., None] + np.arange(width)
+        valid = np.arange(width) < counts[..., None]
+        items = np.where(valid, self.cell_items[np.minimum(positions, len(self.cell_items) - 1)], -1)
+        return items.reshape(len(cells), -1)
+
+
+    def _window_cells(self, points: np.ndarray, radius: float) -> np.ndarray:
+        """
+        Get the cells of a square window of half side radius around each point
+
+        :param points: points (m, 2)
+        :param radius: window half side
+        :return: flat cell ids (m, w)
+        """
+        reach = int(min(np.ceil(radius / self.cell_size), self.shape.max()))
+        offsets = np.arange(-reach, reach + 1)
+        cells = self.cell_of(points)
+        ix = np.clip(cells[:, 0, None, None] + offsets[None, None, :], 0, self.shape[0] - 1)
+        iy = np.clip(cells[:, 1, None, None] + offsets[None, :, None], 0, self.shape[1] - 1)
+        return self.cell_id(ix, iy).reshape(len(cells), -1)
+
+
+    def _distances(self, points: np.ndarray, candidates: np.ndarray) -> np.ndarray:
+        """
+        Calculate distances between each point and its candidate segments (inf for padding)
+
+        :param points: points (m, 2)
+        :param candidates: segments ids (m, k), -1 for padding
+        :return: distances (m, k)
+        """
+        ids = np.maximum(candidates, 0)
+        directions = self.seg_directions[ids]
+        relative = points[:, None, :] - self.seg_starts[ids]
+        squared = np.einsum('mkj,mkj->mk', directions, directions)
+        squared[squared == 0] = 1
+        proj = np.clip(np.einsum('mkj,mkj->mk', relative, directions) / squared, 0, 1)
+        distances = np.linalg.norm(relative - proj[..., None] * directions, axis=2)
+        return np.where(candidates >= 0, distances, np.inf)
+
+
+    def segments_near(self, point: np.ndarray, radius: float) -> np.ndarray:
+        """
+        Get segments closer than radius to point
+
+        :param point: query point (2,)
+        :param radius: search radius
+        :return: segments ids
+        """
+        point = np.atleast_2d(point)
+        candidates = np.unique(self._gather(self._window_cells(point, radius)))
+        candidates = candidates[candidates >= 0][None, :]
+        distances = self._distances(point, candidates)[0]
+        return candidates[0][distances <= radius]
+
+
+    def min_distances(self, points: np.ndarray, radius: float) -> np.ndarray:
+        """
+        Calculate distances between points and the boundary, clipped to radius
+
+        :param points: query points (m, 2)
+        :param radius: maximum distance of interest
+        :return: min(distance to the closest segment, radius) for each point (m,)
+        """
+        points = np.atleast_2d(points)
+        candidates = self._gather(self._window_cells(points, radius))
+        if not candidates.shape[1]:
+            return np.full(len(points), radius)
+        return np.minimum(self._distances(points, candidates).min(axis=1), radius)
+
+
+    def _build_nearest_lists(self) -> tuple[np.ndarray, np.ndarray]:
+        """
+        For each cell, store the segments that can be the closest one to any point of the cell: segments whose
+        distance to the cell center is lower than the closest distance plus the cell diagonal
+
+        :return: cells offsets (n_cells + 1,) and concatenated segments ids
+        """
+        ix, iy = np.meshgrid(np.arange(self.shape[0]), np.arange(self.shape[1]))
+        centers = self.low + (np.column_stack((ix.ravel(), iy.ravel())) + 0.5) * self.cell_size
+        diagonal = np.sqrt(2) * self.cell_size
+        counts = list()
+        items = list()
+        for chunk in np.array_split(centers, max(1, len(centers) // NEAREST_CHUNK)):
+            distances = point_segment_distances(chunk, self.seg_starts, self.seg_ends)
+            selected = distances <= distances.min(axis=1)[:, None] + diagonal
+            counts.append(selected.sum(axis=1))
+            items.append(np.nonzero(selected)[1])
+        offsets = np.concatenate(([0], np.cumsum(np.concatenate(counts))))
+        return offsets, np.concatenate(items)
+
+
+    def nearest_segment(self, point: np.ndarray) -> tuple[int, float]:
+        """
+        Get the closest segment to point
+
+        :param point: query point (2,)
+        :return: closest segment id and distance
+        """
+        point = np.atleast_2d(point)
+        if np.any(point < self.low) or np.any(point > self.high):
+            candidates = np.arange(len(self.seg_starts))[None, :]
+        else:
+            cell = self.cell_id(*self.cell_of(point)[0])
+            candidates = self.nearest_items[self.nearest_offsets[cell]:self.nearest_offsets[cell + 1]][None, :]
+        distances = self._distances(point, candidates)[0]
+        pos = int(np.argmin(distances))
+        return int(candidates[0, pos]), float(distances[pos])
+
+
+    def first_hits(self, origins: np.ndarray, displacements: np.ndarray) -> tuple[np.ndarray, np.ndarray]:
+        """
+        Calculate the first segment crossed (from inside to outside) by each path origin + s * displacement,
+        0 <= s <= 1. All paths walk through the grid cells simultaneously (vectorized DDA traversal)
+
+        :param origins: paths origins (m, 2)
+        :param displacements: paths displacements (m, 2)
+        :return: index of the first crossed segment for each path (-1 if there is no crossing) (m,)
+        :return: path parameter s of the crossing (inf if there is no crossing) (m,)
+        """
+        origins = np.atleast_2d(origins).astype(float)
+        displacements = np.atleast_2d(displacements).astype(float)
+        n_paths = len(origins)
+        hit_ids = np.full(n_paths, -1)
+        hit_params = np.full(n_paths, np.inf)
+
+        cells = self.cell_of(origins)
+        step = np.where(displacements >= 0, 1, -1)
+        with np.errstate(divide='ignore', invalid='ignore'):
+            next_border = self.low + (cells + (step > 0)) * self.cell_size
+            t_max = np.where(displacements != 0, (next_border - origins) / displacements, np.inf)
+            t_delta = np.where(displacements != 0, self.cell_size / np.abs(displacements), np.inf)
+
+        active = np.arange(n_paths)
+        while active.size:
+            candidates = self._gather(self.cell_id(cells[active, 0], cells[active, 1])[:, None])
+            cell_exit = t_max[active].min(axis=1)
+            if candidates.shape[1]:
+                params = self._path_params(origins[active], displacements[active], candidates)
+                pos = np.argmin(params, axis=1)
+                lowest = params[np.arange(len(active)), pos]
+                found = lowest <= np.minimum(cell_exit, 1)
+                hit_ids[active[found]] = candidates[found, pos[found]]
+                hit_params[active[found]] = lowest[found]
+            else:
+                found = np.zeros(len(active), dtype=bool)
+
+            axis = np.argmin(t_max[active], axis=1)
+            rows = np.arange(len(active))
+            cells[active, axis] += step[active, axis]
+            t_max[active, axis] += t_delta[active, axis]
+            outside = (cells[active] < 0).any(axis=1) | (cells[active] >= self.shape).any(axis=1)
+            active = active[~(found | outside | (cell_exit[rows] > 1))]
+
+        return hit_ids, hit_params
+
+
+    def first_parabolic_hits(
+            self, origins: np.ndarray, velocities: np.ndarray, acceleration: np.ndarray, horizons: np.ndarray
+    ) -> tuple[np.ndarray, np.ndarray]:
+        """
+        Calculate the first segment crossed by each uniformly accelerated trajectory (origin + v * t + a * t ** 2 / 2,
+        0 <= t <= horizon). Trajectories are split in arcs about one cell wide, walked simultaneously: an arc stays
+        inside the bounding box of its end points and of its apex on each axis, so only the segments stored in the
+        cells of that box are candidates
+
+        :param origins: trajectories origins (m, 2)
+        :param velocities: trajectories initial velocities (m, 2)
+        :param acceleration: acceleration shared by all trajectories (2,)
+        :param horizons: trajectories durations (m,)
+        :return: index of the first crossed segment for each trajectory (-1 if there is no crossing) (m,)
+        :return: crossing time (inf if there is no crossing) (m,)
+        """
+        origins = np.atleast_2d(origins).astype(float)
+        velocities = np.atleast_2d(velocities).astype(float)
+        horizons = np.atleast_1d(horizons).astype(float)
+        acceleration = np.asarray(acceleration, dtype=float)
+        n_paths = len(origins)
+        hit_ids = np.full(n_paths, -1)
+        hit_times = np.full(n_paths, np.inf)
+
+        low, high = self._arc_boxes(origins, velocities, acceleration, horizons)
+        n_arcs = np.maximum(np.ceil((high - low).max(axis=1) / self.cell_size), 1)
+        arc_durations = horizons / n_arcs
+        arc = 0
+        active = np.arange(n_paths)
+        while active.size:
+            starts = arc * arc_durations[active]
+            positions = origins[active] + velocities[active] * starts[:, None] + \
+                0.5 * acceleration * starts[:, None] ** 2
+            arc_velocities = velocities[active] + acceleration * starts[:, None]
+            low, high = self._arc_boxes(positions, arc_velocities, acceleration, arc_durations[active])
+            cell_min = self.cell_of(low)
+            cell_max = self.cell_of(high)
+            width = (cell_max - cell_min).max(axis=0) + 1
+            ix = np.minimum(cell_min[:, 0, None, None] + np.arange(width[0])[None, None, :], cell_max[:, 0, None, None])
+            iy = np.minimum(cell_min[:, 1, None, None] + np.arange(width[1])[None, :, None], cell_max[:, 1, None, None])
+            candidates = self._gather(self.cell_id(ix, iy).reshape(len(active), -1))
+            found = np.zeros(len(active), dtype=bool)
+            if candidates.shape[1]:
+                ids = np.maximum(candidates, 0)
+                times = parabolic_crossing_times(
+                    positions, arc_velocities, acceleration, arc_durations[active], self.seg_starts[ids],
+                    self.seg_directions[ids], self.seg_lines[ids]
+                )
+                times[candidates < 0] = np.inf
+                pos = np.argmin(times, axis=1)
+                rows = np.arange(len(active))
+                found = np.isfinite(times[rows, pos])
+                hit_ids[active[found]] = candidates[found, pos[found]]
+                hit_times[active[found]] = starts[found] + times[found, pos[found]]
+            arc += 1
+            active = active[~found & (arc < n_arcs[active])]
+
+        return hit_ids, hit_times
+
+
+    @staticmethod
+    def _arc_boxes(
+            origins: np.ndarray, velocities: np.ndarray, acceleration: np.ndarray, durations: np.ndarray
+    ) -> tuple[np.ndarray, np.ndarray]:
+        """
+        Calculate bounding boxes of parabola arcs (origin + v * t + a * t ** 2 / 2, 0 <= t <= duration): the arc end
+        points and, on each axis, the apex when it lies inside the arc
+
+        :param origins: trajectories origins (m, 2)
+        :param velocities: trajectories initial velocities (m, 2)
+        :param acceleration: acceleration shared by all trajectories (2,)
+        :param durations: arcs durations (m,)
+        :return: boxes lower corners (m, 2) and upper corners (m, 2)
+        """
+        with np.errstate(divide='ignore', invalid='ignore'):
+            apex = np.where(acceleration != 0, -velocities / acceleration, 0)
+        ends = np.broadcast_to(durations[:, None], velocities.shape)
+        times = np.stack((np.zeros_like(ends), ends, np.clip(apex, 0, ends)))
+        points = origins + velocities * times + 0.5 * acceleration * times ** 2
+        return points.min(axis=0), points.max(axis=0)
+
+
+    def _path_params(self, origins: np.ndarray, displacements: np.ndarray, candidates: np.ndarray) -> np.ndarray:
+        """
+        Calculate path parameters of crossings between each path and its candidate segments (inf if no crossing)
+
+        :param origins: paths origins (m, 2)
+        :param displacements: paths displacements (m, 2)
+        :param candidates: segments ids (m, k), -1 for padding
+        :return: path parameters (m, k)
+        """
+        ids = np.maximum(candidates, 0)
+        seg_directions = self.seg_directions[ids]
+        denominator = cross(displacements[:, None, :], seg_directions)
+        relative = self.seg_starts[ids] - origins[:, None, :]
+        outward = np.einsum('mj,mkj->mk', displacements, self.seg_normals[ids]) > 0
+        valid = (candidates >= 0) & outward & (np.abs(denominator) > 0)
+        with np.errstate(divide='ignore', invalid='ignore'):
+            path_param = cross(relative, seg_directions) / denominator
+            seg_param = cross(relative, displacements[:, None, :]) / denominator
+        valid &= (path_param >= -PARAM_TOLERANCE) & (path_param <= 1)
+        valid &= (seg_param >= -PARAM_TOLERANCE) & (seg_param <= 1 + PARAM_TOLERANCE)
+        return np.where(valid, np.maximum(path_param, 0), np.inf)
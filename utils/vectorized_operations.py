@@ -0,0 +1,300 @@
+import numpy as np
+
+
+PARAM_TOLERANCE = 1e-12
+
+
+def segments_to_arrays(segments: list) -> tuple[np.ndarray, np.ndarray]:
+    """
+    Convert segments into float arrays of endpoints
+
+    :param segments: list of segments (any object indexable as segment[0], segment[1] with x() and y() methods)
+    :return: source points array (n, 2)
+    :return: target points array (n, 2)
+    """
+    starts = np.array([[float(seg[0].x()), float(seg[0].y())] for seg in segments], dtype=np.float64).reshape(-1, 2)
+    ends = np.array([[float(seg[1].x()), float(seg[1].y())] for seg in segments], dtype=np.float64).reshape(-1, 2)
+    return starts, ends
+
+
+def cross(vec_1: np.ndarray, vec_2: np.ndarray) -> np.ndarray:
+    """
+    Calculate 2D cross product (z component) between arrays of vectors
+
+    :param vec_1: vectors 1 (..., 2)
+    :param vec_2: vectors 2 (..., 2)
+    :return: cross products (...)
+    """
+    return vec_1[..., 0] * vec_2[..., 1] - vec_1[..., 1] * vec_2[..., 0]
+
+
+def outward_normals(directions: np.ndarray) -> np.ndarray:
+    """
+    Calculate unit outward normals of counterclockwise oriented boundaries (clockwise for holes)
+
+    :param directions: segments directions (n, 2)
+    :return: unit outward normals (n, 2)
+    """
+    normals = np.column_stack((directions[:, 1], -directions[:, 0]))
+    lengths = np.linalg.norm(normals, axis=1)
+    lengths[lengths == 0] = 1
+    return normals / lengths[:, None]
+
+
+def supporting_lines(seg_starts: np.ndarray, seg_normals: np.ndarray) -> np.ndarray:
+    """
+    Calculate normalized supporting lines coefficients (a, b, c), with a * x + b * y + c the signed distance to the
+    line (positive on the outward normal side)
+
+    :param seg_starts: segments source points (n, 2)
+    :param seg_normals: segments unit outward normals (n, 2)
+    :return: lines coefficients (n, 3)
+    """
+    return np.column_stack((seg_normals, -np.einsum('ij,ij->i', seg_normals, seg_starts)))
+
+
+def intersection_params(
+        origins: np.ndarray,
+        displacements: np.ndarray,
+        seg_starts: np.ndarray,
+        seg_directions: np.ndarray,
+        seg_normals: np.ndarray
+) -> np.ndarray:
+    """
+    Calculate path parameters s of the crossings between paths (origin + s * displacement, 0 <= s <= 1) and boundary
+    segments. Only segments crossed from inside to outside (displacement against segment outward normal) are considered
+
+    :param origins: paths origins (m, 2)
+    :param displacements: paths displacements (m, 2)
+    :param seg_starts: segments source points (n, 2)
+    :param seg_directions: segments directions (target - source) (n, 2)
+    :param seg_normals: segments outward normals (n, 2)
+    :return: path parameters matrix (inf where there is no crossing) (m, n)
+    """
+    origins = np.atleast_2d(origins)
+    displacements = np.atleast_2d(displacements)
+    denominator = cross(displacements[:, None, :], seg_directions[None, :, :])
+    relative = seg_starts[None, :, :] - origins[:, None, :]
+    outward = (displacements @ seg_normals.T) > 0
+    valid = outward & (np.abs(denominator) > 0)
+    with np.errstate(divide='ignore', invalid='ignore'):
+        path_param = cross(relative, seg_directions[None, :, :]) / denominator
+        seg_param = cross(relative, displacements[:, None, :]) / denominator
+    valid &= (path_param >= -PARAM_TOLERANCE) & (path_param <= 1)
+    valid &= (seg_param >= -PARAM_TOLERANCE) & (seg_param <= 1 + PARAM_TOLERANCE)
+    return np.where(valid, np.maximum(path_param, 0), np.inf)
+
+
+def first_intersections(
+        origins: np.ndarray,
+        displacements: np.ndarray,
+        seg_starts: np.ndarray,
+        seg_directions: np.ndarray,
+        seg_normals: np.ndarray
+) -> tuple[np.ndarray, np.ndarray]:
+    """
+    Calculate the first boundary segment crossed by each path (see intersection_params)
+
+    :param origins: paths origins (m, 2)
+    :param displacements: paths displacements (m, 2)
+    :param seg_starts: segments source points (n, 2)
+    :param seg_directions: segments directions (target - source) (n, 2)
+    :param seg_normals: segments outward normals (n, 2)
+    :return: index of the first crossed segment for each path (-1 if there is no crossing) (m,)
+    :return: path parameter s of the crossing (inf if there is no crossing) (m,)
+    """
+    path_param = intersection_params(origins, displacements, seg_starts, seg_directions, seg_normals)
+    if not path_param.shape[1]:
+        return np.full(len(path_param), -1), np.full(len(path_param), np.inf)
+    index = np.argmin(path_param, axis=1)
+    lowest = path_param[np.arange(len(path_param)), index]
+    index = np.where(np.isfinite(lowest), index, -1)
+    return index, lowest
+
+
+def parabolic_crossing_times(
+        origins: np.ndarray,
+        velocities: np.ndarray,
+        acceleration: np.ndarray,
+        horizons: np.ndarray,
+        seg_starts: np.ndarray,
+        seg_directions: np.ndarray,
+        seg_lines: np.ndarray
+) -> np.ndarray:
+    """
+    Calculate times of the crossings between uniformly accelerated trajectories (origin + v * t + a * t ** 2 / 2,
+    0 <= t <= horizon) and boundary segments. The signed distance to each supporting line is a quadratic in t, solved
+    in closed form (numerically stable roots). Only roots where the trajectory leaves the topology (velocity against
+    segment outward normal) are considered, so a particle lying on a segment it was just mirrored on is not hit again.
+    Segments are shared by all trajectories, or given per trajectory (candidate segments of a spatial index)
+
+    :param origins: trajectories origins (m, 2)
+    :param velocities: trajectories initial velocities (m, 2)
+    :param acceleration: acceleration shared by all trajectories (2,)
+    :param horizons: trajectories durations (m,)
+    :param seg_starts: segments source points ((n, 2) or (m, n, 2))
+    :param seg_directions: segments directions (target - source) ((n, 2) or (m, n, 2))
+    :param seg_lines: segments supporting lines (see supporting_lines) ((n, 3) or (m, n, 3))
+    :return: crossing times matrix (inf where there is no crossing) (m, n)
+    """
+    origins = np.atleast_2d(origins)[:, None, :]
+    velocities = np.atleast_2d(velocities)[:, None, :]
+    horizons = np.atleast_1d(horizons)[:, None]
+    if seg_lines.ndim == 2:
+        seg_starts, seg_directions, seg_lines = seg_starts[None], seg_directions[None], seg_lines[None]
+    normals = seg_lines[..., :2]
+    quadratic = 0.5 * normals @ acceleration
+    linear = np.sum(velocities * normals, axis=-1)
+    constant = np.sum(origins * normals, axis=-1) + seg_lines[..., 2]
+    discriminant = linear ** 2 - 4 * quadratic * constant
+    with np.errstate(divide='ignore', invalid='ignore'):
+        q = -0.5 * (linear + np.copysign(np.sqrt(np.maximum(discriminant, 0)), linear))
+        roots = np.stack((q / quadratic, constant / q))
+    times = np.full(linear.shape, np.inf)
+    squared_lengths = np.sum(seg_directions * seg_directions, axis=-1)
+    squared_lengths[squared_lengths == 0] = 1
+    for t in roots:
+        valid = (discriminant >= 0) & np.isfinite(t) & (t >= -PARAM_TOLERANCE * horizons) & (t <= horizons)
+        t = np.where(valid, np.maximum(t, 0), 0)
+        valid &= linear + 2 * quadratic * t > 0
+        offsets = origins + velocities * t[..., None] + 0.5 * acceleration * t[..., None] ** 2 - seg_starts
+        seg_param = np.sum(offsets * seg_directions, axis=-1) / squared_lengths
+        valid &= (seg_param >= -PARAM_TOLERANCE) & (seg_param <= 1 + PARAM_TOLERANCE)
+        times = np.where(valid & (t < times), t, times)
+    return times
+
+
+def first_parabolic_crossings(
+        origins: np.ndarray,
+        velocities: np.ndarray,
+        acceleration: np.ndarray,
+        horizons: np.ndarray,
+        seg_starts: np.ndarray,
+        seg_directions: np.ndarray,
+        seg_lines: np.ndarray
+) -> tuple[np.ndarray, np.ndarray]:
+    """
+    Calculate the first boundary segment crossed by each accelerated trajectory (see parabolic_crossing_times)
+
+    :param origins: trajectories origins (m, 2)
+    :param velocities: trajectories initial velocities (m, 2)
+    :param acceleration: acceleration shared by all trajectories (2,)
+    :param horizons: trajectories durations (m,)
+    :param seg_starts: segments source points (n, 2)
+    :param seg_directions: segments directions (target - source) (n, 2)
+    :param seg_lines: segments supporting lines (n, 3)
+    :return: index of the first crossed segment for each trajectory (-1 if there is no crossing) (m,)
+    :return: crossing time (inf if there is no crossing) (m,)
+    """
+    times = parabolic_crossing_times(
+        origins, velocities, acceleration, horizons, seg_starts, seg_directions, seg_lines
+    )
+    if not times.shape[1]:
+        return np.full(len(times), -1), np.full(len(times), np.inf)
+    index = np.argmin(times, axis=1)
+    lowest = times[np.arange(len(times)), index]
+    index = np.where(np.isfinite(lowest), index, -1)
+    return index, lowest
+
+
+def slab_triangulation(seg_starts: np.ndarray, seg_ends: np.ndarray) -> np.ndarray:
+    """
+    Triangulate the region enclosed by closed boundaries (multiple polygons and holes). The region is cut into
+    horizontal slabs at every vertex ordinate; inside each slab, boundary segments do not cross, so pairs of
+    consecutive segments (even-odd rule) bound trapezoids, each split into two triangles
+
+    :param seg_starts: segments source points (n, 2)
+    :param seg_ends: segments target points (n, 2)
+    :return: triangles vertices (k, 3, 2)
+    """
+    y_levels = np.unique(np.concatenate((seg_starts[:, 1], seg_ends[:, 1])))
+    low = np.minimum(seg_starts[:, 1], seg_ends[:, 1])
+    high = np.maximum(seg_starts[:, 1], seg_ends[:, 1])
+    slope = np.zeros(len(seg_starts))
+    sloped = high > low
+    slope[sloped] = (seg_ends[sloped, 0] - seg_starts[sloped, 0]) / (seg_ends[sloped, 1] - seg_starts[sloped, 1])
+    triangles = list()
+    for y_0, y_1 in zip(y_levels[:-1], y_levels[1:]):
+        spanning = np.flatnonzero(sloped & (low <= y_0) & (high >= y_1))
+        x_0 = seg_starts[spanning, 0] + (y_0 - seg_starts[spanning, 1]) * slope[spanning]
+        x_1 = seg_starts[spanning, 0] + (y_1 - seg_starts[spanning, 1]) * slope[spanning]
+        order = np.argsort(x_0 + x_1)
+        x_0 = x_0[order].reshape(-1, 2)
+        x_1 = x_1[order].reshape(-1, 2)
+        bottom_left = np.column_stack((x_0[:, 0], np.full(len(x_0), y_0)))
+        bottom_right = np.column_stack((x_0[:, 1], np.full(len(x_0), y_0)))
+        top_left = np.column_stack((x_1[:, 0], np.full(len(x_1), y_1)))
+        top_right = np.column_stack((x_1[:, 1], np.full(len(x_1), y_1)))
+        triangles.append(np.stack((bottom_left, bottom_right, top_right), axis=1))
+        triangles.append(np.stack((bottom_left, top_right, top_left), axis=1))
+    if not triangles:
+        return np.zeros((0, 3, 2))
+    return np.concatenate(triangles)
+
+
+def triangle_areas(triangles: np.ndarray) -> np.ndarray:
+    """
+    Calculate triangles areas
+
+    :param triangles: triangles vertices (k, 3, 2)
+    :return: areas (k,)
+    """
+    return np.abs(cross(triangles[:, 1] - triangles[:, 0], triangles[:, 2] - triangles[:, 0])) / 2
+
+
+def crossing_test(points: np.ndarray, seg_starts: np.ndarray, seg_ends: np.ndarray) -> np.ndarray:
+    """
+    Even-odd crossing test: count the boundary segments crossed by a horizontal ray from each point to +x. Valid for
+    any set of closed boundaries (multiple polygons and holes)
+
+    :param points: points (m, 2)
+    :param seg_starts: segments source points (n, 2)
+    :param seg_ends: segments target points (n, 2)
+    :return: boolean array indicating if each point is inside the boundaries (m,)
+    """
+    points = np.atleast_2d(points)
+    x = points[:, 0, None]
+    y = points[:, 1, None]
+    straddle = (seg_starts[None, :, 1] > y) != (seg_ends[None, :, 1] > y)
+    with np.errstate(divide='ignore', invalid='ignore'):
+        x_cross = seg_starts[None, :, 0] + (y - seg_starts[None, :, 1]) * \
+            (seg_ends[None, :, 0] - seg_starts[None, :, 0]) / (seg_ends[None, :, 1] - seg_starts[None, :, 1])
+    crossings = np.count_nonzero(straddle & (x < x_cross), axis=1)
+    return crossings % 2 == 1
+
+
+def point_segment_distances(
+        points: np.ndarray, seg_starts: np.ndarray, seg_ends: np.ndarray, seg_lengths: np.ndarray = None
+) -> np.ndarray:
+    """
+    Calculate distances between points and segments
+
+    :param points: points (m, 2)
+    :param seg_starts: segments source points (n, 2)
+    :param seg_ends: segments target points (n, 2)
+    :param seg_lengths: precomputed segments lengths (n,) (calculated if not defined)
+    :return: distances matrix (m, n)
+    """
+    points = np.atleast_2d(points)
+    directions = seg_ends - seg_starts
+    if seg_lengths is None:
+        squared_lengths = np.einsum('ij,ij->i', directions, directions)
+    else:
+        squared_lengths = seg_lengths ** 2
+    squared_lengths = np.where(squared_lengths == 0, 1, squared_lengths)
+    relative = points[:, None, :] - seg_starts[None, :, :]
+    proj = np.clip(np.einsum('mnk,nk->mn', relative, directions) / squared_lengths, 0, 1)
+    closest = seg_starts[None, :, :] + proj[..., None] * directions[None, :, :]
+    return np.linalg.norm(points[:, None, :] - closest, axis=2)
+
+
+def mirror_vectors(vectors: np.ndarray, normals: np.ndarray) -> np.ndarray:
+    """
+    Mirror vectors according boundaries unit normals
+
+    :param vectors: vectors to be mirrored (m, 2)
+    :param normals: boundaries unit normals (m, 2)
+    :return: mirrored vectors (m, 2)
+    """
+    dot = np.einsum('ij,ij->i', vectors, normals)
+    return vectors - 2 * dot[:, None] * normals